@@ -0,0 +1 @@
+# Siren Benchmarks
@@ -0,0 +1,87 @@
+"""Record live list/search/detail pages from every source as benchmark fixtures.
+
+    python -m benchmarks.record --keyword SSIS-001
+
+Overwrites benchmarks/fixtures/<source>/<kind>.html. Run it only when the
+fixtures need refreshing; the benchmark itself never touches the network.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+logger = logging.getLogger(__name__)
+
+
+def save(source, kind, html):
+    path = os.path.join(FIXTURE_DIR, source, f"{kind}.html")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    logger.info("Saved %s (%d bytes)", path, len(html))
+
+
+async def record(keyword):
+    os.environ.setdefault('HTTP_CACHE', 'false')
+    sys.path.insert(0, ROOT)
+    from crawler import CrawlerManager
+
+    manager = CrawlerManager()
+    missav, jable, hohoj, memo = manager.crawlers
+    await manager.init_session()
+    try:
+        pages = {
+            ('missav', 'list'): f"{missav.base_url}/new",
+            ('missav', 'search'): f"{missav.base_url}/cn/search/{keyword}",
+            ('jable', 'list'): f"{jable.base_url}/latest-updates/",
+            ('jable', 'search'): f"{jable.base_url}/search/{keyword}/",
+            ('hohoj', 'search'): f"{hohoj.base_url}/search?text={keyword}",
+            ('memo', 'search'): f"{memo.base_url}/browse/search?q={keyword}",
+        }
+        crawlers = {'missav': missav, 'jable': jable, 'hohoj': hohoj, 'memo': memo}
+        fetched = {}
+        for (source, kind), url in pages.items():
+            html = await crawlers[source].fetch_html(url)
+            if html:
+                fetched[(source, kind)] = html
+                save(source, kind, html)
+            else:
+                logger.warning("Could not fetch %s %s page: %s", source, kind, url)
+
+        # Detail pages: follow the first search result of each source
+        for source in ('missav', 'jable', 'hohoj', 'memo'):
+            html = fetched.get((source, 'search'))
+            crawler = crawlers[source]
+            if not html:
+                continue
+            if source in ('missav', 'jable'):
+                results = crawler.parse_list(html, limit=1)
+            else:
+                results = crawler.parse_search(html, keyword, limit=1)
+            if not results:
+                logger.warning("No %s search result to record a detail page from", source)
+                continue
+            url = results[0]['detail_url']
+            referer = None
+            if source == 'hohoj':
+                # HohoJ details are parsed from the embed page
+                referer = url
+                vid = re.search(r'id=(\d+)', url).group(1)
+                url = f"{crawler.base_url}/embed?id={vid}"
+            detail = await crawler.fetch_html(url, referer=referer)
+            if detail:
+                save(source, 'detail', detail)
+    finally:
+        await manager.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Record benchmark fixtures from the live sites")
+    parser.add_argument('--keyword', default='SSIS', help="search keyword used for search/detail pages")
+    asyncio.run(record(parser.parse_args().keyword))
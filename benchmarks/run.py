@@ -0,0 +1,217 @@
+"""Offline crawler/DB benchmark.
+
+    python -m benchmarks.run [--iterations N] [--latency 0.05,0.2] [--error-rate 0.1]
+                             [--compare benchmarks/results/<old>.json]
+
+Measures parse throughput per crawler on the fixtures, end-to-end
+CrawlerManager.search / crawl_video_detail latency against the local stub
+site, and Database write throughput. Results are written as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Stub prefix and a detail URL shape per source
+SOURCES = {
+    'MissAV': ('missav', '/cn/ssis-001'),
+    'Jable': ('jable', '/videos/ssis-001/'),
+    'HohoJ': ('hohoj', '/video?id=100000'),
+    'Memo': ('memo', '/video/SSIS-001'),
+}
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(pick(0.50) * 1000, 3),
+        'p90_ms': round(pick(0.90) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def bench_parse(manager, fixtures, iterations):
+    results = {}
+    for crawler in manager.crawlers:
+        prefix, detail_path = SOURCES[crawler.source_name]
+        pages = fixtures.get(prefix, {})
+        for kind, html in sorted(pages.items()):
+            if kind == 'detail':
+                parse = lambda h: crawler.parse_detail(h, crawler.base_url + detail_path)
+            elif hasattr(crawler, 'parse_search'):
+                parse = lambda h: crawler.parse_search(h, 'SSIS', limit=30)
+            else:
+                parse = crawler.parse_list
+            parse(html)  # warm-up
+            started = time.perf_counter()
+            for _ in range(iterations):
+                parse(html)
+            elapsed = time.perf_counter() - started
+            results[f"{crawler.source_name}.{kind}"] = {
+                'pages_per_sec': round(iterations / elapsed, 1),
+                'ms_per_page': round(elapsed / iterations * 1000, 3),
+                'mb_per_sec': round(len(html.encode('utf-8')) * iterations / elapsed / 1e6, 2),
+            }
+    return results
+
+
+async def bench_e2e(manager, site, iterations, concurrency):
+    for crawler in manager.crawlers:
+        crawler.base_url = site.base_url(SOURCES[crawler.source_name][0])
+    semaphore = asyncio.Semaphore(concurrency)
+    search_times, detail_times = [], []
+    failures = {'search': 0, 'detail': 0}
+
+    async def timed(samples, kind, coro):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await coro
+            samples.append(time.perf_counter() - started)
+            if not result:
+                failures[kind] += 1
+
+    # Distinct keywords so the search cache never answers
+    await asyncio.gather(*(timed(search_times, 'search', manager.search(f"SSIS-{i:05d}", limit=5))
+                           for i in range(iterations)))
+    detail_urls = [c.base_url + SOURCES[c.source_name][1] for c in manager.crawlers]
+    await asyncio.gather(*(timed(detail_times, 'detail',
+                                 manager.crawl_video_detail(detail_urls[i % len(detail_urls)]))
+                           for i in range(iterations)))
+    return {
+        'search': percentiles(search_times),
+        'crawl_video_detail': percentiles(detail_times),
+        'failures': failures,
+        'stub_requests': site.requests,
+    }
+
+
+async def bench_db(rows):
+    from database import Database
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        videos = [{'code': f"BENCH-{i:06d}", 'title': f"Bench video {i}", 'actresses': 'A, B',
+                   'tags': 'VR, HD', 'duration': 120, 'detail_url': f"https://example/{i}"}
+                  for i in range(rows)]
+
+        started = time.perf_counter()
+        for i in range(0, rows, 500):
+            await db.save_videos(videos[i:i + 500])
+        batched = time.perf_counter() - started
+
+        singles = [dict(v, code='SINGLE-' + v['code']) for v in videos[:max(1, rows // 10)]]
+        started = time.perf_counter()
+        await asyncio.gather(*(db.save_video(v) for v in singles))
+        concurrent = time.perf_counter() - started
+
+        codes = [v['code'] for v in videos[:1000]] + [f"MISS-{i}" for i in range(1000)]
+        started = time.perf_counter()
+        await db.existing_codes(codes)
+        lookup = time.perf_counter() - started
+        scanning = await db.check_query_plans()
+        await db.close()
+    return {
+        'save_videos_rows_per_sec': round(rows / batched, 1),
+        'concurrent_save_video_rows_per_sec': round(len(singles) / concurrent, 1),
+        'existing_codes_2000_ms': round(lookup * 1000, 3),
+        'hot_queries_scanning_tables': scanning,
+    }
+
+
+def flatten(data, prefix=''):
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, name + '.')
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = dict(flatten(json.load(f)))
+    print(f"\nCompared with {baseline_path}:")
+    for name, value in flatten(current):
+        old = baseline.get(name)
+        if old is None or name.startswith('meta.'):
+            continue
+        change = (value - old) / old * 100 if old else 0.0
+        print(f"  {name:60s} {old:>12} -> {value:<12} ({change:+.1f}%)")
+
+
+async def main(args):
+    # Benchmarks measure our own code, not politeness delays or the disk cache
+    os.environ.setdefault('HTTP_CACHE', 'false')
+    if not args.keep_limits:
+        os.environ.setdefault('CRAWLER_RATE', '1000')
+        os.environ.setdefault('CRAWLER_MAX_RATE', '1000')
+        os.environ.setdefault('CRAWLER_CONCURRENCY', str(args.concurrency))
+    sys.path.insert(0, ROOT)
+    from crawler import CrawlerManager
+    from crawlers.parser import BACKEND
+    from benchmarks.stub_server import StubSite, load_fixtures
+
+    low, _, high = args.latency.partition(',')
+    site = StubSite(latency=(float(low), float(high or low)), error_rate=args.error_rate).start()
+    manager = CrawlerManager()
+    try:
+        results = {
+            'meta': {
+                'version': open(os.path.join(ROOT, 'VERSION')).read().strip(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'parser_backend': BACKEND,
+                'latency': args.latency,
+                'error_rate': args.error_rate,
+            },
+            'parse': bench_parse(manager, load_fixtures(), args.parse_iterations),
+            'e2e': await bench_e2e(manager, site, args.iterations, args.concurrency),
+            'db': await bench_db(args.db_rows),
+        }
+    finally:
+        await manager.close()
+        site.stop()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{results['meta']['version']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Siren crawler/DB benchmark")
+    parser.add_argument('--iterations', type=int, default=50, help="end-to-end calls per operation")
+    parser.add_argument('--parse-iterations', type=int, default=200, help="parses per fixture")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent end-to-end calls")
+    parser.add_argument('--latency', default='0.0', help="stub latency in seconds: fixed or min,max")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of stub responses that fail")
+    parser.add_argument('--db-rows', type=int, default=20000)
+    parser.add_argument('--keep-limits', action='store_true', help="keep the configured per-host rate limits")
+    parser.add_argument('--output', help="results file (default benchmarks/results/<version>-<time>.json)")
+    parser.add_argument('--compare', help="previous results file to compare against")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,126 @@
+"""Local stand-in for the four source sites, serving recorded fixtures."""
+import logging
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# source prefix -> [(path regex, fixture name)]; mirrors the crawlers' URL layout
+ROUTES = {
+    'missav': [
+        (r'^/new', 'list'),
+        (r'^/cn/search/', 'search'),
+        (r'^/cn/[^/]+$', 'detail'),
+    ],
+    'jable': [
+        (r'^/latest-updates/', 'list'),
+        (r'^/search/', 'search'),
+        (r'^/videos/', 'detail'),
+    ],
+    'hohoj': [
+        (r'^/search\?', 'search'),
+        (r'^/embed\?id=', 'detail'),
+    ],
+    'memo': [
+        (r'^/browse/search', 'search'),
+        (r'^/video/', 'detail'),
+        (r'^/hls/get_video_info\.php', 'detail'),
+    ],
+}
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """Return {source: {kind: html}} for every fixture on disk"""
+    fixtures = {}
+    for source in ROUTES:
+        source_dir = os.path.join(fixture_dir, source)
+        if not os.path.isdir(source_dir):
+            continue
+        for name in os.listdir(source_dir):
+            kind, ext = os.path.splitext(name)
+            if ext == '.html':
+                with open(os.path.join(source_dir, name), encoding='utf-8') as f:
+                    fixtures.setdefault(source, {})[kind] = f.read()
+    return fixtures
+
+
+class StubSite:
+    """Threaded HTTP server answering http://host:port/<source>/<path>.
+
+    latency is (min, max) seconds added to every response; error_rate is the
+    fraction of requests answered with error_status instead of the fixture.
+    """
+
+    def __init__(self, latency=(0.0, 0.0), error_rate=0.0, error_status=503, fixture_dir=FIXTURE_DIR):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fixtures = load_fixtures(fixture_dir)
+        self.requests = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def base_url(self, source):
+        return f"http://127.0.0.1:{self.port}/{source}"
+
+    def resolve(self, path):
+        source, _, rest = path.lstrip('/').partition('/')
+        rest = '/' + rest
+        for pattern, kind in ROUTES.get(source, ()):
+            if re.search(pattern, rest):
+                return self.fixtures.get(source, {}).get(kind)
+        return None
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests += 1
+                low, high = site.latency
+                if high > 0:
+                    time.sleep(random.uniform(low, high))
+                if site.error_rate and random.random() < site.error_rate:
+                    self.send_response(site.error_status)
+                    self.send_header('Retry-After', '0')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = site.resolve(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-site', daemon=True)
+        self._thread.start()
+        logger.info("Stub site listening on 127.0.0.1:%d", self.port)
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
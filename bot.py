@@ -2,13 +2,23 @@ import os
 import asyncio
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 from dotenv import load_dotenv
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime
 
 from database import Database
 from crawler import MissavCrawler
+from pipeline import VideoPipeline
+from crawlers.health import get_health
+from crawlers.resolve import missing_fields
+from enrichment import EnrichmentQueue
+from scheduler import PollScheduler
+from subscriptions import SubscriptionIndex
+from delivery import DeliveryQueue, INTERACTIVE, MAX_EMBEDS, MAX_EMBED_CHARS
+import metrics
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -18,6 +28,9 @@ load_dotenv()
 
 TOKEN = os.getenv('DISCORD_TOKEN')
 CHANNEL_ID = int(os.getenv('DISCORD_CHANNEL_ID', 0))
+# Announce new videos from their list card and edit in the details later
+PUSH_FIRST = os.getenv('PUSH_FIRST', 'false').lower() == 'true'
+EDITABLE_MESSAGES = 256  # sent messages whose current embeds are remembered for edits
 
 class SirenBot(commands.Bot):
     def __init__(self):
@@ -25,39 +38,132 @@ class SirenBot(commands.Bot):
         intents.message_content = True
         super().__init__(command_prefix="!", intents=intents)
         self.db = Database("data/missav.db")
-        self.crawler = MissavCrawler()
-        self.check_interval = int(os.getenv('CHECK_INTERVAL', 15)) # Minutes
+        self.crawler = MissavCrawler(self.db)
+        self.subscriptions = SubscriptionIndex()
+        self.delivery = DeliveryQueue()
+        self.enricher = EnrichmentQueue(self.crawler, self.db, on_enriched=self.on_video_enriched)
+        # code -> (futures of the messages sent before enrichment, chat_ids notified)
+        self.pending_enrichment = {}
+        self.message_embeds = OrderedDict()  # message id -> embeds as last sent
+        self.metrics_server = metrics.MetricsServer()
+        # One adaptive poll job per source with a new-video list
+        self.scheduler = PollScheduler([c for c in self.crawler.crawlers if c.new_page_url(1)], self.poll_source)
 
     async def setup_hook(self):
+        try:
+            await self.metrics_server.start()
+        except OSError as e:
+            logger.warning("Metrics endpoint disabled: %s", e)
         await self.crawler.init_session()
-        self.check_new_videos.start()
+        await self.subscriptions.load(self.db)
+        self.enricher.start()
+        self.scheduler.start()
         await self.tree.sync()
-        logger.info("Bot commands synced and background task started.")
+        logger.info("Bot commands synced and source polling started.")
+
+    async def close(self):
+        await self.scheduler.close()
+        await self.enricher.close()
+        await self.delivery.close()
+        await super().close()
+        await self.crawler.close()
+        await self.db.close()
+        await self.metrics_server.close()
+
+    async def on_app_command_completion(self, interaction, command):
+        metrics.COMMANDS.inc(command=command.name)
 
     async def on_ready(self):
         logger.info(f'Logged in as {self.user} (ID: {self.user.id})')
 
-    @tasks.loop(minutes=15)
-    async def check_new_videos(self):
-        logger.info("Checking for new videos...")
-        new_videos = await self.crawler.crawl_new_videos(pages=1)
-        for video in new_videos:
-            if not self.db.is_video_exists(video['code']):
-                # Fetch full detail for better notification
-                detail = await self.crawler.crawl_video_detail(video['detail_url'])
-                if detail:
-                    video.update(detail)
-                
-                saved = self.db.save_video(video)
-                if saved and CHANNEL_ID:
-                    await self.push_video_to_channel(video)
+    async def poll_source(self, crawler):
+        """Check one source for new videos; returns how many were new (the scheduler adapts to it),
+        or None if the source's list could not be fetched"""
+        logger.info("Checking %s for new videos...", crawler.source_name)
+        started = time.monotonic()
+        new_videos = await self.crawler.crawl_source_new_videos(crawler, self.db)
+        if new_videos is None:
+            return None
+        await self.crawler.record_sources(new_videos)
+        pipeline = VideoPipeline(self.crawler, self.db, ordered=True, enrich=not PUSH_FIRST,
+                                 sink=self.dispatch_video)
+        saved = await pipeline.run(new_videos)
+        metrics.CHECK_SECONDS.observe(time.monotonic() - started)
+        metrics.NEW_VIDEOS.inc(len(saved))
+        logger.info("%s check finished: %d new of %d listed", crawler.source_name, len(saved), len(new_videos))
+        return len(saved)
+
+    async def dispatch_video(self, video):
+        """Send a new video to the main channel and every matching subscriber.
+
+        In push-first mode a video still missing details goes out right away
+        to the channel and ALL subscribers only; once enriched in the
+        background those messages are edited and actress/tag subscribers,
+        who can't be matched from the card, are notified.
+        """
+        early = PUSH_FIRST and bool(missing_fields(video))
+        recipients = set(self.subscriptions.all_chats) if early else self.subscriptions.match(video)
+        sent = []
+        if CHANNEL_ID:
+            sent.append(await self.push_video_to_channel(video))
+        for chat_id in recipients:
+            sent.append(await self.push_video_to_chat(chat_id, video))
+        if early:
+            self.pending_enrichment[video['code']] = ([f for f in sent if f is not None], recipients)
+            self.enricher.submit(video)
+
+    async def on_video_enriched(self, video, filled):
+        futures, notified = self.pending_enrichment.pop(video['code'], ([], set()))
+        if not filled:
+            return
+        embed = self.create_video_embed(video)
+        for future in futures:
+            future.add_done_callback(lambda f, code=video['code']: self._edit_sent(f, code, embed))
+        for chat_id in self.subscriptions.match(video) - notified:
+            await self.push_video_to_chat(chat_id, video)
+
+    def _edit_sent(self, future, code, embed):
+        """Replace the embed for code in a sent message with its enriched version"""
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        message = future.result()
+        embeds = self.message_embeds.pop(message.id, None) or list(message.embeds)
+        for i, sent in enumerate(embeds):
+            if any(field.name == "番号" and field.value == code for field in sent.fields):
+                embeds[i] = embed
+                break
+        else:
+            return
+        # Messages can pack several videos; later edits must start from this one
+        self.message_embeds[message.id] = embeds
+        while len(self.message_embeds) > EDITABLE_MESSAGES:
+            self.message_embeds.popitem(last=False)
+        self.delivery.edit(message, embeds)
+
+    async def push_video_to_chat(self, chat_id, video):
+        async def on_sent(error):
+            if error is None:
+                await self.db.record_push(video['code'], chat_id, "SUCCESS")
+            else:
+                await self.db.record_push(video['code'], chat_id, "FAILED", str(error))
+
+        try:
+            if self.subscriptions.chat_types.get(chat_id) == "USER":
+                target = self.get_user(chat_id) or await self.fetch_user(chat_id)
+            else:
+                target = self.get_channel(chat_id) or await self.fetch_channel(chat_id)
+        except discord.HTTPException as e:
+            logger.warning("Push of %s to %s failed: %s", video.get('code'), chat_id, e)
+            await on_sent(e)
+            return None
+        return self.delivery.submit(target, [self.create_video_embed(video)], on_sent=on_sent)
 
     async def push_video_to_channel(self, video):
         channel = self.get_channel(CHANNEL_ID)
-        if not channel: return
+        if not channel: return None
         
         embed = self.create_video_embed(video)
-        await channel.send(content="@everyone 发现新片！" if os.getenv('PING_EVERYONE') == 'true' else None, embed=embed)
+        return self.delivery.submit(channel, [embed], content="@everyone 发现新片！" if os.getenv('PING_EVERYONE') == 'true' else None)
 
     def create_video_embed(self, video):
         embed = discord.Embed(
@@ -115,6 +221,8 @@ async def help(interaction: discord.Interaction):
 📌 **查询命令**
 - `/search [keyword]` - 搜索视频
 - `/latest [count]` - 查看最新视频
+- `/actress [name] [count]` - 查看本地收录的演员作品
+- `/tags` - 查看热门标签统计
 - `/status` - 机器人状态
 
 📌 **手动爬取**
@@ -128,34 +236,121 @@ async def help(interaction: discord.Interaction):
 @app_commands.describe(count="显示的视频数量")
 async def latest(interaction: discord.Interaction, count: int = 5):
     await interaction.response.defer()
-    videos = bot.db.get_latest_videos(limit=count)
+    videos = await bot.db.get_latest_videos(limit=count)
     if not videos:
         await interaction.followup.send("数据库中暂无视频记录。")
         return
         
-    for video in videos:
-        embed = bot.create_video_embed(video)
-        await interaction.followup.send(embed=embed)
+    embeds = [bot.create_video_embed(video) for video in videos]
+    await bot.delivery.send(interaction.followup, embeds, priority=INTERACTIVE)
+
+@bot.tree.command(name="actress", description="查看本地收录的演员作品")
+@app_commands.describe(name="演员姓名", count="显示的视频数量")
+async def actress(interaction: discord.Interaction, name: str, count: int = 5):
+    await interaction.response.defer()
+    videos = await bot.db.get_videos_by_actress(name, limit=count)
+    if not videos:
+        await interaction.followup.send(f"数据库中暂无演员 {name} 的作品。")
+        return
+
+    embeds = [bot.create_video_embed(video) for video in videos]
+    await bot.delivery.send(interaction.followup, embeds, priority=INTERACTIVE)
+
+@bot.tree.command(name="tags", description="查看热门标签统计")
+async def tags(interaction: discord.Interaction):
+    stats = await bot.db.tag_stats(limit=20)
+    if not stats:
+        await interaction.response.send_message("数据库中暂无标签记录。")
+        return
+
+    lines = ["🏷️ **热门标签:**"] + [f"- {tag}: {count} 部" for tag, count in stats]
+    await interaction.response.send_message("\n".join(lines))
+
+def metrics_summary():
+    """Short text summary of the metrics registry for /status"""
+    lines = ["📊 **数据源请求** (次数 / 平均 / P95 / 错误 / 熔断状态)"]
+    errors = metrics.FETCH_ERRORS.series()
+    failed = {}
+    for (source, code), n in metrics.FETCH_RESPONSES.series().items():
+        if code not in ('200', '304'):
+            failed[source] = failed.get(source, 0) + n
+    for crawler in bot.crawler.crawlers:
+        source = crawler.source_name
+        count, mean, p95 = metrics.FETCH_SECONDS.summary(source=source)
+        bad = errors.get((source,), 0) + failed.get(source, 0)
+        health = get_health(source)
+        lines.append(f"- {source}: {count} / {mean * 1000:.0f}ms / ≤{p95 * 1000:.0f}ms / {bad} / "
+                     f"{health.state} ({health.score:.2f})")
+
+    db_ops = metrics.DB_SECONDS.series()
+    db_count = sum(count for _, _, count in db_ops.values())
+    db_total = sum(total for _, total, _ in db_ops.values())
+    lines.append(f"🗄️ 数据库: {db_count} 次操作, 平均 {db_total / db_count * 1000 if db_count else 0:.1f}ms, "
+                 f"排队 {metrics.DB_QUEUE_DEPTH.series().get((), 0)}")
+
+    sends = metrics.SEND_SECONDS.series()
+    send_count = sum(count for _, _, count in sends.values())
+    send_total = sum(total for _, total, _ in sends.values())
+    stats = bot.delivery.stats
+    lines.append(f"📨 Discord 发送: {stats['messages']} 条, 编辑 {stats['edits']} 次, "
+                 f"平均 {send_total / send_count * 1000 if send_count else 0:.0f}ms, "
+                 f"429 {stats['rate_limited']} 次, 失败 {stats['failed']} 次")
+    if PUSH_FIRST:
+        lines.append(f"🧩 后台补全: 排队 {metrics.ENRICH_QUEUE_DEPTH.series().get((), 0)}, "
+                     f"完成 {metrics.ENRICH_TOTAL.value(outcome='enriched')}, "
+                     f"放弃 {metrics.ENRICH_TOTAL.value(outcome='failed')}")
+
+    checks, check_mean, _ = metrics.CHECK_SECONDS.summary()
+    lines.append(f"🆕 新片检查: {checks} 次, 平均 {check_mean:.1f}s, 共入库 {metrics.NEW_VIDEOS.total()} 部")
+    return "\n".join(lines)
 
 @bot.tree.command(name="status", description="查看机器人状态")
 async def status(interaction: discord.Interaction):
     crawler_count = len(bot.crawler.crawlers)
-    status_text = f"🤖 **机器人状态**\n\n✅ 运行中\n📡 活跃数据源: {crawler_count} 个\n⏰ 检查频率: {bot.check_interval} 分钟"
+    cache = bot.crawler.search_cache.stats
+    schedule = "\n".join(
+        f"  • {source}: 每 {interval:.0f} 分钟, {remaining:.0f} 分钟后检查"
+        + (f", 上次新增 {last_new} 部" if last_new is not None else "")
+        for source, interval, remaining, last_new in bot.scheduler.describe())
+    status_text = (
+        f"🤖 **机器人状态**\n\n✅ 运行中\n📡 活跃数据源: {crawler_count} 个\n⏰ 新片轮询:\n{schedule}\n"
+        f"🗂️ 搜索缓存: 命中 {cache['hits']} / 空结果命中 {cache['negative_hits']} / "
+        f"未命中 {cache['misses']} / 合并请求 {cache['coalesced']}\n\n"
+        f"{metrics_summary()}"
+    )
     await interaction.response.send_message(status_text)
 
 @bot.tree.command(name="search", description="全网搜索视频")
 @app_commands.describe(keyword="关键词 (支持番号或名称)")
 async def search(interaction: discord.Interaction, keyword: str):
     await interaction.response.defer()
-    results = await bot.crawler.search(keyword, limit=5)
-    
-    if not results:
+    # Render progressively: first source's results are sent, later ones edit them
+    # in, up to what one message can hold
+    embeds = []
+    chars = 0
+    message = None
+    edited = None
+    async for batch in bot.crawler.search_stream(keyword, limit=5):
+        added = False
+        for video in batch:
+            embed = bot.create_video_embed(video)
+            if len(embeds) >= MAX_EMBEDS or chars + len(embed) > MAX_EMBED_CHARS:
+                break
+            embeds.append(embed)
+            chars += len(embed)
+            added = True
+        if not added:
+            continue
+        if message is None:
+            message = await bot.delivery.send(interaction.followup, embeds, priority=INTERACTIVE)
+        else:
+            # Queued edits of the message collapse into the latest one
+            edited = bot.delivery.edit(message, list(embeds))
+
+    if edited is not None:
+        await edited
+    if message is None:
         await interaction.followup.send(f"🔍 全网未找到相关视频: {keyword}")
-        return
-        
-    for v in results:
-        embed = bot.create_video_embed(v)
-        await interaction.followup.send(embed=embed)
 
 @bot.tree.command(name="crawl_code", description="手动爬取特定番号 (全网搜)")
 @app_commands.describe(code="番号 (如 SSIS-001)")
@@ -163,37 +358,41 @@ async def crawl_code(interaction: discord.Interaction, code: str):
     await interaction.response.defer()
     video = await bot.crawler.crawl_video_detail(code) # Now it will search all sources
     if video:
-        bot.db.save_video(video)
+        await bot.db.save_video(video)
         embed = bot.create_video_embed(video)
-        await interaction.followup.send(content="✅ 爬取成功！", embed=embed)
+        await bot.delivery.send(interaction.followup, [embed], content="✅ 爬取成功！", priority=INTERACTIVE)
     else:
         await interaction.followup.send(f"❌ 未找到番号: {code}")
 
 @bot.tree.command(name="subscribe", description="订阅全部新片")
 async def subscribe(interaction: discord.Interaction):
-    bot.db.subscribe(interaction.user.id, "USER", "ALL")
+    await bot.db.subscribe(interaction.user.id, "USER", "ALL")
+    bot.subscriptions.add(interaction.user.id, "USER", "ALL")
     await interaction.response.send_message("✅ 已开启全部新片订阅通知！")
 
 @bot.tree.command(name="subscribe_actress", description="订阅指定演员")
 @app_commands.describe(name="演员姓名")
 async def subscribe_actress(interaction: discord.Interaction, name: str):
-    bot.db.subscribe(interaction.user.id, "USER", "ACTRESS", name)
+    await bot.db.subscribe(interaction.user.id, "USER", "ACTRESS", name)
+    bot.subscriptions.add(interaction.user.id, "USER", "ACTRESS", name)
     await interaction.response.send_message(f"✅ 已订阅演员: {name}。有新作会立即通知你！")
 
 @bot.tree.command(name="subscribe_tag", description="订阅指定标签")
 @app_commands.describe(tag="标签名称")
 async def subscribe_tag(interaction: discord.Interaction, tag: str):
-    bot.db.subscribe(interaction.user.id, "USER", "TAG", tag)
+    await bot.db.subscribe(interaction.user.id, "USER", "TAG", tag)
+    bot.subscriptions.add(interaction.user.id, "USER", "TAG", tag)
     await interaction.response.send_message(f"✅ 已订阅标签: {tag}。有相关作品会立即通知你！")
 
 @bot.tree.command(name="unsubscribe", description="取消全部订阅")
 async def unsubscribe(interaction: discord.Interaction):
-    bot.db.unsubscribe(interaction.user.id)
+    await bot.db.unsubscribe(interaction.user.id)
+    bot.subscriptions.remove(interaction.user.id)
     await interaction.response.send_message("🔕 已取消所有订阅通知。")
 
 @bot.tree.command(name="list", description="查看当前订阅")
 async def list_subs(interaction: discord.Interaction):
-    subs = bot.db.get_subscriptions(interaction.user.id)
+    subs = await bot.db.get_subscriptions(interaction.user.id)
     if not subs:
         await interaction.response.send_message("你目前还没有任何订阅。")
         return
@@ -216,13 +415,8 @@ async def crawl_actor(interaction: discord.Interaction, name: str, limit: int =
         await interaction.followup.send(f"❌ 未找到演员 {name} 的作品。")
         return
     
-    count = 0
-    for v in results:
-        if not bot.db.is_video_exists(v['code']):
-            detail = await bot.crawler.crawl_video_detail(v['detail_url'])
-            if detail: v.update(detail)
-            bot.db.save_video(v)
-            count += 1
+    saved = await VideoPipeline(bot.crawler, bot.db).run(results)
+    count = len(saved)
             
     await interaction.followup.send(f"✅ 爬取完成！共为演员 {name} 更新了 {count} 部作品。")
 
@@ -235,13 +429,8 @@ async def crawl_search(interaction: discord.Interaction, keyword: str, limit: in
         await interaction.followup.send(f"❌ 未找到关键词 {keyword} 的相关视频。")
         return
     
-    count = 0
-    for v in results:
-        if not bot.db.is_video_exists(v['code']):
-            detail = await bot.crawler.crawl_video_detail(v['detail_url'])
-            if detail: v.update(detail)
-            bot.db.save_video(v)
-            count += 1
+    saved = await VideoPipeline(bot.crawler, bot.db).run(results)
+    count = len(saved)
             
     await interaction.followup.send(f"✅ 爬取完成！共为关键词 {keyword} 更新了 {count} 个视频。")
 
@@ -0,0 +1,314 @@
+"""Command-line tools that work on the catalog without the Discord bot.
+
+    python cli.py backfill --new-pages 20
+    python cli.py backfill --actress 三上悠亜 --actress 河北彩花 --concurrency 4
+    python cli.py backfill --keywords-file keywords.txt --job keywords
+    python cli.py export catalog.ndjson.gz --since 2026-01-01 --source MissAV
+    python cli.py import catalog.ndjson.gz
+
+Backfill progress is checkpointed in the database per job, so an
+interrupted run picks up where it stopped when started again with the same
+job name (--restart starts the job over).
+
+Export and import stream rows (NDJSON or CSV, gzip when the file name ends
+in .gz) and use constant memory whatever the catalog size.
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Settings are read from the environment when the modules below are imported
+load_dotenv()
+
+from crawler import CrawlerManager  # noqa: E402
+from crawlers.resolve import normalize_code  # noqa: E402
+from database import CATALOG_COLUMNS, Database  # noqa: E402
+from pipeline import VideoPipeline  # noqa: E402
+
+logger = logging.getLogger('siren.cli')
+
+DEFAULT_DB = 'data/missav.db'
+PROGRESS_INTERVAL = 10.0  # seconds between progress lines
+
+
+class Backfill:
+    """Walks streams of list pages and feeds them through the pipeline.
+
+    A stream is one source's new-video list or one search term on one
+    source. Streams run concurrently (at most concurrency at a time); pages
+    within a stream run in order, and each finished page is checkpointed.
+    """
+
+    def __init__(self, manager, db, job, concurrency=4, max_pages=20):
+        self.manager = manager
+        self.db = db
+        self.job = job
+        self.concurrency = max(1, concurrency)
+        self.max_pages = max_pages
+        self.stats = {'streams': 0, 'finished': 0, 'pages': 0, 'listed': 0, 'saved': 0, 'failed': 0}
+        self.started = time.monotonic()
+
+    def streams(self, new_pages=0, actresses=(), keywords=()):
+        """[(stream name, crawler, fetch_page(page), last page)]"""
+        streams = []
+        if new_pages:
+            for crawler in self.manager.crawlers:
+                if crawler.new_page_url(1):
+                    streams.append((f"new/{crawler.source_name}", crawler, crawler.crawl_new_page, new_pages))
+        for kind, terms in (('actress', actresses), ('keyword', keywords)):
+            for term in dict.fromkeys(terms):
+                for crawler in self.manager.crawlers:
+                    fetch = lambda page, c=crawler, t=term: c.crawl_search_page(t, page)
+                    streams.append((f"{kind}/{term}/{crawler.source_name}", crawler, fetch, self.max_pages))
+        return streams
+
+    async def run(self, streams):
+        progress = await self.db.get_backfill_progress(self.job)
+        pending = [s for s in streams if not progress.get(s[0], {}).get('done')]
+        skipped = len(streams) - len(pending)
+        if skipped:
+            logger.info("Job %s: %d of %d streams already finished", self.job, skipped, len(streams))
+        self.stats['streams'] = len(pending)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_stream(stream):
+            async with semaphore:
+                try:
+                    await self._run_stream(*stream, progress.get(stream[0], {}))
+                except Exception as e:
+                    # The checkpoint stays on the stream's last finished page
+                    self.stats['failed'] += 1
+                    logger.error("%s failed: %s", stream[0], e)
+
+        reporter = asyncio.create_task(self._report())
+        try:
+            await asyncio.gather(*(run_stream(s) for s in pending))
+        finally:
+            reporter.cancel()
+        self._log_progress(final=True)
+        return self.stats
+
+    async def _run_stream(self, name, crawler, fetch_page, last_page, checkpoint):
+        page = checkpoint.get('page', 0)
+        saved = checkpoint.get('videos', 0)
+        if page:
+            logger.info("Resuming %s after page %d", name, page)
+        previous = None
+        done = False
+        while not done and page < last_page:
+            listed = await fetch_page(page + 1)
+            if listed is None:
+                # Leave the checkpoint on the last good page for the next run
+                self.stats['failed'] += 1
+                logger.warning("%s page %d failed, stopping this stream", name, page + 1)
+                return
+            codes = [v.get('code') for v in listed]
+            # Past the last page some sites repeat it instead of answering empty
+            done = not listed or codes == previous
+            if not done:
+                await self.manager.record_sources(listed, self.db)
+                results = await VideoPipeline(self.manager, self.db).run(listed)
+                saved += len(results)
+                self.stats['listed'] += len(listed)
+                self.stats['saved'] += len(results)
+            previous = codes
+            page += 1
+            self.stats['pages'] += 1
+            await self.db.set_backfill_progress(self.job, name, page, done or page >= last_page, saved)
+        self.stats['finished'] += 1
+        logger.info("Finished %s: %d page(s), %d video(s) saved", name, page, saved)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            self._log_progress()
+
+    def _log_progress(self, final=False):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        s = self.stats
+        logger.info("%s %d/%d streams, %d pages (%.2f/s), %d listed, %d saved (%.2f/s), %d failed, %.0fs",
+                    "Done:" if final else "Progress:", s['finished'], s['streams'], s['pages'],
+                    s['pages'] / elapsed, s['listed'], s['saved'], s['saved'] / elapsed, s['failed'], elapsed)
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+async def backfill(args):
+    actresses = list(args.actress or [])
+    keywords = list(args.keyword or [])
+    if args.actresses_file:
+        actresses += read_lines(args.actresses_file)
+    if args.keywords_file:
+        keywords += read_lines(args.keywords_file)
+    if not (args.new_pages or actresses or keywords):
+        raise SystemExit("Nothing to backfill: give --new-pages, --actress or --keyword")
+
+    db = Database(args.db)
+    manager = CrawlerManager(db)
+    try:
+        if args.restart:
+            await db.clear_backfill_progress(args.job)
+        await manager.init_session()
+        job = Backfill(manager, db, args.job, concurrency=args.concurrency, max_pages=args.max_pages)
+        stats = await job.run(job.streams(args.new_pages, actresses, keywords))
+    finally:
+        await manager.close()
+        await db.close()
+    return 1 if stats['failed'] else 0
+
+
+def open_catalog(path, mode, compress=None):
+    """Text stream for path ('-' is stdin/stdout), gzip-compressed for .gz names"""
+    if compress is None:
+        compress = path.endswith('.gz')
+    if path == '-':
+        stream = sys.stdout.buffer if mode == 'w' else sys.stdin.buffer
+        if compress:
+            stream = gzip.GzipFile(fileobj=stream, mode=mode + 'b')
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def catalog_format(path, fmt):
+    if fmt:
+        return fmt
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def read_catalog(f, fmt):
+    """Yield video dicts from an NDJSON or CSV catalog"""
+    if fmt == 'csv':
+        for row in csv.DictReader(f):
+            video = {column: row.get(column) or None for column in CATALOG_COLUMNS}
+            if video['duration']:
+                video['duration'] = int(float(video['duration']))
+            video['sources'] = json.loads(row['sources']) if row.get('sources') else {}
+            yield video
+        return
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def source_url(source):
+    """(source name, base URL) of the crawler named source (case-insensitive)"""
+    for crawler in CrawlerManager().crawlers:
+        if crawler.source_name.lower() == source.lower():
+            return crawler.source_name, crawler.base_url + '/'
+    return source, None
+
+
+async def export(args):
+    fmt = catalog_format(args.output, args.format)
+    source, url = source_url(args.source) if args.source else (None, None)
+    db = Database(args.db)
+    count = 0
+    started = time.monotonic()
+    try:
+        with open_catalog(args.output, 'w', args.gzip or None) as f:
+            writer = None
+            if fmt == 'csv':
+                writer = csv.DictWriter(f, fieldnames=CATALOG_COLUMNS + ('sources',))
+                writer.writeheader()
+            async for video in db.iter_videos(args.since, args.until, source=source, source_url=url,
+                                              batch=args.batch):
+                if writer is not None:
+                    video['sources'] = json.dumps(video['sources'], ensure_ascii=False) if video['sources'] else ''
+                    writer.writerow(video)
+                else:
+                    f.write(json.dumps(video, ensure_ascii=False) + '\n')
+                count += 1
+    finally:
+        await db.close()
+    logger.info("Exported %d videos to %s in %.1fs", count, args.output, time.monotonic() - started)
+    return 0
+
+
+async def import_catalog(args):
+    fmt = catalog_format(args.input, args.format)
+    db = Database(args.db)
+    count = skipped = 0
+    started = time.monotonic()
+    try:
+        with open_catalog(args.input, 'r', args.gzip or None) as f:
+            videos = read_catalog(f, fmt)
+            while True:
+                chunk = list(itertools.islice(videos, args.batch))
+                if not chunk:
+                    break
+                batch = []
+                for video in chunk:
+                    code = normalize_code(video.get('code')) or (video.get('code') or '').strip().upper()
+                    if not code:
+                        skipped += 1
+                        continue
+                    video['code'] = code
+                    batch.append(video)
+                count += await db.upsert_videos(batch)
+                logger.info("Imported %d videos (%.0f/s)", count, count / max(time.monotonic() - started, 1e-9))
+    finally:
+        await db.close()
+    logger.info("Imported %d videos from %s in %.1fs (%d without a code skipped)",
+                count, args.input, time.monotonic() - started, skipped)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Siren catalog tools")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"database file (default {DEFAULT_DB})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('backfill', help="crawl new-video pages or whole search result sets into the database")
+    p.add_argument('--new-pages', type=int, default=0, metavar='N', help="walk N pages of every source's new-video list")
+    p.add_argument('--actress', action='append', metavar='NAME', help="actress to backfill (repeatable)")
+    p.add_argument('--actresses-file', metavar='PATH', help="file with one actress per line")
+    p.add_argument('--keyword', action='append', metavar='TEXT', help="search keyword to backfill (repeatable)")
+    p.add_argument('--keywords-file', metavar='PATH', help="file with one keyword per line")
+    p.add_argument('--max-pages', type=int, default=20, help="search result pages per term and source (default 20)")
+    p.add_argument('--concurrency', type=int, default=4, help="streams crawled at once (default 4)")
+    p.add_argument('--job', default='default', help="checkpoint name; rerun with the same name to resume")
+    p.add_argument('--restart', action='store_true', help="discard the job's checkpoints first")
+    p.set_defaults(handler=backfill)
+
+    p = commands.add_parser('export', help="stream the video catalog to NDJSON or CSV")
+    p.add_argument('output', help="output file ('-' for stdout); .gz names are compressed")
+    p.add_argument('--format', choices=('ndjson', 'csv'), help="default: from the file name, else ndjson")
+    p.add_argument('--gzip', action='store_true', help="compress even without a .gz name")
+    p.add_argument('--since', metavar='DATE', help="only videos stored on or after DATE (ISO, e.g. 2026-01-01)")
+    p.add_argument('--until', metavar='DATE', help="only videos stored before DATE")
+    p.add_argument('--source', help="only videos seen on this source (e.g. MissAV)")
+    p.add_argument('--batch', type=int, default=1000, help="rows fetched per read (default 1000)")
+    p.set_defaults(handler=export)
+
+    p = commands.add_parser('import', help="upsert videos from an NDJSON or CSV catalog")
+    p.add_argument('input', help="input file ('-' for stdin); .gz names are decompressed")
+    p.add_argument('--format', choices=('ndjson', 'csv'), help="default: from the file name, else ndjson")
+    p.add_argument('--gzip', action='store_true', help="decompress even without a .gz name")
+    p.add_argument('--batch', type=int, default=5000, help="rows per transaction (default 5000)")
+    p.set_defaults(handler=import_catalog)
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args(argv)
+    return asyncio.run(args.handler(args))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
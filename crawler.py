@@ -1,20 +1,42 @@
 import asyncio
 import logging
+import os
+from contextlib import aclosing
+from datetime import datetime, timedelta
 from crawlers.missav import MissavCrawler as Missav
 from crawlers.jable import JableCrawler as Jable
 from crawlers.hohoj import HohoJCrawler as HohoJ
 from crawlers.memo import MemoCrawler as Memo
+from crawlers.search_cache import SearchCache, normalize_keyword
+from crawlers.health import get_health
+from crawlers.ratelimit import get_limiter
+from crawlers.resolve import merge_video, missing_fields, normalize_code
+from crawlers.sessions import close_pools
+from crawlers.executor import shutdown_executor
 
 logger = logging.getLogger(__name__)
 
+# Pages walked per source when catching up after downtime
+NEW_VIDEOS_MAX_PAGES = int(os.getenv('NEW_VIDEOS_MAX_PAGES', 10))
+# Codes remembered per source; must cover more than one list page
+WATERMARK_SIZE = 200
+# Local search results whose newest match was stored longer ago than this
+# (hours) are topped up from the remote sources
+SEARCH_LOCAL_MAX_AGE = float(os.getenv('SEARCH_LOCAL_MAX_AGE', 72))
+# Cost multiplier for detail URLs derived from a code rather than seen on the site
+GUESSED_URL_PENALTY = 2.0
+
 class CrawlerManager:
-    def __init__(self):
+    def __init__(self, db=None):
+        # Optional Database consulted before the remote sources
+        self.db = db
         self.crawlers = [
             Missav(),
             Jable(),
             HohoJ(),
             Memo()
         ]
+        self.search_cache = SearchCache()
 
     async def init_session(self):
         # Warm up all crawlers (visit homepage, set cookies)
@@ -22,25 +44,261 @@ class CrawlerManager:
         await asyncio.gather(*tasks)
         logger.info("All crawlers warmed up.")
 
-    async def crawl_new_videos(self, pages=1):
-        # By default, we use MissAV for the main "new videos" feed
-        # but we could merge from others later.
-        main_crawler = self.crawlers[0] # Missav
-        return await main_crawler.crawl_new_videos(pages=pages)
+    def available_crawlers(self, crawlers=None):
+        """Crawlers whose circuit currently lets requests through, healthiest first"""
+        crawlers = [c for c in (crawlers or self.crawlers) if get_health(c.source_name).available]
+        return sorted(crawlers, key=lambda c: get_health(c.source_name).score, reverse=True)
+
+    async def crawl_new_videos(self, db=None, max_pages=NEW_VIDEOS_MAX_PAGES):
+        """Incrementally crawl every source that has a new-video list"""
+        db = db or self.db
+        sources = [crawler for crawler in self.available_crawlers() if crawler.new_page_url(1)]
+        results = await asyncio.gather(
+            *(self.crawl_source_new_videos(crawler, db, max_pages) for crawler in sources),
+            return_exceptions=True)
+        merged = []
+        for crawler, result in zip(sources, results):
+            if isinstance(result, Exception):
+                logger.error("%s new-video crawl failed: %s", crawler.source_name, result)
+                continue
+            merged.extend(result or [])
+        await self.record_sources(merged, db)
+        return merged
+
+    async def crawl_source_new_videos(self, crawler, db, max_pages=NEW_VIDEOS_MAX_PAGES):
+        """Return the cards of the new-video pages down to the stored watermark,
+        or None if page 1 could not be fetched.
+
+        Page 1 is fetched alone, so a poll with nothing new costs one request.
+        Otherwise later pages are fetched in windows of the host's concurrency
+        until a page ends in already-seen codes. The watermark only advances
+        once that boundary is reached (or max_pages is exhausted), so a failed
+        or interrupted crawl resumes the catch-up on the next poll. Without a
+        watermark only page 1 is read, to seed it. Already-seen cards on the
+        walked pages are returned too; the pipeline dedupes them.
+        """
+        source = crawler.source_name
+        watermark = await db.get_watermark(source)
+        known = set(watermark)
+        last_page = max_pages if known else 1
+        window = get_limiter(crawler.base_url).concurrency
+
+        videos = []
+        page = 1
+        reached = False
+        while page <= last_page and not reached:
+            count = 1 if page == 1 else min(window, last_page - page + 1)
+            batch = await asyncio.gather(*(crawler.crawl_new_page(p) for p in range(page, page + count)))
+            for listed in batch:
+                if listed is None:
+                    if page == 1:
+                        logger.warning("%s new-video page 1 failed", source)
+                        return None
+                    logger.warning("%s new-video page %d failed, catch-up resumes next poll", source, page)
+                    return videos
+                page += 1
+                videos.extend(listed)
+                if not listed or listed[-1]['code'] in known:
+                    reached = True
+                    break
+        if known and not reached:
+            logger.warning("%s catch-up stopped after %d pages, older videos were skipped", source, last_page)
+
+        codes = list(dict.fromkeys([v['code'] for v in videos] + watermark))
+        await db.set_watermark(source, codes[:WATERMARK_SIZE])
+        logger.info("%s new-video crawl: %d cards from %d page(s)", source, len(videos), page - 1)
+        return videos
 
     async def search(self, keyword, limit=5):
-        tasks = [crawler.search(keyword, limit=limit) for crawler in self.crawlers]
-        results = await asyncio.gather(*tasks)
-        
-        # Merge results and deduplicate by code
-        merged = {}
-        for res_list in results:
-            for video in res_list:
-                code = video.get('code')
-                if code and code not in merged:
-                    merged[code] = video
-        
-        return list(merged.values())[:limit]
+        merged = []
+        async for batch in self._search_remote_stream(keyword, limit):
+            merged.extend(batch)
+        return merged
+
+    async def _search_source(self, crawler, keyword, limit, deadline):
+        try:
+            return await asyncio.wait_for(crawler.search(keyword, limit=limit), deadline)
+        except asyncio.TimeoutError:
+            logger.warning("%s search for %r exceeded %.1fs deadline", crawler.source_name, keyword, deadline)
+        except Exception as e:
+            logger.error("%s search for %r failed: %s", crawler.source_name, keyword, e)
+        return []
+
+    async def search_local(self, keyword, limit=5):
+        """Return (videos, sufficient) from the local full-text index.
+
+        Results are sufficient when there are limit of them and the newest was
+        stored within SEARCH_LOCAL_MAX_AGE hours.
+        """
+        if self.db is None:
+            return [], False
+        videos = await self.db.search_videos(keyword, limit)
+        if len(videos) < limit:
+            return videos, False
+        newest = max(v['created_time'] or '' for v in videos)
+        cutoff = (datetime.now() - timedelta(hours=SEARCH_LOCAL_MAX_AGE)).isoformat()
+        return videos, newest >= cutoff
+
+    async def search_stream(self, keyword, limit=5, deadlines=None):
+        """Yield batches of unique results: stored matches first, then remote ones.
+
+        The remote sources are only queried when the local index can't answer
+        (see search_local). Each source runs under its own deadline
+        (crawler.SEARCH_DEADLINE unless overridden in deadlines by source
+        name). Remaining sources are cancelled once limit unique codes have
+        been yielded.
+        """
+        local, sufficient = await self.search_local(keyword, limit)
+        if local:
+            yield local
+        if sufficient:
+            return
+        # The remote stream runs to its own end so its result set gets cached
+        seen = {v['code'] for v in local}
+        async with aclosing(self._search_remote_stream(keyword, limit, deadlines)) as remote:
+            async for batch in remote:
+                batch = [v for v in batch if v['code'] not in seen][:limit - len(seen)]
+                if batch:
+                    seen.update(v['code'] for v in batch)
+                    yield batch
+
+    async def _search_remote_stream(self, keyword, limit, deadlines=None):
+        # Identical concurrent searches share one fan-out through the cache;
+        # a completed fan-out is cached
+        if not self.available_crawlers():
+            # Every circuit is open; don't cache an empty answer for this
+            logger.warning("No source available for search %r", keyword)
+            return
+        key = (normalize_keyword(keyword), limit)
+        async with aclosing(self.search_cache.stream(key, lambda: self._fetch_remote(keyword, limit, deadlines))) as batches:
+            async for batch in batches:
+                yield batch
+
+    async def _fetch_remote(self, keyword, limit, deadlines):
+        merged = []
+        async for batch in self._stream(keyword, limit, deadlines):
+            merged.extend(batch)
+            yield batch
+        await self.record_sources(merged)
+
+    async def _stream(self, keyword, limit, deadlines=None):
+        # Open-circuit sources are skipped instead of costing every search a timeout
+        deadlines = deadlines or {}
+        tasks = [
+            asyncio.ensure_future(self._search_source(
+                crawler, keyword, limit, deadlines.get(crawler.source_name, crawler.SEARCH_DEADLINE)))
+            for crawler in self.available_crawlers()
+        ]
+        # A code another source already returned is merged into the first
+        # record (filling gaps, noting the URL) instead of being dropped
+        seen = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                batch = []
+                for video in await next_done:
+                    code = normalize_code(video.get('code'))
+                    if not code:
+                        continue
+                    if code in seen:
+                        merge_video(seen[code], video)
+                    elif len(seen) < limit:
+                        video['code'] = code
+                        seen[code] = merge_video(video, {})
+                        batch.append(video)
+                if batch:
+                    yield batch
+                if len(seen) >= limit:
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def record_sources(self, videos, db=None):
+        """Store the detail URL of every source each video was seen on"""
+        db = db or self.db
+        if db is None:
+            return
+        rows = {}
+        for video in videos:
+            code = normalize_code(video.get('code'))
+            if not code:
+                continue
+            if video.get('source') and video.get('detail_url'):
+                rows[(code, video['source'])] = video['detail_url']
+            for source, url in (video.get('sources') or {}).items():
+                rows[(code, source)] = url
+        try:
+            await db.add_video_sources([(code, source, url) for (code, source), url in rows.items()])
+        except Exception as e:
+            logger.error("Recording video sources failed: %s", e)
+
+    def _detail_candidates(self, code, sources):
+        """[(crawler, url, cost)] for every healthy source that could describe code"""
+        candidates = []
+        for crawler in self.available_crawlers():
+            url = sources.get(crawler.source_name)
+            penalty = 1.0
+            if not url:
+                url = crawler.detail_url_for(code)
+                penalty = GUESSED_URL_PENALTY
+            if not url or not crawler.DETAIL_FIELDS:
+                continue
+            health = get_health(crawler.source_name)
+            # Expected seconds per useful answer: requests x latency, over success rate
+            cost = crawler.DETAIL_REQUESTS * (health.latency or 1.0) / max(health.success_rate, 0.1) * penalty
+            candidates.append((crawler, url, cost))
+        return candidates
+
+    async def enrich_video(self, video):
+        """Fill the video's missing detail fields in place; returns the video.
+
+        Each step fetches the cheapest healthy source whose detail page
+        covers everything still missing, or failing that the one covering
+        the most missing fields per unit of cost, until nothing is missing
+        or no source can add anything. Known source URLs (from the video and
+        video_sources) are preferred over URLs derived from the code.
+        """
+        code = normalize_code(video.get('code'))
+        if not code:
+            return video
+        video['code'] = code
+        merge_video(video, {})
+        missing = missing_fields(video)
+        if not missing:
+            return video
+        sources = dict(video['sources'])
+        if self.db is not None:
+            for source, url in (await self.db.get_video_sources(code)).items():
+                sources.setdefault(source, url)
+
+        candidates = self._detail_candidates(code, sources)
+        fetched = {}
+        while missing:
+            useful = [c for c in candidates if c[0].DETAIL_FIELDS & missing]
+            if not useful:
+                break
+            complete = [c for c in useful if missing <= c[0].DETAIL_FIELDS]
+            if complete:
+                choice = min(complete, key=lambda c: c[2])
+            else:
+                choice = max(useful, key=lambda c: len(c[0].DETAIL_FIELDS & missing) / c[2])
+            candidates.remove(choice)
+            crawler, url, _ = choice
+            try:
+                detail = await crawler.crawl_video_detail(url)
+            except Exception as e:
+                logger.error("%s detail for %s failed: %s", crawler.source_name, code, e)
+                continue
+            if not detail or normalize_code(detail.get('code')) not in (None, code):
+                # Missing page, or a derived URL that led to another video
+                continue
+            fetched[crawler.source_name] = url
+            merge_video(video, detail)
+            missing = missing_fields(video)
+        if fetched:
+            logger.debug("Enriched %s from %s", code, ', '.join(fetched))
+            await self.record_sources([video])
+        return video
 
     async def crawl_video_detail(self, url_or_code):
         if url_or_code.startswith('http'):
@@ -48,20 +306,26 @@ class CrawlerManager:
                 if crawler.base_url in url_or_code:
                     return await crawler.crawl_video_detail(url_or_code)
         else:
-            # Code search: try to find the video detail from any source
-            code = url_or_code.upper()
+            # Code search: a stored row with details answers without the network
+            code = normalize_code(url_or_code) or url_or_code.upper()
+            if self.db is not None:
+                video = await self.db.get_video(code)
+                if video and video.get('title'):
+                    return video
+            # Otherwise find which sources have it and enrich from the cheapest
             search_results = await self.search(code, limit=1)
             if search_results:
-                video = search_results[0]
-                detail = await self.crawl_video_detail(video['detail_url'])
-                if detail:
-                    video.update(detail)
-                return video
+                video = dict(search_results[0])
+                video['sources'] = dict(video.get('sources') or {})
+                return await self.enrich_video(video)
         return None
 
     async def close(self):
         for crawler in self.crawlers:
             await crawler.close()
+        # Pools of hosts no crawler points at any more (e.g. a changed base_url)
+        await close_pools()
+        shutdown_executor()
 
 # For backward compatibility
 MissavCrawler = CrawlerManager
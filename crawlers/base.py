@@ -1,53 +1,215 @@
 import asyncio
+import functools
 import logging
-import random
-from curl_cffi.requests import AsyncSession
+import os
+import re
+import time
+from crawlers.cache import get_cache
+from crawlers.executor import run_parse
+from crawlers.health import backoff_delay, classify_error, classify_status, get_health, RETRY_BACKOFF_MAX
+from crawlers.ratelimit import get_limiter, parse_retry_after
+from crawlers.sessions import close_pool, get_pool
+from metrics import FETCH_BYTES, FETCH_CACHE, FETCH_ERRORS, FETCH_RESPONSES, FETCH_RETRIES, FETCH_SECONDS, PARSE_SECONDS
 
 logger = logging.getLogger(__name__)
 
+SEARCH_DEADLINE = float(os.getenv('SEARCH_SOURCE_DEADLINE', 15))
+SEARCH_PAGE_LIMIT = 100  # results kept from an unpaginated search page
+
+
+def timed_parse(kind):
+    """Record a crawler parse method's duration under siren_parse_seconds"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with PARSE_SECONDS.time(source=self.source_name, kind=kind):
+                return method(self, *args, **kwargs)
+        wrapper.parse_kind = kind
+        return wrapper
+    return decorator
+
+
 class BaseCrawler:
+    # Seconds a search on this source may take before it is abandoned
+    SEARCH_DEADLINE = SEARCH_DEADLINE
+
     def __init__(self, base_url, user_agent=None):
         self.base_url = base_url
         self.user_agent = user_agent or "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-        self.session = AsyncSession(
-            impersonate="safari15_5",
-            timeout=30.0,
-            headers={
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Accept-Language": "zh-CN,zh-Hans;q=0.9",
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.5 Safari/605.1.15"
-            }
-        )
-
-    async def fetch_html(self, url, referer=None, retries=2):
+        # HTTP sessions come from the per-host pool (crawlers.sessions)
+
+    # (url regex, seconds) pairs; first match wins. URLs matching no rule are
+    # never cached. A TTL of 0 always revalidates with the stored validators.
+    CACHE_TTLS = []
+
+    def cache_ttl(self, url):
+        for pattern, ttl in self.CACHE_TTLS:
+            if re.search(pattern, url):
+                return ttl
+        return None
+
+    async def fetch_html(self, url, referer=None, retries=2, use_cache=True):
+        cache = get_cache() if use_cache else None
+        ttl = self.cache_ttl(url) if cache else None
+        entry = None
+        if ttl is not None:
+            entry = await asyncio.to_thread(cache.get, url)
+            if entry and time.time() - entry.fetched_at < ttl:
+                FETCH_CACHE.inc(source=self.source_name, result='hit')
+                return entry.body
+
+        health = get_health(self.source_name)
+        if not health.allow():
+            logger.debug("Skipping %s: circuit for %s is open", url, self.source_name)
+            return None
+        try:
+            return await self._request(url, referer, retries, cache, ttl, entry, health)
+        except asyncio.CancelledError:
+            # An abandoned half-open probe must not hold the probe slot
+            health.release_probe()
+            raise
+
+    async def _request(self, url, referer, retries, cache, ttl, entry, health):
+        """Fetch url with retries; returns the body, or None once retrying stops"""
+        limiter = get_limiter(url)
+        pool = get_pool(url)
+        retry_after = None
         for i in range(retries + 1):
-            await asyncio.sleep(random.uniform(1.5, 3))
+            if i:
+                delay = backoff_delay(i, retry_after)
+                if delay > RETRY_BACKOFF_MAX:
+                    logger.warning("Not retrying %s: server asked to wait %.0fs", url, delay)
+                    break
+                FETCH_RETRIES.inc(source=self.source_name)
+                await asyncio.sleep(delay)
             try:
                 headers = {"Referer": referer} if referer else {}
-                response = await self.session.get(url, headers=headers, allow_redirects=True)
-                if response.status_code == 200:
-                    return response.text
-                logger.warning("Fetch failed (Try %d/%d): %s status %d", i+1, retries+1, url, response.status_code)
+                if entry and entry.etag:
+                    headers["If-None-Match"] = entry.etag
+                if entry and entry.last_modified:
+                    headers["If-Modified-Since"] = entry.last_modified
+                async with limiter.slot(), pool.session() as session:
+                    started = time.monotonic()
+                    response = await session.get(url, headers=headers, allow_redirects=True)
             except Exception as e:
-                logger.error("Error fetching (Try %d/%d) %s: %s", i+1, retries+1, url, e)
-                if "56" in str(e) or "reset" in str(e).lower():
-                    # If connection reset, maybe change impersonation for this domain?
-                    # For now just wait and retry
-                    await asyncio.sleep(2)
-                    continue
+                kind, retryable, healthy = classify_error(e)
+                logger.error("Error fetching (Try %d/%d) %s: %s: %s", i+1, retries+1, url, kind, e)
+                FETCH_ERRORS.inc(source=self.source_name)
+                if healthy:
+                    return None
+                limiter.record_error()
+                health.record_failure(kind)
+                if not retryable or not health.allow():
+                    return None
+                retry_after = None
+                continue
+
+            latency = time.monotonic() - started
+            status = response.status_code
+            limiter.record(status, latency, response.headers.get("Retry-After"))
+            FETCH_SECONDS.observe(latency, source=self.source_name)
+            FETCH_RESPONSES.inc(source=self.source_name, status=status)
+            FETCH_BYTES.inc(len(response.content), source=self.source_name)
+            if status == 304 and entry:
+                health.record_success(latency)
+                FETCH_CACHE.inc(source=self.source_name, result='revalidated')
+                await asyncio.to_thread(cache.touch, url)
+                return entry.body
+            if status == 200:
+                health.record_success(latency)
+                if ttl is not None:
+                    await asyncio.to_thread(cache.put, url, response.text,
+                                            response.headers.get("ETag"),
+                                            response.headers.get("Last-Modified"))
+                return response.text
+
+            logger.warning("Fetch failed (Try %d/%d): %s status %d", i+1, retries+1, url, status)
+            retryable, healthy = classify_status(status)
+            if healthy:
+                health.record_success(latency)
+                return None
+            health.record_failure(f"status {status}")
+            if status == 403:
+                # Likely a fingerprint block: later requests use another profile
+                await pool.rotate(f"status {status}")
+            if not retryable or not health.allow():
+                return None
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
         return None
 
+    async def parse(self, method, html, *args, **kwargs):
+        """Run parse method (e.g. self.parse_list) on html in the parse pool"""
+        return await run_parse(method, html, *args, **kwargs)
+
     def parse_video_card(self, card):
         """Parse a single video card from a list page"""
         raise NotImplementedError
 
-    async def crawl_new_videos(self, pages=1):
-        """Crawl latest videos"""
+    def parse_list(self, html, limit=None):
+        """Parse the video cards of a list or search page"""
         raise NotImplementedError
 
+    def new_page_url(self, page):
+        """URL of the given page of the newest-videos list, or None if the site has none"""
+        return None
+
+    async def crawl_new_page(self, page):
+        """Fetch and parse one newest-videos page; None if it could not be fetched"""
+        html = await self.fetch_html(self.new_page_url(page))
+        if not html:
+            return None
+        return await self.parse(self.parse_list, html)
+
+    async def crawl_new_videos(self, pages=1):
+        """Crawl latest videos, fetching the pages concurrently"""
+        if not self.new_page_url(1):
+            return []
+        results = await asyncio.gather(*(self.crawl_new_page(page) for page in range(1, pages + 1)))
+        return [video for videos in results if videos for video in videos]
+
     async def search(self, keyword, limit=5):
         """Search videos by keyword"""
-        raise NotImplementedError
+        html = await self.fetch_html(self.search_url(keyword))
+        if not html:
+            return []
+        return await self.parse_search_page(html, keyword, limit)
+
+    def search_page_url(self, keyword, page):
+        """URL of the given page of search results, or None if the site isn't paginated here"""
+        return None
+
+    def search_url(self, keyword):
+        """URL of the (first page of) search results"""
+        url = self.search_page_url(keyword, 1)
+        if url is None:
+            raise NotImplementedError
+        return url
+
+    async def parse_search_page(self, html, keyword, limit):
+        """Parse a page fetched from search_url"""
+        return await self.parse(self.parse_list, html, limit=limit)
+
+    async def crawl_search_page(self, keyword, page):
+        """One page of search results: [] past the last page, None if it could not be fetched"""
+        url = self.search_page_url(keyword, page)
+        if url is None:
+            # Without pagination the plain search is the only page
+            if page > 1:
+                return []
+            url = self.search_url(keyword)
+        html = await self.fetch_html(url)
+        if not html:
+            return None
+        return await self.parse_search_page(html, keyword, SEARCH_PAGE_LIMIT)
+
+    # Fields crawl_video_detail fills, and the requests one call costs; the
+    # manager uses them to pick which source to enrich a video from
+    DETAIL_FIELDS = frozenset()
+    DETAIL_REQUESTS = 1
+
+    def detail_url_for(self, code):
+        """Detail page URL derived from a code, or None if the site's URLs use other ids"""
+        return None
 
     async def crawl_video_detail(self, url):
         """Crawl full details of a video"""
@@ -57,9 +219,10 @@ class BaseCrawler:
         """Visit homepage to establish session/cookies"""
         try:
             logger.info("Warming up crawler for %s", self.base_url)
-            await self.fetch_html(self.base_url)
+            await self.fetch_html(self.base_url, use_cache=False)
         except Exception as e:
             logger.warning("Warm up failed for %s: %s", self.base_url, e)
 
     async def close(self):
-        pass
+        """Close the pooled sessions of this crawler's host"""
+        await close_pool(self.base_url)
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from collections import namedtuple
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('HTTP_CACHE_DIR', 'data/http_cache')
+CACHE_MAX_BYTES = int(float(os.getenv('HTTP_CACHE_MAX_MB', 200)) * 1024 * 1024)
+CACHE_ENABLED = os.getenv('HTTP_CACHE', 'true').lower() != 'false'
+
+CacheEntry = namedtuple('CacheEntry', 'body etag last_modified fetched_at')
+
+
+class ResponseCache:
+    """Content-addressed HTTP body store with an SQLite index keyed by URL.
+
+    Bodies are zlib-compressed and stored once per SHA-256 digest under
+    bodies/, so identical pages served from several URLs share a file.
+    The index tracks validators (ETag/Last-Modified) and access time for
+    size-bounded LRU eviction.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.body_dir = os.path.join(cache_dir, 'bodies')
+        os.makedirs(self.body_dir, exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.db'), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)')
+        self._conn.commit()
+
+    def _body_path(self, digest):
+        return os.path.join(self.body_dir, digest[:2], digest)
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT digest, etag, last_modified, fetched_at FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+            if not row:
+                return None
+            digest, etag, last_modified, fetched_at = row
+            try:
+                with open(self._body_path(digest), 'rb') as f:
+                    body = zlib.decompress(f.read()).decode('utf-8')
+            except (OSError, zlib.error) as e:
+                logger.warning("Dropping unreadable cache entry %s: %s", url, e)
+                self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
+            return CacheEntry(body, etag, last_modified, fetched_at)
+
+    def put(self, url, body, etag=None, last_modified=None):
+        raw = body.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._body_path(digest)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(zlib.compress(raw, 6))
+                os.replace(tmp, path)
+            old = self._conn.execute('SELECT digest FROM entries WHERE url = ?', (url,)).fetchone()
+            now = time.time()
+            self._conn.execute('''
+                INSERT OR REPLACE INTO entries (url, digest, etag, last_modified, size, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (url, digest, etag, last_modified, os.path.getsize(path), now, now))
+            if old and old[0] != digest:
+                self._release_body(old[0])
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url):
+        """Mark a cached entry as freshly validated (after a 304)"""
+        with self._lock:
+            now = time.time()
+            self._conn.execute('UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+            self._conn.commit()
+
+    def _release_body(self, digest):
+        """Unlink a body no entry references any more; returns whether it was removed"""
+        # Bodies are shared between URLs; only unlink the last reference
+        in_use = self._conn.execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone()
+        if in_use:
+            return False
+        try:
+            os.remove(self._body_path(digest))
+        except OSError:
+            pass
+        return True
+
+    def _size(self):
+        """Bytes on disk, counting each shared body once"""
+        return self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)').fetchone()[0]
+
+    def _evict(self):
+        total = self._size()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT url, digest, size FROM entries ORDER BY accessed_at').fetchall()
+        evicted = 0
+        for url, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            # Space only comes back once the last URL sharing the body is gone
+            if self._release_body(digest):
+                total -= size
+            evicted += 1
+        logger.info("Evicted %d cached responses (cache size %.1f MB)", evicted, total / 1024 / 1024)
+
+
+_cache = None
+
+
+def get_cache():
+    """Return the shared response cache, or None when disabled"""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import PARSE_OVERHEAD_SECONDS, PARSE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# thread: a thread pool; process: worker processes (true parallelism, pages
+# and results are pickled); inline: on the event loop
+PARSE_EXECUTOR = os.getenv('PARSE_EXECUTOR', 'thread').lower()
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+# Pages shorter than this (characters) parse faster than a round trip to the pool
+PARSE_INLINE_SIZE = int(os.getenv('PARSE_INLINE_SIZE', 16384))
+
+_executor = None
+_kind = None
+
+
+def _unwrap(method):
+    """The plain function behind a bound parse method and its timed_parse kind"""
+    func = method.__func__
+    return getattr(func, '__wrapped__', func), getattr(func, 'parse_kind', func.__name__)
+
+
+def _parse_in_worker(method, html, args, kwargs):
+    # Runs in the pool; the parent records the parse time, since metrics
+    # observed in a worker process would be lost
+    func, _ = _unwrap(method)
+    started = time.perf_counter()
+    result = func(method.__self__, html, *args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def _get_executor():
+    global _executor, _kind
+    if _executor is None:
+        kind = PARSE_EXECUTOR
+        if kind == 'process':
+            # Forking the bot itself would copy its DB and event-loop threads'
+            # locks mid-use; workers start from a clean server process instead
+            # (which imports the main module once, behind its __main__ guard)
+            methods = multiprocessing.get_all_start_methods()
+            method = 'forkserver' if 'forkserver' in methods else 'spawn'
+            _executor = ProcessPoolExecutor(PARSE_WORKERS, mp_context=multiprocessing.get_context(method))
+        elif kind == 'thread':
+            _executor = ThreadPoolExecutor(PARSE_WORKERS, thread_name_prefix='parse')
+        else:
+            if kind != 'inline':
+                logger.warning("Unknown PARSE_EXECUTOR %r, parsing inline", kind)
+            return None
+        _kind = kind
+        logger.info("Parsing pages in a %s pool of %d workers", kind, PARSE_WORKERS)
+    return _executor
+
+
+async def run_parse(method, html, *args, **kwargs):
+    """Run a crawler's bound parse method on html off the event loop.
+
+    Small pages, and every page with PARSE_EXECUTOR=inline, are parsed
+    directly. Otherwise the parse runs in the pool; its own duration goes to
+    siren_parse_seconds and the time the pool adds on top (queueing, moving
+    the page and result between processes) to siren_parse_overhead_seconds.
+    Parse methods must return plain data (dicts, lists, strings).
+    """
+    executor = _get_executor() if len(html) >= PARSE_INLINE_SIZE else None
+    if executor is None:
+        return method(html, *args, **kwargs)
+    _, kind = _unwrap(method)
+    source = method.__self__.source_name
+    started = time.perf_counter()
+    try:
+        result, seconds = await asyncio.get_running_loop().run_in_executor(
+            executor, _parse_in_worker, method, html, args, kwargs)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        logger.error("Parse worker pool broke, recreating it")
+        if executor is _executor:
+            shutdown_executor()
+        return method(html, *args, **kwargs)
+    PARSE_SECONDS.observe(seconds, source=source, kind=kind)
+    PARSE_OVERHEAD_SECONDS.observe(max(0.0, time.perf_counter() - started - seconds), executor=_kind)
+    return result
+
+
+def shutdown_executor():
+    """Stop the pool's workers; the next offloaded parse starts a new pool"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,124 @@
+import re
+from html import unescape
+from urllib.parse import unquote
+
+# One combined pattern for every field the detail parsers look for. Prefix
+# alternatives use lookaheads so they don't consume text another alternative
+# may need (e.g. "duration: 95 min" still yields the "95 min" candidate).
+_SCAN = re.compile(
+    r'<meta\b(?=(?P<meta>[^>]*))'
+    r'|(?i:duration)\s*:\s*(?=(?P<script_duration>\d+))'
+    r'|(?P<text_minutes>\d+)\s*(?:分|min)'
+    r'|(?=(?P<clock>\d{1,2}:\d{2}(?::\d{2})?))'
+    r"|var hlsUrl = '(?P<hls_url>https?://[^']+)'"
+    r'|var videoSrc\s*=\s*"(?P<video_src>[^"]+)"'
+    r'|"url":"(?P<encoded_url>https?%3A%2F%2F[^"]+)"'
+)
+_ATTR = re.compile(r'''([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''')
+_NUMBER = re.compile(r'(\d+)')
+_ISO_MINUTES = re.compile(r'^PT(\d+)M')
+
+_META_KEYS = ('property', 'itemprop', 'name')
+
+# Meta tags checked for a duration, in priority order
+DEFAULT_META_DURATION = (('property', 'og:video:duration'), ('itemprop', 'duration'))
+
+
+def _to_minutes(value):
+    # Durations above 500 are assumed to be seconds
+    return value // 60 if value > 500 else value
+
+
+def parse_clock(s):
+    """Convert HH:MM:SS or MM:SS to minutes"""
+    parts = s.split(':')
+    if len(parts) == 3: # HH:MM:SS
+        return int(parts[0]) * 60 + int(parts[1])
+    elif len(parts) == 2: # MM:SS
+        return int(parts[0])
+    return None
+
+
+class PageScan:
+    """Candidate metadata collected from one linear pass over a page.
+
+    meta maps (attribute, value) pairs such as ('property', 'og:title') to the
+    tag's content; every other field keeps its first occurrence.
+    """
+
+    def __init__(self, html):
+        self.meta = {}
+        self.fields = {}
+        for match in _SCAN.finditer(html):
+            kind = match.lastgroup
+            if kind == 'meta':
+                self._add_meta(match.group('meta'))
+            elif kind not in self.fields:
+                self.fields[kind] = match.group(kind)
+
+    def _add_meta(self, attr_text):
+        attrs = {}
+        for name, dq, sq, bare in _ATTR.findall(attr_text):
+            attrs[name.lower()] = unescape(dq or sq or bare)
+        content = attrs.get('content') or attrs.get('value') or ''
+        for key in _META_KEYS:
+            if key in attrs:
+                self.meta.setdefault((key, attrs[key]), content)
+
+    def get_meta(self, key, value):
+        return self.meta.get((key, value))
+
+    @property
+    def hls_url(self):
+        return self.fields.get('hls_url')
+
+    @property
+    def video_src(self):
+        return self.fields.get('video_src')
+
+    @property
+    def encoded_url(self):
+        url = self.fields.get('encoded_url')
+        return unquote(url) if url else None
+
+    def duration(self, rules, meta_keys=DEFAULT_META_DURATION):
+        """Return the first duration (minutes) produced by rules, in order.
+
+        Rules: 'meta' (first listed meta tag present, seconds-aware),
+        'iso_meta' (itemprop duration as PT<n>M), 'script' (duration: n,
+        seconds-aware), 'text' (n 分/min), 'text_seconds' (same, seconds-aware)
+        and 'clock' (first HH:MM:SS or MM:SS).
+        """
+        for rule in rules:
+            minutes = getattr(self, '_rule_' + rule)(meta_keys)
+            if minutes:
+                return minutes
+        return None
+
+    def _rule_meta(self, meta_keys):
+        for key in meta_keys:
+            content = self.meta.get(key)
+            if content is not None:
+                num = _NUMBER.search(content)
+                return _to_minutes(int(num.group(1))) if num else None
+        return None
+
+    def _rule_iso_meta(self, meta_keys):
+        match = _ISO_MINUTES.match(self.meta.get(('itemprop', 'duration')) or '')
+        return int(match.group(1)) if match else None
+
+    def _rule_script(self, meta_keys):
+        value = self.fields.get('script_duration')
+        return _to_minutes(int(value)) if value else None
+
+    def _rule_text(self, meta_keys):
+        value = self.fields.get('text_minutes')
+        return int(value) if value else None
+
+    def _rule_text_seconds(self, meta_keys):
+        value = self.fields.get('text_minutes')
+        return _to_minutes(int(value)) if value else None
+
+    def _rule_clock(self, meta_keys):
+        value = self.fields.get('clock')
+        return parse_clock(value) if value else None
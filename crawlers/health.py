@@ -0,0 +1,166 @@
+import logging
+import os
+import random
+import time
+
+from curl_cffi.requests import exceptions as curl_errors
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from .env
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))              # consecutive failures that open a circuit
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', 30))   # first open period, doubled per re-open
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv('BREAKER_MAX_OPEN_SECONDS', 600))
+RETRY_BACKOFF_BASE = float(os.getenv('RETRY_BACKOFF_BASE', 0.5))
+RETRY_BACKOFF_MAX = float(os.getenv('RETRY_BACKOFF_MAX', 10))
+PROBE_TIMEOUT = 60.0  # a half-open probe that never reported back frees its slot after this
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+HEALTH_SCORE = REGISTRY.gauge('siren_source_health', 'Source health score (0 = open circuit, 1 = healthy)', ('source',))
+BREAKER_TRANSITIONS = REGISTRY.counter('siren_breaker_transitions_total', 'Circuit breaker state changes', ('source', 'state'))
+FAILURES = REGISTRY.counter('siren_fetch_failures_total', 'Failed requests by class', ('source', 'kind'))
+
+# Statuses worth retrying: throttling and transient server/CDN errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+# Statuses that mean the source is unwell, though a retry won't help
+UNHEALTHY_STATUSES = {403}
+
+
+def classify_status(status_code):
+    """Return (retryable, healthy) for an HTTP status"""
+    if status_code in RETRYABLE_STATUSES:
+        return True, False
+    if status_code in UNHEALTHY_STATUSES:
+        return False, False
+    # 2xx/3xx, and 4xx such as 404 for a missing page: the source itself is fine
+    return False, True
+
+
+def classify_error(error):
+    """Return (kind, retryable, healthy) for an exception raised by a request"""
+    if isinstance(error, curl_errors.Timeout):
+        return 'timeout', True, False
+    if isinstance(error, curl_errors.DNSError):
+        return 'dns', False, False
+    if isinstance(error, curl_errors.SSLError):
+        return 'tls', False, False
+    if isinstance(error, (curl_errors.ConnectionError, curl_errors.ProxyError,
+                          curl_errors.ChunkedEncodingError, curl_errors.HTTPError)):
+        # Resets, refused connections, truncated bodies
+        return 'connection', True, False
+    if isinstance(error, (curl_errors.InvalidURL, curl_errors.TooManyRedirects,
+                          curl_errors.SessionClosed)):
+        # Problems with the request or our session, not with the source
+        return 'request', False, True
+    if isinstance(error, curl_errors.RequestException):
+        return 'other', True, False
+    return 'internal', False, True
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number attempt (1-based): full-jitter
+    exponential backoff, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class SourceHealth:
+    """Circuit breaker and health score for one source.
+
+    BREAKER_FAILURES consecutive failures open the circuit: requests are
+    refused until the open period elapses, then a single probe is let through
+    (half-open). A successful probe closes the circuit; a failed one re-opens
+    it for twice as long, up to BREAKER_MAX_OPEN_SECONDS.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.state = CLOSED
+        self.failures = 0  # consecutive
+        self.trips = 0     # consecutive re-opens, for the open period
+        self.open_until = 0.0
+        self.probe_started = None
+        self.success_rate = 1.0  # EWMA
+        self.latency = None      # EWMA seconds
+        HEALTH_SCORE.set_function(lambda: self.score, source=source)
+
+    @property
+    def available(self):
+        """True when a request would currently be let through (does not claim a probe)"""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            return now >= self.open_until
+        return self.probe_started is None or now - self.probe_started > PROBE_TIMEOUT
+
+    def allow(self):
+        """Decide whether a request may go out; in half-open state it becomes the probe"""
+        if not self.available:
+            return False
+        if self.state != CLOSED:
+            self._transition(HALF_OPEN)
+            self.probe_started = time.monotonic()
+        return True
+
+    def release_probe(self):
+        """Give up an in-flight probe without a verdict (e.g. the request was cancelled)"""
+        self.probe_started = None
+
+    @property
+    def score(self):
+        """0..1, higher is healthier: success rate discounted by latency"""
+        if self.state == OPEN and not self.available:
+            return 0.0
+        latency_factor = 1.0 / (1.0 + (self.latency or 0.0))
+        return round(self.success_rate * latency_factor, 4)
+
+    def record_success(self, latency=None):
+        self.success_rate = self.success_rate * 0.9 + 0.1
+        if latency is not None:
+            self.latency = latency if self.latency is None else self.latency * 0.8 + latency * 0.2
+        self.failures = 0
+        if self.state != CLOSED:
+            self.trips = 0
+            self.probe_started = None
+            self._transition(CLOSED)
+
+    def record_failure(self, kind):
+        self.success_rate *= 0.9
+        self.failures += 1
+        FAILURES.inc(source=self.source, kind=kind)
+        if self.state == HALF_OPEN or self.failures >= BREAKER_FAILURES:
+            self._open(kind)
+
+    def _open(self, kind):
+        period = min(BREAKER_MAX_OPEN_SECONDS, BREAKER_OPEN_SECONDS * 2 ** self.trips)
+        self.trips += 1
+        self.open_until = time.monotonic() + period
+        self.probe_started = None
+        if self.state != OPEN:
+            logger.warning("Circuit for %s opened for %.0fs after %d failure(s) (last: %s)",
+                           self.source, period, self.failures, kind)
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        if state != self.state:
+            self.state = state
+            BREAKER_TRANSITIONS.inc(source=self.source, state=state)
+            if state == CLOSED:
+                logger.info("Circuit for %s closed", self.source)
+
+
+_health = {}
+
+
+def get_health(source):
+    """Return the shared health record for a source"""
+    health = _health.get(source)
+    if health is None:
+        health = _health[source] = SourceHealth(source)
+    return health
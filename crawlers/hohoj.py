@@ -1,35 +1,60 @@
 import re
 import logging
-from bs4 import BeautifulSoup
-from crawlers.base import BaseCrawler
+from crawlers.base import BaseCrawler, timed_parse, SEARCH_DEADLINE
+from crawlers.extract import PageScan
+from crawlers.resolve import find_code
 
 logger = logging.getLogger(__name__)
 
 class HohoJCrawler(BaseCrawler):
+    # Slow source that rarely adds unique results; don't let it hold up searches
+    SEARCH_DEADLINE = min(SEARCH_DEADLINE, 8)
+    CACHE_TTLS = [
+        (r'/search\?', 600),
+        (r'/embed\?id=', 6 * 3600),  # stream URLs may be signed, keep it short
+    ]
+
     def __init__(self):
         super().__init__(base_url="https://hohoj.tv")
         self.source_name = "HohoJ"
 
-    async def crawl_new_videos(self, pages=1):
-        # HohoJ doesn't seem to have a simple 'new' page like MissAV
-        # For now, let's just implement search.
-        return []
+    DURATION_RULES = ('meta', 'script', 'text_seconds', 'clock')
+    # Video pages are addressed by a numeric id, so detail_url_for stays None
+    DETAIL_FIELDS = frozenset({'duration', 'preview_url'})
+    # A search result link and the markup up to the next one
+    RESULT_PATTERN = re.compile(r'/video\?id=(\d+)(.*?)(?=/video\?id=|$)', re.S)
 
-    async def search(self, keyword, limit=5):
-        search_url = f"{self.base_url}/search?text={keyword}"
-        html = await self.fetch_html(search_url)
-        if not html: return []
-        
-        # HohoJ search results are direct links like /video?id=...
-        ids = re.findall(r'/video\?id=(\d+)', html)
+    # HohoJ doesn't seem to have a simple 'new' page like MissAV, so
+    # new_page_url stays None and it is only used for search.
+
+    def search_url(self, keyword):
+        return f"{self.base_url}/search?text={keyword}"
+
+    async def parse_search_page(self, html, keyword, limit):
+        return await self.parse(self.parse_search, html, keyword, limit)
+
+    @timed_parse('search')
+    def parse_search(self, html, keyword, limit=5):
+        # HohoJ search results are direct links like /video?id=..., with the
+        # code in the card text; cards without a recognizable code are skipped
+        # rather than guessed from the keyword
+        # A card may link to its id more than once (thumbnail, then title);
+        # the code is looked for in the markup after all of them
+        cards = {}
+        for vid, card in self.RESULT_PATTERN.findall(html):
+            cards.setdefault(vid, []).append(card[:500])
         results = []
-        for vid in ids[:limit]:
-            # We don't have titles in the ID list, but we can return basic info
+        for vid, parts in cards.items():
+            code = find_code(re.sub(r'<[^>]+>', ' ', ' '.join(parts)))
+            if not code:
+                continue
             results.append({
-                'code': keyword.upper(), # Assuming search was by code
+                'code': code,
                 'detail_url': f"{self.base_url}/video?id={vid}",
-                'source': 'HohoJ'
+                'source': self.source_name
             })
+            if len(results) >= limit:
+                break
         return results
 
     async def crawl_video_detail(self, url):
@@ -41,50 +66,23 @@ class HohoJCrawler(BaseCrawler):
         embed_url = f"{self.base_url}/embed?id={vid}"
         html = await self.fetch_html(embed_url, referer=url)
         if not html: return None
-        
-        video = {'detail_url': url, 'code': vid} # ID as fallback code
-        
+        return await self.parse(self.parse_detail, html, url)
+
+    @timed_parse('detail')
+    def parse_detail(self, html, url):
+        """Parse the embed page fetched for detail url"""
+        video = {'detail_url': url}
+        page = PageScan(html)
+        # The embed page rarely names the video; the search card's code is kept
+        code = find_code(page.get_meta('property', 'og:title'))
+        if code:
+            video['code'] = code
+
         # Extract m3u8
-        hls_match = re.search(r'var videoSrc\s*=\s*"([^"]+)"', html)
-        if hls_match:
-            video['preview_url'] = hls_match.group(1)
-            
-        # HohoJ duration (often in script or meta)
-        duration_minutes = None
-        soup = BeautifulSoup(html, 'html.parser')
-        # Try metadata
-        meta = soup.find('meta', attrs={'property': 'og:video:duration'}) or \
-               soup.find('meta', attrs={'itemprop': 'duration'})
-        if meta:
-            num = re.search(r'(\d+)', meta.get('content', ''))
-            if num:
-                v = int(num.group(1))
-                duration_minutes = v // 60 if v > 500 else v
+        if page.video_src:
+            video['preview_url'] = page.video_src
 
-        if not duration_minutes:
-            duration_match = re.search(r'duration\s*:\s*(\d+)', html, re.IGNORECASE)
-            if not duration_match:
-                duration_match = re.search(r'(\d+)\s*(分|min)', html)
-                
-            if duration_match:
-                v = int(duration_match.group(1))
-                duration_minutes = v // 60 if v > 500 else v
-        
-        if not duration_minutes:
-            # Try finding HH:MM:SS or MM:SS pattern
-            time_match = re.search(r'(\d{1,2}:\d{2}(:\d{2})?)', html)
-            if time_match:
-                duration_minutes = self._parse_duration_string(time_match.group(1))
-            
-        video['duration'] = duration_minutes
+        # HohoJ duration (often in script or meta)
+        video['duration'] = page.duration(self.DURATION_RULES)
         video['source'] = self.source_name
         return video
-
-    def _parse_duration_string(self, s):
-        """Convert HH:MM:SS or MM:SS to minutes"""
-        parts = s.split(':')
-        if len(parts) == 3: # HH:MM:SS
-            return int(parts[0]) * 60 + int(parts[1])
-        elif len(parts) == 2: # MM:SS
-            return int(parts[0])
-        return None
@@ -1,31 +1,54 @@
 import re
 import logging
 import json
-from urllib.parse import unquote
-from crawlers.base import BaseCrawler
+from crawlers.base import BaseCrawler, timed_parse, SEARCH_DEADLINE
+from crawlers.extract import PageScan
+from crawlers.resolve import normalize_code
 
 logger = logging.getLogger(__name__)
 
 class MemoCrawler(BaseCrawler):
+    # Slow source that rarely adds unique results; don't let it hold up searches
+    SEARCH_DEADLINE = min(SEARCH_DEADLINE, 8)
+    CACHE_TTLS = [
+        (r'/browse/search', 600),
+        (r'/video/', 7 * 86400),
+    ]
+
     def __init__(self):
         super().__init__(base_url="https://memojav.com")
         self.source_name = "Memo"
 
-    async def search(self, keyword, limit=5):
+    DURATION_RULES = ('iso_meta', 'text')
+    DETAIL_FIELDS = frozenset({'duration', 'preview_url'})
+    DETAIL_REQUESTS = 2  # the preview often needs the info endpoint too
+
+    def detail_url_for(self, code):
+        return f"{self.base_url}/video/{code}"
+
+    def search_url(self, keyword):
         # Memo search URL: https://memojav.com/browse/search?q=keyword
-        url = f"{self.base_url}/browse/search?q={keyword}"
-        html = await self.fetch_html(url)
-        if not html: return []
-        
+        return f"{self.base_url}/browse/search?q={keyword}"
+
+    async def parse_search_page(self, html, keyword, limit):
+        return await self.parse(self.parse_search, html, keyword, limit)
+
+    @timed_parse('search')
+    def parse_search(self, html, keyword, limit=5):
         # Simple regex to find video links: /video/CODE
         matches = re.findall(r'/video/([A-Z0-9-]+)', html)
         results = []
-        for code in list(set(matches))[:limit]:
+        for raw in dict.fromkeys(matches):
+            code = normalize_code(raw)
+            if not code:
+                continue
             results.append({
-                'code': code.upper(),
-                'detail_url': f"{self.base_url}/video/{code}",
+                'code': code,
+                'detail_url': f"{self.base_url}/video/{raw}",
                 'source': self.source_name
             })
+            if len(results) >= limit:
+                break
         return results
 
     async def crawl_video_detail(self, url_or_code):
@@ -34,34 +57,31 @@ class MemoCrawler(BaseCrawler):
         
         html = await self.fetch_html(detail_url)
         if not html: return None
-        
-        video = {'code': code.upper(), 'detail_url': detail_url, 'source': self.source_name}
-        
-        # Meta parsing for duration (ISO 8601 format: PT141M0S)
-        duration_minutes = None
-        duration_match = re.search(r'<meta itemprop="duration" content="PT(\d+)M', html)
-        if duration_match:
-            duration_minutes = int(duration_match.group(1))
-        else:
-            # Fallback search
-            duration_match = re.search(r'(\d+)\s*(分|min)', html)
-            if duration_match:
-                duration_minutes = int(duration_match.group(1))
-
-        video['duration'] = duration_minutes
+        video = await self.parse(self.parse_detail, html, detail_url)
         
         # Fetch preview URL using the existing PHP logic if needed, 
         # but let's see if it's in the page first
-        hls_match = re.search(r'"url":"(https?%3A%2F%2F[^"]+)"', html)
-        if hls_match:
-            video['preview_url'] = unquote(hls_match.group(1))
-        else:
+        if not video.get('preview_url'):
             # Fallback to PHP info fetcher
             info_url = f"{self.base_url}/hls/get_video_info.php?id={code}&sig=NTg1NTczNg&sts=7264825"
             info_html = await self.fetch_html(info_url, referer=detail_url)
             if info_html:
-                hls_match = re.search(r'"url":"(https?%3A%2F%2F[^"]+)"', info_html)
-                if hls_match:
-                    video['preview_url'] = unquote(hls_match.group(1))
+                preview_url = PageScan(info_html).encoded_url
+                if preview_url:
+                    video['preview_url'] = preview_url
+
+        return video
+
+    @timed_parse('detail')
+    def parse_detail(self, html, url):
+        video = {'detail_url': url, 'source': self.source_name}
+        code = normalize_code(url.split('/')[-1])
+        if code:
+            video['code'] = code
 
+        page = PageScan(html)
+        # Meta duration is ISO 8601 (PT141M0S), else "n 分/min" in the text
+        video['duration'] = page.duration(self.DURATION_RULES)
+        if page.encoded_url:
+            video['preview_url'] = page.encoded_url
         return video
@@ -1,34 +1,47 @@
-import re
 import logging
-from bs4 import BeautifulSoup
-from crawlers.base import BaseCrawler
+from crawlers.base import BaseCrawler, timed_parse
+from crawlers.extract import PageScan
+from crawlers.resolve import find_code
+from crawlers.parser import make_soup, class_strainer, tag_strainer
 
 logger = logging.getLogger(__name__)
 
 class MissavCrawler(BaseCrawler):
+    CACHE_TTLS = [
+        (r'/new(\?|$)', 0),            # polled list: always revalidate
+        (r'/search/', 600),
+        (r'missav\.ai/.+', 7 * 86400),  # detail pages rarely change
+    ]
+
     def __init__(self):
         super().__init__(base_url="https://missav.ai")
         self.source_name = "MissAV"
-        self.CODE_PATTERN = re.compile(r'([A-Z]+-\d+)', re.IGNORECASE)
 
-    async def crawl_new_videos(self, pages=1):
-        all_videos = []
+    LIST_STRAINER = class_strainer('div', 'group', 'video-card')
+    DETAIL_STRAINER = tag_strainer('h1', 'a', 'video')
+    DURATION_RULES = ('meta', 'text')
+
+    DETAIL_FIELDS = frozenset({'title', 'actresses', 'tags', 'duration', 'preview_url'})
+
+    def detail_url_for(self, code):
+        return f"{self.base_url}/cn/{code.lower()}"
+
+    def new_page_url(self, page):
         new_url = f"{self.base_url}/new"
-        for page in range(1, pages + 1):
-            url = f"{new_url}?page={page}" if page > 1 else new_url
-            html = await self.fetch_html(url)
-            if not html: continue
-            
-            soup = BeautifulSoup(html, 'html.parser')
-            cards = soup.select('div.group') or soup.select('div.video-card')
-            
-            page_videos = []
-            for card in cards:
-                video = self.parse_video_card(card)
-                if video.get('code'):
-                    page_videos.append(video)
-            all_videos.extend(page_videos)
-        return all_videos
+        return f"{new_url}?page={page}" if page > 1 else new_url
+
+    @timed_parse('list')
+    def parse_list(self, html, limit=None):
+        """Parse the video cards of a list or search page"""
+        soup = make_soup(html, self.LIST_STRAINER)
+        cards = soup.select('div.group') or soup.select('div.video-card')
+
+        videos = []
+        for card in cards[:limit]:
+            video = self.parse_video_card(card)
+            if video.get('code'):
+                videos.append(video)
+        return videos
 
     def parse_video_card(self, card):
         video = {}
@@ -50,12 +63,9 @@ class MissavCrawler(BaseCrawler):
             
             video['title'] = video['title'].strip()
             
-        code_match = self.CODE_PATTERN.search(video.get('title', ''))
-        if not code_match and 'detail_url' in video:
-            code_match = self.CODE_PATTERN.search(video['detail_url'])
-        
-        if code_match:
-            video['code'] = code_match.group(1).upper()
+        code = find_code(video.get('title')) or find_code(video.get('detail_url'))
+        if code:
+            video['code'] = code
         
         img_tag = card.find('img')
         if img_tag:
@@ -64,27 +74,20 @@ class MissavCrawler(BaseCrawler):
         video['source'] = self.source_name
         return video
 
-    async def search(self, keyword, limit=5):
+    def search_page_url(self, keyword, page):
         # MissAV search URL: https://missav.ai/cn/search/keyword
         url = f"{self.base_url}/cn/search/{keyword}"
-        html = await self.fetch_html(url)
-        if not html: return []
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        cards = soup.select('div.group') or soup.select('div.video-card')
-        
-        results = []
-        for card in cards[:limit]:
-            video = self.parse_video_card(card)
-            if video.get('code'):
-                results.append(video)
-        return results
+        return f"{url}?page={page}" if page > 1 else url
 
     async def crawl_video_detail(self, url):
         html = await self.fetch_html(url)
         if not html: return None
-        
-        soup = BeautifulSoup(html, 'html.parser')
+        return await self.parse(self.parse_detail, html, url)
+
+    @timed_parse('detail')
+    def parse_detail(self, html, url):
+        soup = make_soup(html, self.DETAIL_STRAINER)
+        page = PageScan(html)
         video = {'detail_url': url}
         
         title_el = soup.find('h1')
@@ -93,12 +96,11 @@ class MissavCrawler(BaseCrawler):
         else:
             logger.warning("Could not find <h1> title on page: %s", url)
             # Try a fallback for title
-            og_title = soup.find('meta', property='og:title')
+            og_title = page.get_meta('property', 'og:title')
             if og_title:
-                video['title'] = og_title.get('content')
+                video['title'] = og_title
         
-        code_match = self.CODE_PATTERN.search(video.get('title', ''))
-        video['code'] = code_match.group(1).upper() if code_match else None
+        video['code'] = find_code(video.get('title')) or find_code(url)
         
         actress_tags = soup.select('a[href*="/actresses/"]')
         actresses = [a.get_text(strip=True) for a in actress_tags if "女优排行" not in a.get_text()]
@@ -107,37 +109,8 @@ class MissavCrawler(BaseCrawler):
         tag_tags = soup.select('a[href*="/genres/"]')
         video['tags'] = ", ".join([t.get_text(strip=True) for t in tag_tags])
         
-        # Enhanced duration extraction for MissAV
-        duration_minutes = None
-        
-        # Priority 1: Meta tags (MissAV often uses seconds in og:video:duration)
-        meta_duration = soup.find('meta', attrs={'property': 'og:video:duration'}) or \
-                        soup.find('meta', attrs={'itemprop': 'duration'})
-        if meta_duration:
-            content = meta_duration.get('content', '')
-            num_match = re.search(r'(\d+)', content)
-            if num_match:
-                seconds = int(num_match.group(1))
-                # MissAV duration in meta is usually seconds
-                if seconds > 500: # Highly likely to be seconds
-                    duration_minutes = seconds // 60
-                else:
-                    duration_minutes = seconds
-        
-        # Priority 2: Try finding in the text directly (e.g., "120 分" or "120 min")
-        if not duration_minutes:
-            duration_match = re.search(r'(\d+)\s*(分|min)', html)
-            if duration_match:
-                duration_minutes = int(duration_match.group(1))
-            else:
-                # Fallback: Look for span with specific patterns
-                span_match = soup.find('span', string=re.compile(r'\d+\s*(分|min)'))
-                if span_match:
-                    duration_res = re.search(r'(\d+)', span_match.get_text())
-                    if duration_res:
-                        duration_minutes = int(duration_res.group(1))
-
-        video['duration'] = duration_minutes
+        # MissAV often uses seconds in og:video:duration
+        video['duration'] = page.duration(self.DURATION_RULES)
         
         video_tag = soup.find('video')
         if video_tag:
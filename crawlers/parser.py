@@ -0,0 +1,43 @@
+import logging
+import os
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+# auto: lxml (C-backed) when installed, else the pure-Python html.parser
+HTML_PARSER = os.getenv('HTML_PARSER', 'auto').lower()
+
+
+def _resolve_backend(name):
+    if name in ('auto', 'lxml'):
+        try:
+            import lxml  # noqa: F401
+            return 'lxml'
+        except ImportError:
+            if name == 'lxml':
+                logger.warning("HTML_PARSER=lxml but lxml is not installed, using html.parser")
+            return 'html.parser'
+    if name not in ('html.parser', 'html5lib'):
+        logger.warning("Unknown HTML_PARSER %r, using html.parser", name)
+        return 'html.parser'
+    return name
+
+
+BACKEND = _resolve_backend(HTML_PARSER)
+
+
+def make_soup(html, parse_only=None):
+    """Parse html with the configured backend, keeping only parse_only subtrees"""
+    return BeautifulSoup(html, BACKEND, parse_only=parse_only)
+
+
+def class_strainer(tag, *classes):
+    """Keep <tag> elements carrying any of classes (plus their whole subtree)"""
+    pattern = re.compile(r'(^|\s)(%s)(\s|$)' % '|'.join(re.escape(c) for c in classes))
+    return SoupStrainer(tag, class_=pattern)
+
+
+def tag_strainer(*names):
+    """Keep only the listed tags (plus their whole subtree)"""
+    return SoupStrainer(list(names))
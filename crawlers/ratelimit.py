@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from .env
+DEFAULT_RATE = float(os.getenv('CRAWLER_RATE', 1.0))          # requests/second at start
+MIN_RATE = float(os.getenv('CRAWLER_MIN_RATE', 0.2))
+MAX_RATE = float(os.getenv('CRAWLER_MAX_RATE', 4.0))
+DEFAULT_CONCURRENCY = int(os.getenv('CRAWLER_CONCURRENCY', 2))  # in-flight requests per host
+
+# AIMD tuning
+ADDITIVE_STEP = 0.1       # req/s added after each healthy response
+DECREASE_FACTOR = 0.5     # rate multiplier on throttling / errors
+SLOW_FACTOR = 2.0         # latency above SLOW_FACTOR * baseline counts as congestion
+ERROR_COOLDOWN = 2.0      # seconds to hold a host after a connection error
+MAX_RETRY_AFTER = 300.0
+
+
+def _parse_host_limits(raw):
+    """Parse "missav.ai=4,jable.tv=2" into {'missav.ai': 4, 'jable.tv': 2}"""
+    limits = {}
+    for item in (raw or '').split(','):
+        host, _, value = item.strip().partition('=')
+        if host and value.strip().isdigit():
+            limits[host.strip().lower()] = int(value)
+    return limits
+
+
+HOST_CONCURRENCY = _parse_host_limits(os.getenv('CRAWLER_HOST_CONCURRENCY'))
+
+
+def parse_retry_after(value):
+    """Return Retry-After in seconds (delta-seconds or HTTP-date form), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    delay = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+class HostLimiter:
+    """Token bucket for one host whose refill rate is tuned with AIMD.
+
+    The rate grows additively while the host answers quickly and halves on
+    429/503, connection errors or latency spikes. Retry-After pauses the host.
+    """
+
+    def __init__(self, host, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY):
+        self.host = host
+        self.rate = rate
+        self.concurrency = concurrency
+        self.tokens = float(concurrency)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.latency = None  # EWMA of response time (seconds)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        # Burst is capped at the concurrency limit so an idle host doesn't stampede
+        self.tokens = min(float(self.concurrency), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def _take_token(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for an in-flight slot and a token, hold the slot for the request"""
+        async with self._semaphore:
+            await self._take_token()
+            yield self
+
+    def record(self, status_code, latency, retry_after=None):
+        """Feed back the outcome of a request"""
+        delay = parse_retry_after(retry_after)
+        if delay:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+        if status_code in (429, 503):
+            self._decrease("status %d" % status_code)
+            return
+
+        slow = self.latency is not None and latency > self.latency * SLOW_FACTOR
+        self.latency = latency if self.latency is None else self.latency * 0.8 + latency * 0.2
+        if slow:
+            self._decrease("latency %.2fs" % latency)
+        elif status_code < 500:
+            self.rate = min(MAX_RATE, self.rate + ADDITIVE_STEP)
+
+    def record_error(self):
+        """Connection-level failure: back off and briefly pause the host"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + ERROR_COOLDOWN)
+        self._decrease("connection error")
+
+    def _decrease(self, reason):
+        old = self.rate
+        self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+        logger.info("Throttling %s (%s): %.2f -> %.2f req/s", self.host, reason, old, self.rate)
+
+
+_limiters = {}
+
+
+def get_limiter(url):
+    """Return the shared limiter for the host of url"""
+    host = (urlparse(url).hostname or '').lower()
+    limiter = _limiters.get(host)
+    if limiter is None:
+        limiter = HostLimiter(host, concurrency=HOST_CONCURRENCY.get(host, DEFAULT_CONCURRENCY))
+        _limiters[host] = limiter
+    return limiter
@@ -0,0 +1,60 @@
+import re
+
+# Fields filled from detail pages; a video missing any of them is enriched
+DETAIL_FIELDS = ('title', 'actresses', 'tags', 'duration', 'preview_url')
+
+# label, optional separator, number; whatever follows the number (-C,
+# -UNCENSORED-LEAK, _CH, ...) marks a variant of the same video
+_FC2 = r'FC2[-_ ]?(?:PPV[-_ ]?)?(?P<fc2>\d{5,8})'
+_CODE_EXACT = re.compile(rf'^(?:{_FC2}|(?P<label>\d{{0,3}}[A-Z]{{2,8}})[-_ ]?(?P<number>\d{{2,6}}))(?!\d)', re.I)
+# In free text (titles, URLs) the separator is required, to avoid words like HD1080
+_CODE_IN_TEXT = re.compile(rf'(?<![A-Z0-9])(?:{_FC2}|(?P<label>\d{{0,3}}[A-Z]{{2,8}})[-_](?P<number>\d{{2,6}}))(?!\d)', re.I)
+
+
+def _format(match):
+    if match.group('fc2'):
+        return f"FC2-PPV-{match.group('fc2')}"
+    return f"{match.group('label').upper()}-{match.group('number')}"
+
+
+def normalize_code(value):
+    """Canonical form of a video code (SSIS-001), or None if value isn't one.
+
+    'ssis001', 'SSIS_001' and 'ssis-001-uncensored-leak' all give 'SSIS-001'.
+    """
+    match = _CODE_EXACT.match((value or '').strip())
+    return _format(match) if match else None
+
+
+def find_code(text):
+    """The first video code appearing in text, normalized, or None"""
+    match = _CODE_IN_TEXT.search(text or '')
+    return _format(match) if match else None
+
+
+def missing_fields(video):
+    return {field for field in DETAIL_FIELDS if not video.get(field)}
+
+
+def merge_video(video, other):
+    """Merge another record of the same video into video (in place).
+
+    Values from the video's own source replace what the card had; other
+    sources only fill gaps. Every source's detail URL is kept in
+    video['sources'].
+    """
+    sources = video.setdefault('sources', {})
+    if video.get('source') and video.get('detail_url'):
+        sources.setdefault(video['source'], video['detail_url'])
+    for name, url in (other.get('sources') or {}).items():
+        sources.setdefault(name, url)
+    if other.get('source') and other.get('detail_url'):
+        sources[other['source']] = other['detail_url']
+
+    same_source = other.get('source') == video.get('source')
+    for key, value in other.items():
+        if key in ('code', 'source', 'sources', 'detail_url') or value in (None, ''):
+            continue
+        if same_source or not video.get(key):
+            video[key] = value
+    return video
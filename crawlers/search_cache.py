@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 256))
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', 300))
+SEARCH_CACHE_NEGATIVE_TTL = float(os.getenv('SEARCH_CACHE_NEGATIVE_TTL', 60))
+
+
+def normalize_keyword(keyword):
+    return ' '.join((keyword or '').split()).casefold()
+
+
+class _Flight:
+    """An in-flight fetch whose batches are replayed to every caller following it"""
+
+    def __init__(self):
+        self.batches = []
+        self.done = False
+        self.error = None
+        self.task = None
+        self._changed = asyncio.get_running_loop().create_future()
+
+    def notify(self):
+        self._changed.set_result(None)
+        self._changed = asyncio.get_running_loop().create_future()
+
+    async def wait(self):
+        # Shield so one cancelled caller doesn't cancel the shared signal
+        await asyncio.shield(self._changed)
+
+
+class SearchCache:
+    """TTL + LRU cache for search results with single-flight coalescing.
+
+    Concurrent lookups of the same key share one in-flight fetch: every
+    caller receives its batches as they arrive, and the merged result is
+    cached once the fetch completes. Empty results are cached too, for a
+    shorter negative TTL.
+    """
+
+    def __init__(self, max_entries=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL,
+                 negative_ttl=SEARCH_CACHE_NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, results)
+        self._inflight = {}  # key -> _Flight
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'coalesced': 0}
+
+    @staticmethod
+    def _copy(results):
+        # Callers enrich result dicts in place; never hand out the cached ones
+        return [dict(v) for v in results]
+
+    def _store(self, key, results):
+        ttl = self.ttl if results else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _cached(self, key):
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires_at, results = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits' if results else 'negative_hits'] += 1
+        return self._copy(results)
+
+    async def stream(self, key, fetch):
+        """Yield the result batches for key.
+
+        A fresh cached result comes back as one batch. Otherwise fetch() (an
+        async iterator of batches) is started, or joined if another caller
+        already started it; it runs to completion even when callers stop
+        early, and its merged batches are then cached.
+        """
+        cached = self._cached(key)
+        if cached is not None:
+            if cached:
+                yield cached
+            return
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['misses'] += 1
+            flight = self._inflight[key] = _Flight()
+            flight.task = asyncio.ensure_future(self._run(key, flight, fetch))
+        sent = 0
+        while True:
+            while sent < len(flight.batches):
+                yield self._copy(flight.batches[sent])
+                sent += 1
+            if flight.done:
+                break
+            await flight.wait()
+        if flight.error is not None:
+            raise flight.error
+
+    async def _run(self, key, flight, fetch):
+        try:
+            async for batch in fetch():
+                flight.batches.append(self._copy(batch))
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+            logger.error("Search fetch for %r failed: %s", key, e)
+        else:
+            self._store(key, [v for batch in flight.batches for v in batch])
+        finally:
+            flight.done = True
+            self._inflight.pop(key, None)
+            flight.notify()
+
+    def clear(self):
+        self._entries.clear()
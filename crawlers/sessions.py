@@ -0,0 +1,168 @@
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from curl_cffi import CurlHttpVersion, CurlOpt
+from curl_cffi.requests import AsyncSession, Cookies
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from .env
+SESSION_POOL_SIZE = int(os.getenv('SESSION_POOL_SIZE', 2))             # sessions per host
+SESSION_IDLE_SECONDS = float(os.getenv('SESSION_IDLE_SECONDS', 300))   # close sessions unused this long
+SESSION_HTTP2 = os.getenv('SESSION_HTTP2', 'true').lower() != 'false'
+# Impersonation profiles, in the order they are tried when one gets blocked
+IMPERSONATE_PROFILES = [p.strip() for p in os.getenv(
+    'CRAWLER_IMPERSONATE', 'safari15_5,chrome120,safari17_0').split(',') if p.strip()]
+
+HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh-Hans;q=0.9",
+}
+# Profiles whose User-Agent is pinned; others use the impersonation's own
+USER_AGENTS = {
+    'safari15_5': "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.5 Safari/605.1.15",
+}
+
+ROTATE_COOLDOWN = 60.0  # one block response shouldn't rotate through every profile
+
+OPEN_SESSIONS = REGISTRY.gauge('siren_sessions_open', 'Open HTTP sessions per host', ('host',))
+ROTATIONS = REGISTRY.counter('siren_session_rotations_total', 'Impersonation profile rotations', ('host', 'profile'))
+
+
+class _PooledSession:
+    __slots__ = ('session', 'profile', 'in_flight', 'last_used', 'retired')
+
+    def __init__(self, session, profile):
+        self.session = session
+        self.profile = profile
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+
+class SessionPool:
+    """Long-lived curl_cffi sessions for one host.
+
+    Each session keeps its own cache of warm keep-alive (HTTP/2 where the
+    server offers it) connections; requests go to the least busy session and
+    a new one is opened only while all are busy and the pool is below size.
+    Cookies are shared across the pool. Sessions idle for longer than
+    SESSION_IDLE_SECONDS are closed, and rotate() moves the pool to the next
+    impersonation profile.
+    """
+
+    def __init__(self, host, size=SESSION_POOL_SIZE, profiles=None):
+        self.host = host
+        self.size = max(1, size)
+        self.profiles = profiles or IMPERSONATE_PROFILES
+        self.profile_index = 0
+        self.rotated_at = 0.0
+        self.cookies = Cookies()
+        self._sessions = []
+        OPEN_SESSIONS.set_function(lambda: len(self._sessions), host=host)
+
+    @property
+    def profile(self):
+        return self.profiles[self.profile_index % len(self.profiles)]
+
+    def _open(self):
+        headers = dict(HEADERS)
+        if self.profile in USER_AGENTS:
+            headers["User-Agent"] = USER_AGENTS[self.profile]
+        session = AsyncSession(
+            impersonate=self.profile,
+            timeout=30.0,
+            headers=headers,
+            cookies=self.cookies,
+            http_version=CurlHttpVersion.V2TLS if SESSION_HTTP2 else CurlHttpVersion.V1_1,
+            curl_options={
+                CurlOpt.TCP_KEEPALIVE: 1,
+                CurlOpt.MAXAGE_CONN: int(SESSION_IDLE_SECONDS),
+            },
+        )
+        pooled = _PooledSession(session, self.profile)
+        self._sessions.append(pooled)
+        logger.debug("Opened %s session %d/%d for %s", pooled.profile, len(self._sessions), self.size, self.host)
+        return pooled
+
+    async def _discard(self, pooled):
+        if pooled in self._sessions:
+            self._sessions.remove(pooled)
+        try:
+            await pooled.session.close()
+        except Exception as e:
+            logger.debug("Closing session for %s failed: %s", self.host, e)
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        for pooled in list(self._sessions):
+            if not pooled.in_flight and now - pooled.last_used > SESSION_IDLE_SECONDS:
+                await self._discard(pooled)
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow a session for one request"""
+        await self._evict_idle()
+        live = [p for p in self._sessions if not p.retired]
+        pooled = min(live, key=lambda p: p.in_flight, default=None)
+        if pooled is None or (pooled.in_flight and len(live) < self.size):
+            pooled = self._open()
+        pooled.in_flight += 1
+        pooled.session.cookies.update(self.cookies)
+        try:
+            yield pooled.session
+        finally:
+            pooled.in_flight -= 1
+            pooled.last_used = time.monotonic()
+            self.cookies.update(pooled.session.cookies)
+            if pooled.retired and not pooled.in_flight:
+                await self._discard(pooled)
+
+    async def rotate(self, reason):
+        """Switch to the next impersonation profile; current sessions close once idle"""
+        now = time.monotonic()
+        if len(self.profiles) < 2 or now - self.rotated_at < ROTATE_COOLDOWN:
+            return
+        self.rotated_at = now
+        old = self.profile
+        self.profile_index += 1
+        ROTATIONS.inc(host=self.host, profile=self.profile)
+        logger.warning("Rotating %s from %s to %s (%s)", self.host, old, self.profile, reason)
+        for pooled in list(self._sessions):
+            pooled.retired = True
+            if not pooled.in_flight:
+                await self._discard(pooled)
+
+    async def close(self):
+        for pooled in list(self._sessions):
+            await self._discard(pooled)
+
+
+_pools = {}
+
+
+def get_pool(url):
+    """Return the shared session pool for the host of url"""
+    host = (urlparse(url).netloc or '').lower()
+    pool = _pools.get(host)
+    if pool is None:
+        pool = _pools[host] = SessionPool(host)
+    return pool
+
+
+async def close_pool(url):
+    pool = _pools.pop((urlparse(url).netloc or '').lower(), None)
+    if pool is not None:
+        await pool.close()
+
+
+async def close_pools():
+    """Close every session of every host"""
+    while _pools:
+        _, pool = _pools.popitem()
+        await pool.close()
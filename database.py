@@ -1,12 +1,98 @@
+import asyncio
+import json
 import sqlite3
 import logging
 import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
-from threading import Lock
+
+from bloom import BloomFilter
+from metrics import DB_ERRORS, DB_QUEUE_DEPTH, DB_SECONDS
+from migrations import NAME_TABLES, apply_migrations, link_names, relink_names
+from subscriptions import normalize
 
 logger = logging.getLogger(__name__)
 
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',   # safe with WAL, avoids an fsync per commit
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',    # 16 MB page cache
+    'PRAGMA mmap_size=134217728',  # 128 MB
+    'PRAGMA busy_timeout=5000',
+)
+
+MAX_BATCH = 500  # queued operations coalesced into one transaction
+# videos columns carried by export/import, besides the per-source URLs
+CATALOG_COLUMNS = ('code', 'title', 'actresses', 'tags', 'duration', 'release_date',
+                   'cover_url', 'preview_url', 'detail_url', 'created_time')
+MIN_INDEX_CAPACITY = 100000  # codes the membership filter holds before it is resized
+# After another process (e.g. cli.py backfill) writes, the filter can't rule
+# codes out; it is rebuilt at most this often and bypassed in between
+CODE_INDEX_REFRESH = 60.0
+
+# bm25 column weights: a code hit outranks a title hit, and so on
+FTS_RANK = 'bm25(videos_fts, 10.0, 4.0, 3.0, 1.0)'
+_FTS_TOKEN = re.compile(r'\w+')
+
+# Queries on hot paths, with sample parameters. check_query_plans() asserts
+# none of them falls back to a full table scan.
+HOT_QUERIES = {
+    'latest_videos': ('SELECT * FROM videos ORDER BY created_time DESC LIMIT ?', (10,)),
+    'video_by_code': ('SELECT * FROM videos WHERE code = ?', ('SSIS-001',)),
+    'chat_subscriptions': ('SELECT * FROM subscriptions WHERE chat_id = ? AND enabled = 1', (1,)),
+    'video_push_records': ('SELECT * FROM push_records WHERE video_id = ? AND chat_id = ?', (1, 1)),
+    'chat_push_records': ('SELECT * FROM push_records WHERE chat_id = ? ORDER BY pushed_at DESC LIMIT ?', (1, 10)),
+    'video_sources': ('SELECT source, url FROM video_sources WHERE code = ?', ('SSIS-001',)),
+}
+# 'SCAN videos' (SQLite >= 3.36) or 'SCAN TABLE videos'; index scans carry a USING clause
+_TABLE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+
+def _videos_by_name_sql(table):
+    join_table, column = NAME_TABLES[table]
+    return f'''
+        SELECT videos.* FROM {table}
+        JOIN {join_table} ON {join_table}.{column} = {table}.id
+        JOIN videos ON videos.id = {join_table}.video_id
+        WHERE {table}.key = ? AND (? IS NULL OR videos.created_time >= ?)
+        ORDER BY videos.created_time DESC LIMIT ?
+    '''
+
+
+for _table in NAME_TABLES:
+    HOT_QUERIES[f'videos_by_{_table}'] = (_videos_by_name_sql(_table), ('x', None, None, 10))
+
+
+def fts_query(keyword):
+    """Turn free text into an FTS5 query where every word must match as a prefix"""
+    tokens = _FTS_TOKEN.findall(keyword.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+class _Job:
+    """A queued operation. Consecutive jobs sharing the same handler are merged
+    so their items run as one call (e.g. one executemany)."""
+    __slots__ = ('handler', 'items', 'future')
+
+    def __init__(self, handler, items):
+        self.handler = handler
+        self.items = items
+        self.future = Future()
+
+
 class Database:
+    """SQLite storage running on a dedicated thread with one long-lived connection.
+
+    Every public method is a coroutine: the call is queued to the worker thread
+    and awaited, so the event loop never blocks on disk. The worker drains
+    whatever is queued and runs it inside a single transaction.
+    """
+
     def __init__(self, db_path="missav.db"):
         self.db_path = db_path
         # Ensure the directory for the database file exists
@@ -14,136 +100,602 @@ class Database:
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir, exist_ok=True)
             logger.info("Created database directory: %s", db_dir)
-            
-        self._lock = Lock()
-        self.init_db()
 
-    def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+        self._queue = queue.Queue()
+        DB_QUEUE_DEPTH.set_function(self._queue.qsize)
+        self._conn = None
+        self._known = None  # BloomFilter of every stored code
+        self._index_version = None  # PRAGMA data_version when _known was built
+        self._index_built = 0.0
+        self.fts_enabled = False
+        ready = Future()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="siren-db", daemon=True)
+        self._thread.start()
+        ready.result()
+
+    # -- worker thread -------------------------------------------------
+
+    def _run(self, ready):
+        try:
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            for pragma in PRAGMAS:
+                self._conn.execute(pragma)
+            self.init_db()
+            self._load_code_index()
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < MAX_BATCH:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._run_batch(batch)
+        self._conn.close()
+        logger.info("Database connection closed: %s", self.db_path)
+
+    def _run_batch(self, batch):
+        conn = self._conn
+        try:
+            conn.execute('BEGIN')
+            outcomes = []
+            for handler, jobs in self._group(batch):
+                items = [item for job in jobs for item in job.items]
+                results = handler(conn, items)
+                pos = 0
+                for job in jobs:
+                    outcomes.append((job, results[pos:pos + len(job.items)]))
+                    pos += len(job.items)
+            conn.execute('COMMIT')
+        except Exception as e:
+            conn.execute('ROLLBACK')
+            if len(batch) > 1:
+                # Isolate the failing operation so the rest still commit
+                for job in batch:
+                    self._run_batch([job])
+            else:
+                batch[0].future.set_exception(e)
+            return
+        for job, results in outcomes:
+            job.future.set_result(results)
+
+    @staticmethod
+    def _group(batch):
+        groups = []
+        for job in batch:
+            if groups and groups[-1][0] == job.handler:
+                groups[-1][1].append(job)
+            else:
+                groups.append((job.handler, [job]))
+        return groups
+
+    async def _submit(self, handler, items):
+        job = _Job(handler, items)
+        operation = handler.__name__.lstrip('_')
+        started = time.perf_counter()
+        self._queue.put(job)
+        try:
+            return await asyncio.wrap_future(job.future)
+        except Exception:
+            DB_ERRORS.inc(operation=operation)
+            raise
+        finally:
+            DB_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+    async def _call(self, handler, *args):
+        """Run handler(conn, [args]) on the worker and return its single result"""
+        results = await self._submit(handler, [args])
+        return results[0]
+
+    async def close(self):
+        """Flush queued operations and close the connection"""
+        self._queue.put(None)
+        await asyncio.to_thread(self._thread.join)
+
+    # -- schema --------------------------------------------------------
 
     def init_db(self):
-        with self._lock, self._get_connection() as conn:
-            cursor = conn.cursor()
-            # Videos table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS videos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    code TEXT UNIQUE NOT NULL,
-                    title TEXT,
-                    actresses TEXT,
-                    tags TEXT,
-                    duration INTEGER,
-                    release_date TEXT,
-                    cover_url TEXT,
-                    preview_url TEXT,
-                    detail_url TEXT,
-                    pushed BOOLEAN DEFAULT 0,
-                    created_time TEXT
-                )
-            ''')
-            
-            # Subscriptions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS subscriptions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    chat_id INTEGER NOT NULL,
-                    chat_type TEXT,
-                    type TEXT NOT NULL, -- ALL, ACTRESS, TAG
-                    keyword TEXT,
-                    enabled BOOLEAN DEFAULT 1,
-                    created_time TEXT
-                )
-            ''')
-            
-            # Push records table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS push_records (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    video_id INTEGER NOT NULL,
-                    chat_id INTEGER NOT NULL,
-                    status TEXT NOT NULL, -- SUCCESS, FAILED
-                    fail_reason TEXT,
-                    pushed_at TEXT,
-                    FOREIGN KEY (video_id) REFERENCES videos (id)
-                )
-            ''')
-            conn.commit()
-            logger.info("Database initialized successfully at %s", self.db_path)
-
-    def save_video(self, video_data):
-        """video_data: dict with keys matching table columns"""
-        with self._lock, self._get_connection() as conn:
-            cursor = conn.cursor()
-            try:
-                now = datetime.now().isoformat()
-                cursor.execute('''
-                    INSERT OR IGNORE INTO videos (
-                        code, title, actresses, tags, duration, 
-                        release_date, cover_url, preview_url, detail_url, created_time
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    video_data.get('code'),
-                    video_data.get('title'),
-                    video_data.get('actresses'),
-                    video_data.get('tags'),
-                    video_data.get('duration'),
-                    video_data.get('release_date'),
-                    video_data.get('cover_url'),
-                    video_data.get('preview_url'),
-                    video_data.get('detail_url'),
-                    now
-                ))
-                conn.commit()
-                return cursor.rowcount > 0
-            except Exception as e:
-                logger.error("Error saving video %s: %s", video_data.get('code'), e)
-                return False
-
-    def is_video_exists(self, code):
-        with self._lock, self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT 1 FROM videos WHERE code = ?', (code,))
-            return cursor.fetchone() is not None
-
-    def get_latest_videos(self, limit=10):
-        with self._lock, self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM videos ORDER BY created_time DESC LIMIT ?', (limit,))
-            return [dict(row) for row in cursor.fetchall()]
-
-    def subscribe(self, chat_id, chat_type, sub_type, keyword=None):
-        with self._lock, self._get_connection() as conn:
-            cursor = conn.cursor()
-            now = datetime.now().isoformat()
-            cursor.execute('''
-                INSERT INTO subscriptions (chat_id, chat_type, type, keyword, created_time)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (chat_id, chat_type, sub_type, keyword, now))
-            conn.commit()
-
-    def unsubscribe(self, chat_id, sub_type=None, keyword=None):
-        with self._lock, self._get_connection() as conn:
-            cursor = conn.cursor()
+        """Bring the schema up to date by applying pending migrations"""
+        version = apply_migrations(self._conn)
+        self.fts_enabled = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'videos_fts'").fetchone() is not None
+        for name in self._check_query_plans(self._conn, [()])[0]:
+            logger.warning("Hot query %s scans a table, an index is missing", name)
+        logger.info("Database initialized successfully at %s (schema version %d)", self.db_path, version)
+
+    @staticmethod
+    def _check_query_plans(conn, items):
+        """Names of HOT_QUERIES whose plan contains a full table scan"""
+        scanning = []
+        for name, (sql, params) in HOT_QUERIES.items():
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+            if any(_TABLE_SCAN.match(row[3]) for row in plan):
+                scanning.append(name)
+        return [scanning] * len(items)
+
+    def _load_code_index(self):
+        """(Re)build the in-memory membership filter from the videos table"""
+        total = self._conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+        known = BloomFilter(max(MIN_INDEX_CAPACITY, total * 2))
+        cursor = self._conn.execute('SELECT code FROM videos')
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            for (code,) in rows:
+                known.add(code)
+        self._known = known
+        self._index_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        self._index_built = time.monotonic()
+        logger.info("Loaded %d known codes into membership index (%d KB)", total, len(known.bits) // 1024)
+
+    def _code_index_current(self):
+        """True when the membership filter covers every stored code.
+
+        data_version only changes when another connection commits; the filter
+        is then rebuilt, at most every CODE_INDEX_REFRESH seconds.
+        """
+        if self._conn.execute('PRAGMA data_version').fetchone()[0] == self._index_version:
+            return True
+        if time.monotonic() - self._index_built < CODE_INDEX_REFRESH:
+            return False
+        self._load_code_index()
+        return True
+
+    def _maybe_known(self, codes):
+        """The codes that may be stored: all of them unless the filter is current"""
+        if not self._code_index_current():
+            return list(codes)
+        return [code for code in codes if code in self._known]
+
+    # -- handlers (worker thread) --------------------------------------
+
+    def _save_videos(self, conn, videos):
+        # Whether a video is new is decided by the insert itself, so rows
+        # written by another process are never reported as new
+        results = [False] * len(videos)
+        rows = []
+        now = datetime.now().isoformat()
+        for i, video_data in enumerate(videos):
+            code = video_data.get('code')
+            if not code:
+                logger.error("Error saving video without code: %s", video_data.get('detail_url'))
+                continue
+            row = (
+                code,
+                video_data.get('title'),
+                video_data.get('actresses'),
+                video_data.get('tags'),
+                video_data.get('duration'),
+                video_data.get('release_date'),
+                video_data.get('cover_url'),
+                video_data.get('preview_url'),
+                video_data.get('detail_url'),
+                now
+            )
+            cursor = conn.execute('''
+                INSERT OR IGNORE INTO videos (
+                    code, title, actresses, tags, duration,
+                    release_date, cover_url, preview_url, detail_url, created_time
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row)
+            if cursor.rowcount > 0:
+                results[i] = True
+                rows.append(row)
+                self._known.add(code)
+        link_names(conn, [(row[0], row[2], row[3]) for row in rows])
+        if self._known.full:
+            self._load_code_index()
+        return results
+
+    @staticmethod
+    def _update_videos(conn, videos):
+        # Fill in detail fields; empty values never overwrite stored ones
+        results = []
+        for video in videos:
+            cursor = conn.execute('''
+                UPDATE videos SET
+                    title = COALESCE(NULLIF(?, ''), title),
+                    actresses = COALESCE(NULLIF(?, ''), actresses),
+                    tags = COALESCE(NULLIF(?, ''), tags),
+                    duration = COALESCE(?, duration),
+                    release_date = COALESCE(NULLIF(?, ''), release_date),
+                    cover_url = COALESCE(NULLIF(?, ''), cover_url),
+                    preview_url = COALESCE(NULLIF(?, ''), preview_url)
+                WHERE code = ?
+            ''', (
+                video.get('title'),
+                video.get('actresses'),
+                video.get('tags'),
+                video.get('duration'),
+                video.get('release_date'),
+                video.get('cover_url'),
+                video.get('preview_url'),
+                video.get('code'),
+            ))
+            results.append(cursor.rowcount > 0)
+        relink_names(conn, [(v.get('code'), v.get('actresses'), v.get('tags'))
+                            for v, ok in zip(videos, results) if ok])
+        return results
+
+    def _upsert_videos(self, conn, videos):
+        # Imported catalog rows: new codes are inserted as already pushed (a
+        # seeded catalog isn't news); known ones take every non-empty value
+        now = datetime.now().isoformat()
+        rows = [tuple(v.get(column) for column in CATALOG_COLUMNS[:-1]) + (v.get('created_time') or now,)
+                for v in videos]
+        conn.executemany('''
+            INSERT INTO videos (
+                code, title, actresses, tags, duration,
+                release_date, cover_url, preview_url, detail_url, created_time, pushed
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT(code) DO UPDATE SET
+                title = COALESCE(NULLIF(excluded.title, ''), title),
+                actresses = COALESCE(NULLIF(excluded.actresses, ''), actresses),
+                tags = COALESCE(NULLIF(excluded.tags, ''), tags),
+                duration = COALESCE(excluded.duration, duration),
+                release_date = COALESCE(NULLIF(excluded.release_date, ''), release_date),
+                cover_url = COALESCE(NULLIF(excluded.cover_url, ''), cover_url),
+                preview_url = COALESCE(NULLIF(excluded.preview_url, ''), preview_url),
+                detail_url = COALESCE(NULLIF(excluded.detail_url, ''), detail_url)
+        ''', rows)
+        relink_names(conn, [(v['code'], v.get('actresses'), v.get('tags')) for v in videos])
+        self._add_video_sources(conn, [(v['code'], source, url) for v in videos
+                                       for source, url in (v.get('sources') or {}).items()])
+        for v in videos:
+            self._known.add(v['code'])
+        if self._known.full:
+            self._load_code_index()
+        return [None] * len(videos)
+
+    def _is_video_exists(self, conn, items):
+        return [bool(self._maybe_known([code]))
+                and conn.execute('SELECT 1 FROM videos WHERE code = ?', (code,)).fetchone() is not None
+                for (code,) in items]
+
+    def _existing_codes(self, conn, items):
+        results = []
+        for (codes,) in items:
+            codes = self._maybe_known(codes)
+            found = set()
+            for i in range(0, len(codes), 500):
+                chunk = codes[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(r[0] for r in conn.execute(
+                    f'SELECT code FROM videos WHERE code IN ({placeholders})', chunk))
+            results.append(found)
+        return results
+
+    def _get_videos(self, conn, items):
+        results = []
+        for (code,) in items:
+            if not self._maybe_known([code]):
+                results.append(None)
+                continue
+            row = conn.execute(HOT_QUERIES['video_by_code'][0], (code,)).fetchone()
+            results.append(dict(row) if row else None)
+        return results
+
+    @staticmethod
+    def _search_videos(conn, items):
+        results = []
+        for query, limit in items:
+            rows = conn.execute(f'''
+                SELECT videos.* FROM videos_fts JOIN videos ON videos.id = videos_fts.rowid
+                WHERE videos_fts MATCH ? ORDER BY {FTS_RANK}, videos.created_time DESC LIMIT ?
+            ''', (query, limit))
+            results.append([dict(row) for row in rows])
+        return results
+
+    @staticmethod
+    def _get_videos_by_name(conn, items):
+        results = []
+        for table, key, since, limit in items:
+            rows = conn.execute(_videos_by_name_sql(table), (key, since, since, limit))
+            results.append([dict(row) for row in rows])
+        return results
+
+    @staticmethod
+    def _tag_stats(conn, items):
+        return [[(row['name'], row['videos']) for row in conn.execute('''
+            SELECT tags.name, COUNT(*) AS videos FROM video_tags
+            JOIN tags ON tags.id = video_tags.tag_id
+            GROUP BY video_tags.tag_id ORDER BY videos DESC LIMIT ?
+        ''', (limit,))] for (limit,) in items]
+
+    @staticmethod
+    def _get_latest_videos(conn, items):
+        return [[dict(row) for row in conn.execute(HOT_QUERIES['latest_videos'][0], (limit,))]
+                for (limit,) in items]
+
+    @staticmethod
+    def _subscribe(conn, items):
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            INSERT INTO subscriptions (chat_id, chat_type, type, keyword, created_time)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [item + (now,) for item in items])
+        return [None] * len(items)
+
+    @staticmethod
+    def _unsubscribe(conn, items):
+        for chat_id, sub_type, keyword in items:
             if not sub_type:
-                cursor.execute('DELETE FROM subscriptions WHERE chat_id = ?', (chat_id,))
+                conn.execute('DELETE FROM subscriptions WHERE chat_id = ?', (chat_id,))
             else:
-                cursor.execute('DELETE FROM subscriptions WHERE chat_id = ? AND type = ? AND keyword = ?', 
+                # IS, so the keyword-less ALL subscription matches too
+                conn.execute('DELETE FROM subscriptions WHERE chat_id = ? AND type = ? AND keyword IS ?',
                              (chat_id, sub_type, keyword))
-            conn.commit()
+        return [None] * len(items)
 
-    def get_subscriptions(self, chat_id=None):
-        with self._lock, self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+    @staticmethod
+    def _get_subscriptions(conn, items):
+        results = []
+        for (chat_id,) in items:
             if chat_id:
-                cursor.execute('SELECT * FROM subscriptions WHERE chat_id = ? AND enabled = 1', (chat_id,))
+                rows = conn.execute(HOT_QUERIES['chat_subscriptions'][0], (chat_id,))
             else:
-                cursor.execute('SELECT * FROM subscriptions WHERE enabled = 1')
-            return [dict(row) for row in cursor.fetchall()]
-
-    def mark_pushed(self, video_id):
-        with self._lock, self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('UPDATE videos SET pushed = 1 WHERE id = ?', (video_id,))
-            conn.commit()
+                rows = conn.execute('SELECT * FROM subscriptions WHERE enabled = 1')
+            results.append([dict(row) for row in rows])
+        return results
+
+    @staticmethod
+    def _record_pushes(conn, items):
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            INSERT INTO push_records (video_id, chat_id, status, fail_reason, pushed_at)
+            SELECT id, ?, ?, ?, ? FROM videos WHERE code = ?
+        ''', [(chat_id, status, fail_reason, now, code) for code, chat_id, status, fail_reason in items])
+        conn.executemany('UPDATE videos SET pushed = 1 WHERE code = ?',
+                         [(code,) for code, _, status, _ in items if status == 'SUCCESS'])
+        return [None] * len(items)
+
+    @staticmethod
+    def _mark_pushed(conn, items):
+        conn.executemany('UPDATE videos SET pushed = 1 WHERE id = ?', items)
+        return [None] * len(items)
+
+    @staticmethod
+    def _get_watermarks(conn, items):
+        results = []
+        for (source,) in items:
+            row = conn.execute('SELECT codes FROM watermarks WHERE source = ?', (source,)).fetchone()
+            results.append(row[0].split(',') if row and row[0] else [])
+        return results
+
+    @staticmethod
+    def _set_watermarks(conn, items):
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            INSERT INTO watermarks (source, codes, updated_time) VALUES (?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET codes = excluded.codes, updated_time = excluded.updated_time
+        ''', [(source, ','.join(codes), now) for source, codes in items])
+        return [None] * len(items)
+
+    @staticmethod
+    def _get_video_sources(conn, items):
+        return [dict(conn.execute('SELECT source, url FROM video_sources WHERE code = ?', (code,)).fetchall())
+                for (code,) in items]
+
+    @staticmethod
+    def _add_video_sources(conn, items):
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            INSERT INTO video_sources (code, source, url, seen_time) VALUES (?, ?, ?, ?)
+            ON CONFLICT(code, source) DO UPDATE SET url = excluded.url, seen_time = excluded.seen_time
+        ''', [item + (now,) for item in items])
+        return [None] * len(items)
+
+    @staticmethod
+    def _get_backfill_progress(conn, items):
+        return [{stream: {'page': page, 'done': bool(done), 'videos': videos}
+                 for stream, page, done, videos in conn.execute(
+                     'SELECT stream, page, done, videos FROM backfill_progress WHERE job = ?', (job,))}
+                for (job,) in items]
+
+    @staticmethod
+    def _set_backfill_progress(conn, items):
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            INSERT INTO backfill_progress (job, stream, page, done, videos, updated_time) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job, stream) DO UPDATE SET
+                page = excluded.page, done = excluded.done,
+                videos = excluded.videos, updated_time = excluded.updated_time
+        ''', [item + (now,) for item in items])
+        return [None] * len(items)
+
+    @staticmethod
+    def _clear_backfill_progress(conn, items):
+        conn.executemany('DELETE FROM backfill_progress WHERE job = ?', items)
+        return [None] * len(items)
+
+    # -- public API ----------------------------------------------------
+
+    async def save_video(self, video_data):
+        """video_data: dict with keys matching table columns"""
+        try:
+            results = await self._submit(self._save_videos, [video_data])
+            return results[0]
+        except Exception as e:
+            logger.error("Error saving video %s: %s", video_data.get('code'), e)
+            return False
+
+    async def save_videos(self, videos):
+        """Save many videos in one transaction; returns a list of booleans"""
+        if not videos:
+            return []
+        try:
+            return await self._submit(self._save_videos, list(videos))
+        except Exception as e:
+            logger.error("Error saving %d videos: %s", len(videos), e)
+            return [False] * len(videos)
+
+    async def update_videos(self, videos):
+        """Write detail fields found after saving; returns a list of booleans (row found)"""
+        if not videos:
+            return []
+        try:
+            return await self._submit(self._update_videos, list(videos))
+        except Exception as e:
+            logger.error("Error updating %d videos: %s", len(videos), e)
+            return [False] * len(videos)
+
+    async def upsert_videos(self, videos):
+        """Insert or update catalog rows (dicts with CATALOG_COLUMNS and optional
+        sources {source: url}) in one transaction"""
+        videos = [v for v in videos if v.get('code')]
+        if videos:
+            await self._submit(self._upsert_videos, videos)
+        return len(videos)
+
+    async def iter_videos(self, since=None, until=None, source=None, source_url=None, batch=1000):
+        """Yield stored videos (CATALOG_COLUMNS plus sources) oldest first, batch rows at a time.
+
+        since/until bound created_time (ISO strings, until exclusive); source
+        keeps videos recorded in video_sources for that source, and videos
+        with no video_sources rows (stored before they were tracked) whose
+        detail_url starts with source_url. Rows are read
+        from a cursor on a separate read connection, so memory stays flat
+        and the writer thread isn't held up.
+        """
+        clauses, params = [], []
+        if since:
+            clauses.append('v.created_time >= ?')
+            params.append(since)
+        if until:
+            clauses.append('v.created_time < ?')
+            params.append(until)
+        if source:
+            clauses.append('''(EXISTS (SELECT 1 FROM video_sources s WHERE s.code = v.code AND s.source = ?)
+                OR (? IS NOT NULL AND substr(v.detail_url, 1, length(?)) = ?
+                    AND NOT EXISTS (SELECT 1 FROM video_sources s WHERE s.code = v.code)))''')
+            params.extend((source, source_url, source_url, source_url))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        columns = ', '.join(f'v.{c}' for c in CATALOG_COLUMNS)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            cursor = conn.execute(f'''
+                SELECT {columns},
+                    (SELECT json_group_object(s.source, s.url) FROM video_sources s WHERE s.code = v.code)
+                FROM videos v {where}
+                ORDER BY v.created_time, v.id
+            ''', params)
+            while True:
+                rows = await asyncio.to_thread(cursor.fetchmany, batch)
+                if not rows:
+                    break
+                for row in rows:
+                    video = dict(zip(CATALOG_COLUMNS, row))
+                    video['sources'] = json.loads(row[-1]) if row[-1] else {}
+                    yield video
+        finally:
+            conn.close()
+
+    async def is_video_exists(self, code):
+        return await self._call(self._is_video_exists, code)
+
+    async def existing_codes(self, codes):
+        """Return the subset of codes already stored.
+
+        Codes the membership filter rules out are answered without touching
+        the videos table (unless another process wrote to the database since
+        the filter was built); possible positives are confirmed with one query.
+        """
+        candidates = [code for code in set(codes) if code]
+        if not candidates:
+            return set()
+        return await self._call(self._existing_codes, candidates)
+
+    async def get_video(self, code):
+        """Return the stored row for code, or None"""
+        return await self._call(self._get_videos, code)
+
+    async def search_videos(self, keyword, limit=5):
+        """Full-text search over stored code/title/actresses/tags, best match first.
+
+        Every word of keyword must match a word prefix; returns [] when the
+        FTS index is unavailable.
+        """
+        query = fts_query(keyword)
+        if not self.fts_enabled or not query:
+            return []
+        try:
+            return await self._call(self._search_videos, query, limit)
+        except sqlite3.Error as e:
+            logger.error("Local search for %r failed: %s", keyword, e)
+            return []
+
+    async def get_videos_by_actress(self, name, since=None, limit=10):
+        """Newest stored videos featuring name (matched like subscriptions)"""
+        return await self._call(self._get_videos_by_name, 'actresses', normalize(name), since, limit)
+
+    async def get_videos_by_tag(self, tag, since=None, limit=10):
+        """Newest stored videos carrying tag; since is an ISO created_time lower bound"""
+        return await self._call(self._get_videos_by_name, 'tags', normalize(tag), since, limit)
+
+    async def tag_stats(self, limit=20):
+        """Return [(tag, video count)] for the most used tags"""
+        return await self._call(self._tag_stats, limit)
+
+    async def get_latest_videos(self, limit=10):
+        return await self._call(self._get_latest_videos, limit)
+
+    async def check_query_plans(self):
+        """Return the names of HOT_QUERIES that scan a table (empty when all use indexes)"""
+        return await self._call(self._check_query_plans)
+
+    async def subscribe(self, chat_id, chat_type, sub_type, keyword=None):
+        await self._call(self._subscribe, chat_id, chat_type, sub_type, keyword)
+
+    async def unsubscribe(self, chat_id, sub_type=None, keyword=None):
+        await self._call(self._unsubscribe, chat_id, sub_type, keyword)
+
+    async def get_subscriptions(self, chat_id=None):
+        return await self._call(self._get_subscriptions, chat_id)
+
+    async def record_push(self, code, chat_id, status, fail_reason=None):
+        """Log a delivery attempt in push_records (SUCCESS marks the video pushed)"""
+        await self._call(self._record_pushes, code, chat_id, status, fail_reason)
+
+    async def mark_pushed(self, video_id):
+        await self._call(self._mark_pushed, video_id)
+
+    async def get_watermark(self, source):
+        """Return the codes last seen on source's new-video list, newest first"""
+        return await self._call(self._get_watermarks, source)
+
+    async def set_watermark(self, source, codes):
+        await self._call(self._set_watermarks, source, list(codes))
+
+    async def get_video_sources(self, code):
+        """Return {source: detail URL} for every source known to have code"""
+        return await self._call(self._get_video_sources, code)
+
+    async def add_video_sources(self, rows):
+        """Record (code, source, url) rows, replacing the URL a source had"""
+        rows = [tuple(row) for row in rows]
+        if rows:
+            await self._submit(self._add_video_sources, rows)
+
+    async def get_backfill_progress(self, job):
+        """Return {stream: {'page', 'done', 'videos'}} checkpointed for job"""
+        return await self._call(self._get_backfill_progress, job)
+
+    async def set_backfill_progress(self, job, stream, page, done, videos):
+        await self._call(self._set_backfill_progress, job, stream, page, done, videos)
+
+    async def clear_backfill_progress(self, job):
+        await self._call(self._clear_backfill_progress, job)
@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+
+import discord
+
+from metrics import DELIVERY_QUEUE_DEPTH, SEND_SECONDS, SEND_TOTAL
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0  # replies to slash commands
+BACKGROUND = 1   # new-video pushes
+
+MAX_EMBEDS = 10  # Discord limit per message
+MAX_EMBED_CHARS = 6000  # Discord limit on the combined text of a message's embeds
+# Per-destination send budget (Discord allows about 5 messages / 5s per channel)
+SEND_BURST = int(os.getenv('DELIVERY_SEND_BURST', 5))
+SEND_PERIOD = float(os.getenv('DELIVERY_SEND_PERIOD', 5.0))
+
+
+class _Bucket:
+    """Sliding-window send budget for one channel or webhook"""
+
+    def __init__(self, capacity=SEND_BURST, period=SEND_PERIOD):
+        self.capacity = capacity
+        self.period = period
+        self.sent = deque()
+        self.blocked_until = 0.0
+
+    def delay(self):
+        now = time.monotonic()
+        while self.sent and now - self.sent[0] >= self.period:
+            self.sent.popleft()
+        wait = max(0.0, self.blocked_until - now)
+        if len(self.sent) >= self.capacity:
+            wait = max(wait, self.sent[0] + self.period - now)
+        return wait
+
+    def hit(self):
+        self.sent.append(time.monotonic())
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class _Delivery:
+    __slots__ = ('target', 'content', 'embeds', 'priority', 'on_sent', 'future', 'message')
+
+    def __init__(self, target, content, embeds, priority, on_sent, message=None):
+        self.target = target
+        self.content = content
+        self.embeds = embeds
+        self.priority = priority
+        self.on_sent = on_sent
+        self.message = message  # set for edits of an already sent message
+        self.future = asyncio.get_running_loop().create_future()
+
+
+def _chunk(embeds):
+    """Split embeds into message-sized lists (MAX_EMBEDS, MAX_EMBED_CHARS)"""
+    chunks = []
+    chars = 0
+    for embed in embeds:
+        size = len(embed)  # discord.Embed counts title, description, fields, footer and author
+        if not chunks or len(chunks[-1]) >= MAX_EMBEDS or chars + size > MAX_EMBED_CHARS:
+            chunks.append([])
+            chars = 0
+        chunks[-1].append(embed)
+        chars += size
+    return chunks
+
+
+def destination_key(target):
+    """Rate-limit bucket key: interaction webhooks are limited per token"""
+    token = getattr(target, 'token', None)
+    if isinstance(target, discord.Webhook) and token:
+        return ('webhook', token)
+    if isinstance(target, (discord.User, discord.Member)):
+        return ('user', target.id)
+    return ('channel', getattr(target, 'id', id(target)))
+
+
+class DeliveryQueue:
+    """Central outbound queue for Discord messages.
+
+    Each destination gets a lane that sends in priority order within its own
+    rate-limit bucket. Consecutive queued deliveries with the same content are
+    packed into one message of up to 10 embeds and 6000 characters of
+    embed text. Background lanes hold off
+    while interactive replies are pending. Edits of sent messages share the
+    lane (and budget) of the message's channel.
+    """
+
+    def __init__(self):
+        self._lanes = {}  # key -> [heap, task]
+        self._buckets = {}
+        self._seq = itertools.count()
+        self._interactive_pending = 0
+        self._interactive_idle = asyncio.Event()
+        self._interactive_idle.set()
+        self._pending_edits = {}  # message id -> queued edit
+        self.stats = {'messages': 0, 'embeds': 0, 'edits': 0, 'rate_limited': 0, 'failed': 0}
+        DELIVERY_QUEUE_DEPTH.set_function(lambda: sum(len(lane[0]) for lane in self._lanes.values()))
+
+    def submit(self, target, embeds=(), content=None, priority=BACKGROUND, on_sent=None):
+        """Queue a delivery and return a future for the sent message(s).
+
+        on_sent, if given, is awaited with the error (or None) once sent; its
+        deliveries don't raise through the future.
+        """
+        chunks = _chunk(list(embeds)) or [[]]
+        key = destination_key(target)
+        futures = []
+        for i, chunk in enumerate(chunks):
+            # Content is sent once, with the first chunk
+            delivery = _Delivery(target, content if i == 0 else None, chunk, priority, on_sent)
+            self._enqueue(key, delivery)
+            futures.append(delivery.future)
+            if priority == INTERACTIVE:
+                self._interactive_pending += 1
+                self._interactive_idle.clear()
+        return futures[0] if len(futures) == 1 else asyncio.gather(*futures)
+
+    def edit(self, message, embeds):
+        """Queue replacing the embeds of a sent message; returns a future for the
+        edited message, or None if the edit failed (failures are only logged).
+
+        An edit of the same message still waiting in the queue is updated
+        in place, so a burst of changes costs one request.
+        """
+        # A message holds one chunk; anything past it is dropped
+        embeds = (_chunk(list(embeds)) or [[]])[0]
+        pending = self._pending_edits.get(message.id)
+        if pending is not None:
+            pending.embeds = embeds
+            return pending.future
+        delivery = _Delivery(message.channel, None, embeds, BACKGROUND, None, message=message)
+        self._pending_edits[message.id] = delivery
+        self._enqueue(destination_key(message.channel), delivery)
+        return delivery.future
+
+    def _enqueue(self, key, delivery):
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = [[], None]
+        heapq.heappush(lane[0], (delivery.priority, next(self._seq), delivery))
+        if lane[1] is None or lane[1].done():
+            lane[1] = asyncio.create_task(self._run_lane(key))
+
+    async def send(self, target, embeds=(), content=None, priority=INTERACTIVE):
+        """Queue a delivery and wait until it has been sent"""
+        return await self.submit(target, embeds, content=content, priority=priority)
+
+    async def _run_lane(self, key):
+        heap = self._lanes[key][0]
+        bucket = self._buckets.setdefault(key, _Bucket())
+        while heap:
+            if heap[0][0] != INTERACTIVE and self._interactive_pending:
+                await self._interactive_idle.wait()
+                continue
+            wait = bucket.delay()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            await self._send(heap, bucket, self._pack(heap))
+        del self._lanes[key]
+        if len(self._buckets) > 1000:
+            for idle in [k for k, b in self._buckets.items() if not b.delay() and not b.sent]:
+                del self._buckets[idle]
+
+    @staticmethod
+    def _pack(heap):
+        _, _, first = heapq.heappop(heap)
+        batch = [first]
+        count = len(first.embeds)
+        chars = sum(len(e) for e in first.embeds)
+        while heap and first.message is None:
+            priority, _, nxt = heap[0]
+            size = sum(len(e) for e in nxt.embeds)
+            if (priority != first.priority or nxt.content != first.content or nxt.message is not None
+                    or count + len(nxt.embeds) > MAX_EMBEDS or chars + size > MAX_EMBED_CHARS
+                    or not first.embeds):
+                break
+            heapq.heappop(heap)
+            batch.append(nxt)
+            count += len(nxt.embeds)
+            chars += size
+        return batch
+
+    async def _send(self, heap, bucket, batch):
+        first = batch[0]
+        kwargs = {'embeds': [e for d in batch for e in d.embeds]}
+        if first.content is not None:
+            kwargs['content'] = first.content
+        if isinstance(first.target, discord.Webhook):
+            kwargs['wait'] = True  # return the message so callers can edit it
+        error = None
+        message = None
+        kind = destination_key(first.target)[0]
+        bucket.hit()
+        started = time.monotonic()
+        try:
+            if first.message is not None:
+                self._pending_edits.pop(first.message.id, None)
+                message = await first.message.edit(embeds=first.embeds)
+                self.stats['edits'] += 1
+            else:
+                message = await first.target.send(**kwargs)
+                self.stats['messages'] += 1
+                self.stats['embeds'] += len(kwargs['embeds'])
+        except discord.RateLimited as e:
+            error = e
+            retry_after = e.retry_after
+        except discord.HTTPException as e:
+            error = e
+            retry_after = None
+            if e.status == 429:
+                retry_after = float(e.response.headers.get('Retry-After', 1.0))
+        except Exception as e:
+            error = e
+            retry_after = None
+        SEND_SECONDS.observe(time.monotonic() - started, kind=kind)
+
+        if error is not None and retry_after is not None:
+            # Rate limited: pause this destination and put the batch back
+            self.stats['rate_limited'] += 1
+            SEND_TOTAL.inc(kind=kind, outcome='rate_limited')
+            bucket.block(retry_after)
+            logger.warning("Delivery to %s rate limited, retrying in %.1fs", first.target, retry_after)
+            for d in batch:
+                heapq.heappush(heap, (d.priority, next(self._seq), d))
+                if d.message is not None:
+                    self._pending_edits.setdefault(d.message.id, d)
+            return
+
+        if error is not None:
+            self.stats['failed'] += 1
+            SEND_TOTAL.inc(kind=kind, outcome='failed')
+            logger.warning("Delivery to %s failed: %s", first.target, error)
+        else:
+            SEND_TOTAL.inc(kind=kind, outcome='sent')
+        for d in batch:
+            if d.priority == INTERACTIVE:
+                self._interactive_pending -= 1
+                if not self._interactive_pending:
+                    self._interactive_idle.set()
+            if d.on_sent is not None:
+                try:
+                    await d.on_sent(error)
+                except Exception as e:
+                    logger.error("Delivery callback failed: %s", e)
+            if d.future.done():
+                continue
+            if error is not None and d.on_sent is None and d.message is None:
+                d.future.set_exception(error)
+            else:
+                d.future.set_result(message)
+
+    async def close(self):
+        """Wait for queued deliveries to go out"""
+        tasks = [lane[1] for lane in self._lanes.values() if lane[1] and not lane[1].done()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=30)
@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+
+from crawlers.resolve import missing_fields
+from metrics import ENRICH_QUEUE_DEPTH, ENRICH_TOTAL
+
+logger = logging.getLogger(__name__)
+
+ENRICH_WORKERS = int(os.getenv('ENRICH_WORKERS', 2))
+ENRICH_RETRIES = int(os.getenv('ENRICH_RETRIES', 3))
+ENRICH_RETRY_DELAY = float(os.getenv('ENRICH_RETRY_DELAY', 60))  # seconds, times the attempt number
+
+PUSHED = 0   # already announced; a message is waiting to be edited
+RETRY = 1    # earlier attempts filled nothing
+
+
+class EnrichmentQueue:
+    """Background detail enrichment for videos stored from their list card.
+
+    Videos are enriched in priority order by a few workers through
+    CrawlerManager.enrich_video. Fields that arrive are written back with
+    Database.update_videos and reported to on_enriched(video, fields).
+    An attempt that fills nothing is retried later at lower priority; after
+    ENRICH_RETRIES attempts on_enriched is called with an empty set so the
+    caller can drop its bookkeeping.
+    """
+
+    def __init__(self, crawler, db, on_enriched=None, workers=ENRICH_WORKERS,
+                 retries=ENRICH_RETRIES, retry_delay=ENRICH_RETRY_DELAY):
+        self.crawler = crawler
+        self.db = db
+        self.on_enriched = on_enriched
+        self.workers = max(1, workers)
+        self.retries = max(1, retries)
+        self.retry_delay = retry_delay
+        self._heap = []
+        self._seq = itertools.count()
+        self._queued = set()  # codes in the heap or waiting for a retry
+        self._ready = asyncio.Event()
+        self._tasks = []
+        self._retrying = set()
+        ENRICH_QUEUE_DEPTH.set_function(lambda: len(self._heap))
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    def submit(self, video, priority=PUSHED):
+        """Queue video (a dict with at least a code) unless it is queued already"""
+        code = video.get('code')
+        if not code or code in self._queued:
+            return False
+        self._queued.add(code)
+        self._push(priority, video, 1)
+        return True
+
+    def _push(self, priority, video, attempt):
+        heapq.heappush(self._heap, (priority, next(self._seq), video, attempt))
+        self._ready.set()
+
+    async def _worker(self):
+        while True:
+            if not self._heap:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            _, _, video, attempt = heapq.heappop(self._heap)
+            try:
+                await self._enrich(video, attempt)
+            except Exception as e:
+                logger.error("Enrichment of %s failed: %s", video.get('code'), e)
+                await self._finish(video, set())
+
+    async def _enrich(self, video, attempt):
+        code = video['code']
+        before = missing_fields(video)
+        await self.crawler.enrich_video(video)
+        filled = before - missing_fields(video)
+        if filled:
+            await self.db.update_videos([video])
+            ENRICH_TOTAL.inc(outcome='enriched')
+            logger.info("Enriched %s: %s", code, ', '.join(sorted(filled)))
+        elif attempt < self.retries:
+            ENRICH_TOTAL.inc(outcome='retry')
+            retry = asyncio.create_task(self._retry(video, attempt + 1, self.retry_delay * attempt))
+            self._retrying.add(retry)
+            retry.add_done_callback(self._retrying.discard)
+            return
+        else:
+            ENRICH_TOTAL.inc(outcome='failed')
+            logger.warning("Giving up enriching %s after %d attempts", code, attempt)
+        await self._finish(video, filled)
+
+    async def _finish(self, video, filled):
+        self._queued.discard(video.get('code'))
+        if self.on_enriched is None:
+            return
+        try:
+            await self.on_enriched(video, filled)
+        except Exception as e:
+            logger.error("Enrichment callback for %s failed: %s", video.get('code'), e)
+
+    async def _retry(self, video, attempt, delay):
+        await asyncio.sleep(delay)
+        self._push(RETRY, video, attempt)
+
+    async def close(self):
+        tasks = self._tasks + list(self._retrying)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        ENRICH_QUEUE_DEPTH.remove()
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Prometheus text endpoint; METRICS_PORT=0 disables it
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+
+# Seconds; covers sub-millisecond DB calls up to slow page fetches
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        # Updated from the event loop and from the database thread
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def series(self):
+        """Return {label tuple: value} for every recorded label combination"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(self.series().items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        return sum(self.series().values())
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, or be read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, fn, **labels):
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def remove(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values.pop(key, None)
+            self._functions.pop(key, None)
+
+    def series(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = fn()
+            except Exception as e:
+                logger.debug("Gauge %s callback failed: %s", self.name, e)
+        return values
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def series(self):
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def summary(self, **labels):
+        """Return (count, mean, approximate p95) for one label combination"""
+        state = self.series().get(self._key(labels))
+        if not state:
+            return 0, 0.0, 0.0
+        return self._summarize(*state)
+
+    def _summarize(self, counts, total, count):
+        if not count:
+            return 0, 0.0, 0.0
+        # p95 is reported as the upper bound of the bucket it falls in
+        threshold = count * 0.95
+        seen = 0
+        p95 = float('inf')
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= threshold:
+                p95 = bound
+                break
+        return count, total / count, p95
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count) in sorted(self.series().items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, cls, name, help, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Crawlers
+FETCH_SECONDS = REGISTRY.histogram('siren_fetch_seconds', 'HTTP request latency per attempt', ('source',))
+FETCH_RESPONSES = REGISTRY.counter('siren_fetch_responses_total', 'HTTP responses by status code', ('source', 'status'))
+FETCH_ERRORS = REGISTRY.counter('siren_fetch_errors_total', 'Requests that raised before a response', ('source',))
+FETCH_RETRIES = REGISTRY.counter('siren_fetch_retries_total', 'Request attempts after the first', ('source',))
+FETCH_BYTES = REGISTRY.counter('siren_fetch_bytes_total', 'Response body bytes received', ('source',))
+FETCH_CACHE = REGISTRY.counter('siren_fetch_cache_total', 'Fetches answered from the response cache', ('source', 'result'))
+PARSE_SECONDS = REGISTRY.histogram('siren_parse_seconds', 'HTML parse time', ('source', 'kind'))
+PARSE_OVERHEAD_SECONDS = REGISTRY.histogram('siren_parse_overhead_seconds', 'Latency the parse pool adds to a parse', ('executor',))
+
+# Database
+DB_SECONDS = REGISTRY.histogram('siren_db_operation_seconds', 'Database call latency including queueing', ('operation',))
+DB_ERRORS = REGISTRY.counter('siren_db_errors_total', 'Database calls that raised', ('operation',))
+DB_QUEUE_DEPTH = REGISTRY.gauge('siren_db_queue_depth', 'Operations waiting for the database thread')
+
+# Pipeline and delivery
+PIPELINE_QUEUE_DEPTH = REGISTRY.gauge('siren_pipeline_queue_depth', 'Items waiting in a pipeline stage', ('stage',))
+SEND_SECONDS = REGISTRY.histogram('siren_discord_send_seconds', 'Discord message send latency', ('kind',))
+SEND_TOTAL = REGISTRY.counter('siren_discord_sends_total', 'Discord send attempts by outcome', ('kind', 'outcome'))
+DELIVERY_QUEUE_DEPTH = REGISTRY.gauge('siren_delivery_queue_depth', 'Deliveries waiting to be sent')
+ENRICH_QUEUE_DEPTH = REGISTRY.gauge('siren_enrich_queue_depth', 'Pushed videos waiting for background detail enrichment')
+ENRICH_TOTAL = REGISTRY.counter('siren_enrich_total', 'Background enrichment attempts by outcome', ('outcome',))
+
+# Bot
+CHECK_SECONDS = REGISTRY.histogram('siren_check_seconds', 'Duration of a new-video check', buckets=(1, 5, 15, 30, 60, 120, 300, 600))
+NEW_VIDEOS = REGISTRY.counter('siren_new_videos_total', 'Videos saved by new-video checks')
+POLL_INTERVAL = REGISTRY.gauge('siren_poll_interval_seconds', 'Current new-video polling interval', ('source',))
+POLLS = REGISTRY.counter('siren_polls_total', 'New-video polls by outcome', ('source', 'outcome'))
+COMMANDS = REGISTRY.counter('siren_commands_total', 'Slash commands completed', ('command',))
+
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics from the registry"""
+
+    def __init__(self, registry=REGISTRY, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        if not self.port:
+            return self
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Metrics endpoint listening on http://%s:%d/metrics", self.host, self.port)
+        return self
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            # Drain the headers; the request body is never used
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass
+            parts = request.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.registry.render().encode()
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                         f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug("Metrics request dropped: %s", e)
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,301 @@
+"""Ordered schema migrations for the SQLite database.
+
+Each migration runs once, in its own transaction, and is recorded in
+schema_version. A migration that depends on an optional SQLite feature
+returns False when the feature is missing; it is then left unrecorded and
+retried on the next startup. Append new migrations at the end; never edit or
+renumber one that has shipped. Statements use IF NOT EXISTS so databases
+created before versioning existed adopt the history without errors.
+"""
+import logging
+import re
+import sqlite3
+from datetime import datetime
+
+from subscriptions import normalize
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r'[,，]')
+
+# name table (also the videos column it is split from) -> (join table, join column)
+NAME_TABLES = {
+    'actresses': ('video_actresses', 'actress_id'),
+    'tags': ('video_tags', 'tag_id'),
+}
+
+
+def split_names(value):
+    """Split a comma-joined actresses/tags field into {normalized key: display name}"""
+    names = {}
+    for part in _SEPARATORS.split(value or ''):
+        key = normalize(part)
+        if key:
+            names.setdefault(key, part.strip())
+    return names
+
+
+def link_names(conn, rows):
+    """Link (code, actresses, tags) rows to their actress and tag rows"""
+    for position, (table, (join_table, column)) in enumerate(NAME_TABLES.items(), start=1):
+        pairs = [(row[0], key, name) for row in rows
+                 for key, name in split_names(row[position]).items()]
+        if not pairs:
+            continue
+        conn.executemany(f'INSERT OR IGNORE INTO {table} (key, name) VALUES (?, ?)',
+                         [(key, name) for _, key, name in pairs])
+        conn.executemany(f'''
+            INSERT OR IGNORE INTO {join_table} (video_id, {column})
+            SELECT videos.id, {table}.id FROM videos, {table}
+            WHERE videos.code = ? AND {table}.key = ?
+        ''', [(code, key) for code, key, _ in pairs])
+
+
+def relink_names(conn, rows):
+    """Like link_names, for videos whose actresses/tags were just replaced:
+    a non-empty value first drops the video's old links of that kind"""
+    for position, (join_table, _) in enumerate(NAME_TABLES.values(), start=1):
+        codes = [(row[0],) for row in rows if row[position]]
+        if codes:
+            conn.executemany(f'DELETE FROM {join_table} WHERE video_id = (SELECT id FROM videos WHERE code = ?)',
+                             codes)
+    link_names(conn, rows)
+
+
+def _execute(conn, statements):
+    for statement in statements:
+        conn.execute(statement)
+
+
+def _base_tables(conn):
+    _execute(conn, (
+        '''
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT UNIQUE NOT NULL,
+            title TEXT,
+            actresses TEXT,
+            tags TEXT,
+            duration INTEGER,
+            release_date TEXT,
+            cover_url TEXT,
+            preview_url TEXT,
+            detail_url TEXT,
+            pushed BOOLEAN DEFAULT 0,
+            created_time TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            chat_type TEXT,
+            type TEXT NOT NULL, -- ALL, ACTRESS, TAG
+            keyword TEXT,
+            enabled BOOLEAN DEFAULT 1,
+            created_time TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS push_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            status TEXT NOT NULL, -- SUCCESS, FAILED
+            fail_reason TEXT,
+            pushed_at TEXT,
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        )
+        ''',
+    ))
+
+
+def _watermarks(conn):
+    # Newest codes seen on each source's new-video list
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS watermarks (
+            source TEXT PRIMARY KEY,
+            codes TEXT NOT NULL, -- comma separated, newest first
+            updated_time TEXT
+        )
+    ''')
+
+
+def _full_text_index(conn):
+    # External-content FTS5 table kept in sync with videos by triggers
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+                code, title, actresses, tags,
+                content='videos', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning("SQLite FTS5 unavailable, local search disabled: %s", e)
+        return False
+    _execute(conn, (
+        '''
+        CREATE TRIGGER IF NOT EXISTS videos_fts_insert AFTER INSERT ON videos BEGIN
+            INSERT INTO videos_fts (rowid, code, title, actresses, tags)
+            VALUES (new.id, new.code, new.title, new.actresses, new.tags);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+            INSERT INTO videos_fts (videos_fts, rowid, code, title, actresses, tags)
+            VALUES ('delete', old.id, old.code, old.title, old.actresses, old.tags);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS videos_fts_update AFTER UPDATE OF code, title, actresses, tags ON videos BEGIN
+            INSERT INTO videos_fts (videos_fts, rowid, code, title, actresses, tags)
+            VALUES ('delete', old.id, old.code, old.title, old.actresses, old.tags);
+            INSERT INTO videos_fts (rowid, code, title, actresses, tags)
+            VALUES (new.id, new.code, new.title, new.actresses, new.tags);
+        END
+        ''',
+        # Index the rows stored before the index existed
+        "INSERT INTO videos_fts (videos_fts) VALUES ('rebuild')",
+    ))
+
+
+def _name_tables(conn):
+    # Actresses and tags as rows, so per-name lookups use an index instead of LIKE
+    _execute(conn, (
+        '''
+        CREATE TABLE IF NOT EXISTS actresses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT UNIQUE NOT NULL, -- normalized for matching
+            name TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS video_actresses (
+            video_id INTEGER NOT NULL REFERENCES videos (id),
+            actress_id INTEGER NOT NULL REFERENCES actresses (id),
+            PRIMARY KEY (video_id, actress_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_video_actresses_actress ON video_actresses (actress_id, video_id)',
+        '''
+        CREATE TABLE IF NOT EXISTS video_tags (
+            video_id INTEGER NOT NULL REFERENCES videos (id),
+            tag_id INTEGER NOT NULL REFERENCES tags (id),
+            PRIMARY KEY (video_id, tag_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_video_tags_tag ON video_tags (tag_id, video_id)',
+    ))
+    # Backfill from the comma-joined columns
+    cursor = conn.execute('SELECT code, actresses, tags FROM videos')
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        link_names(conn, rows)
+
+
+def _hot_query_indexes(conn):
+    _execute(conn, (
+        # get_latest_videos: ORDER BY created_time DESC LIMIT n walks the index
+        'CREATE INDEX IF NOT EXISTS idx_videos_created_time ON videos (created_time)',
+        # Videos never delivered, oldest first; stays small as rows get pushed
+        'CREATE INDEX IF NOT EXISTS idx_videos_unpushed ON videos (created_time) WHERE pushed = 0',
+        'CREATE INDEX IF NOT EXISTS idx_subscriptions_chat ON subscriptions (chat_id, enabled)',
+        'CREATE INDEX IF NOT EXISTS idx_push_records_video ON push_records (video_id, chat_id)',
+        'CREATE INDEX IF NOT EXISTS idx_push_records_chat ON push_records (chat_id, pushed_at)',
+    ))
+
+
+def _video_sources(conn):
+    # Every source page known for a code; keyed by code so sources seen in
+    # search results are kept before (or without) the video being stored
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS video_sources (
+            code TEXT NOT NULL,
+            source TEXT NOT NULL,
+            url TEXT NOT NULL,
+            seen_time TEXT,
+            PRIMARY KEY (code, source)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _backfill_progress(conn):
+    # Resumable cli.py backfill: one row per job and stream (a source's new
+    # list, or a search term on one source)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            job TEXT NOT NULL,
+            stream TEXT NOT NULL,
+            page INTEGER NOT NULL DEFAULT 0, -- last page completed
+            done BOOLEAN NOT NULL DEFAULT 0,
+            videos INTEGER NOT NULL DEFAULT 0, -- videos saved so far
+            updated_time TEXT,
+            PRIMARY KEY (job, stream)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _drop_unpushed_index(conn):
+    # Nothing queries unpushed videos; the partial index only cost writes
+    conn.execute('DROP INDEX IF EXISTS idx_videos_unpushed')
+
+
+# (version, description, migrate(conn)), in order
+MIGRATIONS = (
+    (1, 'videos, subscriptions and push_records tables', _base_tables),
+    (2, 'per-source new-video watermarks', _watermarks),
+    (3, 'FTS5 index over code, title, actresses and tags', _full_text_index),
+    (4, 'normalized actress and tag tables', _name_tables),
+    (5, 'indexes for latest, unpushed, subscription and push lookups', _hot_query_indexes),
+    (6, 'detail page URLs per video and source', _video_sources),
+    (7, 'backfill checkpoints', _backfill_progress),
+    (8, 'drop the unused unpushed-videos index', _drop_unpushed_index),
+)
+
+
+def applied_versions(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_time TEXT
+        )
+    ''')
+    return {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+
+
+def apply_migrations(conn):
+    """Run every pending migration; returns the resulting schema version.
+
+    conn must be in autocommit mode (isolation_level=None).
+    """
+    applied = applied_versions(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        conn.execute('BEGIN')
+        try:
+            if migrate(conn) is False:
+                conn.execute('COMMIT')
+                logger.warning("Migration %d (%s) skipped, retrying on next start", version, description)
+                continue
+            conn.execute('INSERT INTO schema_version (version, description, applied_time) VALUES (?, ?, ?)',
+                         (version, description, datetime.now().isoformat()))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            logger.error("Migration %d (%s) failed", version, description)
+            raise
+        logger.info("Applied migration %d: %s", version, description)
+        applied.add(version)
+    return max(applied, default=0)
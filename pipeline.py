@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+
+from metrics import PIPELINE_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+DETAIL_WORKERS = int(os.getenv('PIPELINE_DETAIL_WORKERS', 4))
+PUSH_WORKERS = int(os.getenv('PIPELINE_PUSH_WORKERS', 2))
+WRITE_BATCH = int(os.getenv('PIPELINE_WRITE_BATCH', 50))
+QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 32))
+
+_DONE = object()
+
+# Stage queues of every running pipeline; per-source polls and backfill
+# streams run several at once, so the depth gauges report their sum
+_running = []
+for _stage in ('detail', 'write', 'push'):
+    PIPELINE_QUEUE_DEPTH.set_function(
+        lambda stage=_stage: sum(queues[stage].qsize() for queues in _running), stage=_stage)
+
+
+class VideoPipeline:
+    """Bounded producer/consumer pipeline for list-page results:
+
+        dedupe -> N detail workers -> batched DB writer -> M push workers
+
+    Stages are connected by bounded queues, so a slow stage applies
+    backpressure to the ones before it. With ordered=True saved videos reach
+    the sink in input order (one push worker); otherwise as soon as saved.
+    """
+
+    def __init__(self, crawler, db, sink=None, ordered=False, enrich=True,
+                 detail_workers=DETAIL_WORKERS, push_workers=PUSH_WORKERS,
+                 write_batch=WRITE_BATCH, queue_size=QUEUE_SIZE):
+        self.crawler = crawler
+        self.db = db
+        self.sink = sink
+        self.ordered = ordered
+        self.enrich = enrich
+        self.detail_workers = max(1, detail_workers)
+        self.push_workers = 1 if ordered else max(1, push_workers)
+        self.write_batch = max(1, write_batch)
+        self.queue_size = queue_size
+
+    async def dedupe(self, videos):
+        """Drop videos without a code, repeated codes and codes already stored"""
+        videos = list(videos)
+        seen = set(await self.db.existing_codes(v.get('code') for v in videos))
+        unique = []
+        for video in videos:
+            code = video.get('code')
+            if code and code not in seen:
+                seen.add(code)
+                unique.append(video)
+        return unique
+
+    async def run(self, videos):
+        """Process videos through every stage; returns the newly saved ones"""
+        unique = await self.dedupe(videos)
+        if not unique:
+            return []
+
+        detail_q = asyncio.Queue(self.queue_size)
+        write_q = asyncio.Queue(self.queue_size)
+        push_q = asyncio.Queue(self.queue_size)
+        saved = []
+
+        async def produce():
+            for item in enumerate(unique):
+                await detail_q.put(item)
+            for _ in range(self.detail_workers):
+                await detail_q.put(_DONE)
+
+        async def detail_worker():
+            while True:
+                item = await detail_q.get()
+                if item is _DONE:
+                    return
+                index, video = item
+                if self.enrich:
+                    try:
+                        # Fetches only the sources needed to fill what the card lacks
+                        await self.crawler.enrich_video(video)
+                    except Exception as e:
+                        logger.error("Detail enrichment failed for %s: %s", video.get('code'), e)
+                await write_q.put((index, video))
+
+        async def enrich_stage():
+            await asyncio.gather(*(detail_worker() for _ in range(self.detail_workers)))
+            await write_q.put(_DONE)
+
+        async def writer():
+            pending = {}
+            next_index = 0
+            finished = False
+            while not finished:
+                # Wait for one item, then take whatever else is ready
+                batch = []
+                item = await write_q.get()
+                while item is not _DONE:
+                    batch.append(item)
+                    if len(batch) >= self.write_batch or write_q.empty():
+                        break
+                    item = write_q.get_nowait()
+                finished = item is _DONE
+
+                results = await self.db.save_videos([video for _, video in batch])
+                for (index, video), ok in zip(batch, results):
+                    if ok:
+                        saved.append(video)
+                    if not self.ordered:
+                        if ok:
+                            await push_q.put(video)
+                        continue
+                    pending[index] = (video, ok)
+                    while next_index in pending:
+                        video, ok = pending.pop(next_index)
+                        next_index += 1
+                        if ok:
+                            await push_q.put(video)
+            for _ in range(self.push_workers):
+                await push_q.put(_DONE)
+
+        async def push_worker():
+            while True:
+                video = await push_q.get()
+                if video is _DONE:
+                    return
+                if self.sink is None:
+                    continue
+                try:
+                    await self.sink(video)
+                except Exception as e:
+                    logger.error("Push failed for %s: %s", video.get('code'), e)
+
+        queues = {'detail': detail_q, 'write': write_q, 'push': push_q}
+        _running.append(queues)
+        try:
+            # A failing stage cancels the others instead of leaving them
+            # blocked on queues nobody feeds or drains any more
+            async with asyncio.TaskGroup() as stages:
+                stages.create_task(produce())
+                stages.create_task(enrich_stage())
+                stages.create_task(writer())
+                for _ in range(self.push_workers):
+                    stages.create_task(push_worker())
+        except* Exception as group:
+            raise group.exceptions[0]
+        finally:
+            _running.remove(queues)
+        return saved
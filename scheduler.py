@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime
+
+from crawlers.health import get_health
+from metrics import POLL_INTERVAL, POLLS
+
+logger = logging.getLogger(__name__)
+
+# Minutes; CHECK_INTERVAL is the starting point for every source
+CHECK_INTERVAL = float(os.getenv('CHECK_INTERVAL', 15))
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', 5))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', 60))
+POLL_JITTER = float(os.getenv('POLL_JITTER', 0.1))          # +/- fraction of each interval
+POLL_TARGET_NEW = float(os.getenv('POLL_TARGET_NEW', 10))   # new videos a poll should find
+EMPTY_BACKOFF = 1.5    # interval growth per consecutive empty poll
+RATE_SMOOTHING = 0.3   # EWMA weight of the latest observation of an hour's release rate
+
+
+class SourceSchedule:
+    """Polling state of one source.
+
+    The release rate (new videos per hour) is learned per hour of the day,
+    so the interval follows a site's release hours: it is set for a poll to
+    find about POLL_TARGET_NEW videos. Until an hour has been observed the
+    interval starts from CHECK_INTERVAL, and consecutive empty polls back
+    it off. Everything is clamped to [POLL_MIN_INTERVAL, POLL_MAX_INTERVAL].
+    """
+
+    def __init__(self, source, base=CHECK_INTERVAL, minimum=POLL_MIN_INTERVAL, maximum=POLL_MAX_INTERVAL):
+        self.source = source
+        self.minimum = minimum * 60
+        self.maximum = max(self.minimum, maximum * 60)
+        self.base = min(max(base * 60, self.minimum), self.maximum)
+        self.interval = self.base
+        self.hourly_rate = [None] * 24
+        self.empty_polls = 0
+        self.last_poll = None      # wall clock
+        self.last_new = None
+        self.next_poll = time.time()
+        POLL_INTERVAL.set_function(lambda: self.interval, source=source)
+
+    def record(self, new_videos, now=None):
+        """Account for a completed poll that found new_videos and plan the next one"""
+        now = now or time.time()
+        if self.last_poll is not None and now > self.last_poll:
+            hours = (now - self.last_poll) / 3600
+            # Attribute the observed rate to the hour the interval was centred on
+            hour = datetime.fromtimestamp((now + self.last_poll) / 2).hour
+            rate = new_videos / hours
+            previous = self.hourly_rate[hour]
+            self.hourly_rate[hour] = rate if previous is None else previous + RATE_SMOOTHING * (rate - previous)
+        self.empty_polls = 0 if new_videos else self.empty_polls + 1
+        self.last_poll = now
+        self.last_new = new_videos
+        self._plan(now)
+
+    def skip(self, now=None):
+        """The poll could not run (open circuit, error); try again after the shortest interval"""
+        now = now or time.time()
+        self.next_poll = now + self._jitter(self.minimum)
+
+    def _plan(self, now):
+        rate = self.hourly_rate[datetime.fromtimestamp(now + self.interval).hour]
+        if rate:
+            interval = POLL_TARGET_NEW / rate * 3600
+        else:
+            interval = self.base
+        interval *= EMPTY_BACKOFF ** self.empty_polls
+        self.interval = min(max(interval, self.minimum), self.maximum)
+        self.next_poll = now + self._jitter(self.interval)
+
+    @staticmethod
+    def _jitter(seconds):
+        return seconds * (1 + random.uniform(-POLL_JITTER, POLL_JITTER))
+
+
+class PollScheduler:
+    """Runs poll(crawler) for every source on its own adaptive schedule.
+
+    poll returns the number of new videos it found, or None when the source
+    could not be polled. Failed polls, and sources whose circuit is open,
+    are retried after the shortest interval without touching the learned
+    release rate.
+    """
+
+    def __init__(self, crawlers, poll, base=CHECK_INTERVAL):
+        self.poll = poll
+        self.schedules = {crawler.source_name: SourceSchedule(crawler.source_name, base) for crawler in crawlers}
+        self._crawlers = list(crawlers)
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            for i, crawler in enumerate(self._crawlers):
+                # Stagger the first polls so sources don't start in lockstep
+                self.schedules[crawler.source_name].next_poll = time.time() + i * random.uniform(1, 5)
+                self._tasks.append(asyncio.create_task(self._run(crawler)))
+        return self
+
+    async def _run(self, crawler):
+        schedule = self.schedules[crawler.source_name]
+        while True:
+            await asyncio.sleep(max(0.0, schedule.next_poll - time.time()))
+            if not get_health(crawler.source_name).available:
+                POLLS.inc(source=crawler.source_name, outcome='skipped')
+                schedule.skip()
+                continue
+            try:
+                new_videos = await self.poll(crawler)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("%s poll failed: %s", crawler.source_name, e)
+                new_videos = None
+            if new_videos is None:
+                POLLS.inc(source=crawler.source_name, outcome='failed')
+                schedule.skip()
+                continue
+            POLLS.inc(source=crawler.source_name, outcome='new' if new_videos else 'empty')
+            schedule.record(new_videos)
+            logger.info("%s poll found %d new video(s), next in %.1f min",
+                        crawler.source_name, new_videos, (schedule.next_poll - time.time()) / 60)
+
+    def describe(self):
+        """[(source, interval minutes, minutes until the next poll, new videos last poll)]"""
+        now = time.time()
+        return [(source, s.interval / 60, max(0.0, s.next_poll - now) / 60, s.last_new)
+                for source, s in self.schedules.items()]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
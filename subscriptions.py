@@ -0,0 +1,95 @@
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(token):
+    """Canonical form used for matching actress names and tags"""
+    if not token:
+        return ''
+    token = unicodedata.normalize('NFKC', token).casefold()
+    return _SPACES.sub(' ', token).strip()
+
+
+def split_tokens(value):
+    """Split a comma-joined actresses/tags field into normalized tokens"""
+    if not value:
+        return set()
+    return {t for t in (normalize(part) for part in re.split(r'[,，]', value)) if t}
+
+
+class SubscriptionIndex:
+    """In-memory inverted index from normalized actress/tag tokens to chat_ids.
+
+    Matching a video costs one dict lookup per actress/tag token, independent
+    of the number of subscriptions. subscribe/unsubscribe update it in place.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.all_chats = set()
+        self.by_type = {'ACTRESS': defaultdict(set), 'TAG': defaultdict(set)}
+        self.chat_types = {}
+        # chat_id -> {(type, keyword as stored)}, so a full unsubscribe needs no
+        # scan and a token stays indexed while any spelling of it is subscribed
+        self._by_chat = defaultdict(set)
+
+    async def load(self, db):
+        self.clear()
+        subs = await db.get_subscriptions()
+        for sub in subs:
+            self.add(sub['chat_id'], sub['chat_type'], sub['type'], sub['keyword'])
+        logger.info("Subscription index loaded: %d subscriptions, %d chats", len(subs), len(self._by_chat))
+
+    def add(self, chat_id, chat_type, sub_type, keyword=None):
+        self.chat_types[chat_id] = chat_type
+        if sub_type == 'ALL':
+            self.all_chats.add(chat_id)
+            self._by_chat[chat_id].add(('ALL', None))
+            return
+        token = normalize(keyword)
+        if sub_type not in self.by_type or not token:
+            return
+        self.by_type[sub_type][token].add(chat_id)
+        self._by_chat[chat_id].add((sub_type, keyword))
+
+    def remove(self, chat_id, sub_type=None, keyword=None):
+        """Mirror of Database.unsubscribe: no sub_type drops every subscription of
+        chat_id, otherwise the one with exactly this keyword"""
+        subs = self._by_chat.get(chat_id, set())
+        if sub_type:
+            removed = {(sub_type, None if sub_type == 'ALL' else keyword)} & subs
+        else:
+            removed = set(subs)
+        subs -= removed
+        for entry_type, entry_keyword in removed:
+            if entry_type == 'ALL':
+                self.all_chats.discard(chat_id)
+                continue
+            token = normalize(entry_keyword)
+            if any(t == entry_type and normalize(k) == token for t, k in subs):
+                continue  # another spelling of the same token is still subscribed
+            chats = self.by_type[entry_type].get(token)
+            if chats is not None:
+                chats.discard(chat_id)
+                if not chats:
+                    del self.by_type[entry_type][token]
+        if not subs:
+            self._by_chat.pop(chat_id, None)
+            self.chat_types.pop(chat_id, None)
+
+    def match(self, video):
+        """Return the chat_ids subscribed to this video"""
+        recipients = set(self.all_chats)
+        for token in split_tokens(video.get('actresses')):
+            recipients |= self.by_type['ACTRESS'].get(token, set())
+        for token in split_tokens(video.get('tags')):
+            recipients |= self.by_type['TAG'].get(token, set())
+        return recipients
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the project's top-level modules (database, crawlers, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
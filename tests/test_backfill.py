@@ -0,0 +1,39 @@
+import asyncio
+
+from cli import Backfill
+from crawlers.hohoj import HohoJCrawler
+from database import Database
+
+
+def test_unpaginated_search_page_reports_fetch_failure():
+    crawler = HohoJCrawler()
+
+    async def fetch_html(url, *args, **kwargs):
+        return None
+    crawler.fetch_html = fetch_html
+
+    assert asyncio.run(crawler.crawl_search_page('SSIS', 1)) is None
+    assert asyncio.run(crawler.crawl_search_page('SSIS', 2)) == []
+
+
+def test_failing_stream_keeps_its_checkpoint(tmp_path):
+    async def broken(page):
+        raise RuntimeError('boom')
+
+    async def empty(page):
+        await asyncio.sleep(0.01)
+        return []
+
+    async def main():
+        db = Database(str(tmp_path / 'siren.db'))
+        try:
+            job = Backfill(None, db, 'test', concurrency=2)
+            stats = await job.run([('broken', None, broken, 5), ('empty', None, empty, 5)])
+            return stats, await db.get_backfill_progress('test')
+        finally:
+            await db.close()
+
+    stats, progress = asyncio.run(main())
+    assert stats['failed'] == 1 and stats['finished'] == 1
+    assert 'broken' not in progress
+    assert progress['empty']['done']
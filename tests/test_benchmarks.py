@@ -0,0 +1,42 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks.run import percentiles
+from benchmarks.stub_server import ROUTES, StubSite, load_fixtures
+
+
+def test_percentiles():
+    assert percentiles([]) == {}
+    stats = percentiles([i / 1000 for i in range(1, 101)])
+    assert stats['count'] == 100
+    assert stats['p50_ms'] == 51.0
+    assert stats['p99_ms'] == 100.0
+    assert stats['max_ms'] == 100.0
+    assert stats['mean_ms'] == 50.5
+
+
+def test_every_route_has_a_fixture():
+    fixtures = load_fixtures()
+    for source, routes in ROUTES.items():
+        for _, kind in routes:
+            assert fixtures[source].get(kind), (source, kind)
+
+
+def test_stub_site_routes_and_errors():
+    site = StubSite().start()
+    try:
+        assert site.resolve('/missav/cn/search/ssis') == site.fixtures['missav']['search']
+        with urllib.request.urlopen(site.base_url('jable') + '/videos/ssis-001/') as response:
+            assert response.read().decode('utf-8') == site.fixtures['jable']['detail']
+        with pytest.raises(urllib.error.HTTPError) as missing:
+            urllib.request.urlopen(site.base_url('jable') + '/nowhere')
+        assert missing.value.code == 404
+        site.error_rate = 1.0
+        with pytest.raises(urllib.error.HTTPError) as failed:
+            urllib.request.urlopen(site.base_url('memo') + '/video/SSIS-001')
+        assert failed.value.code == 503
+        assert site.requests == 3
+    finally:
+        site.stop()
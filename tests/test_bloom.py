@@ -0,0 +1,29 @@
+import math
+
+from bloom import BloomFilter
+
+
+def test_sizing_follows_capacity_and_error_rate():
+    bloom = BloomFilter(100000, error_rate=0.01)
+    # m = -n ln p / (ln 2)^2, k = m/n ln 2
+    assert bloom.num_bits == int(100000 * -math.log(0.01) / math.log(2) ** 2)
+    assert bloom.num_hashes == 7
+    assert len(bloom.bits) == (bloom.num_bits + 7) // 8
+
+
+def test_no_false_negatives_and_bounded_false_positives():
+    bloom = BloomFilter(5000, error_rate=0.01)
+    codes = [f'SSIS-{i:05d}' for i in range(5000)]
+    for code in codes:
+        bloom.add(code)
+    assert all(code in bloom for code in codes)
+    assert bloom.full
+    false_positives = sum(f'IPX-{i:05d}' in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_tiny_capacity():
+    bloom = BloomFilter(0)
+    assert bloom.capacity == 1 and bloom.num_bits >= 8
+    bloom.add('A-001')
+    assert 'A-001' in bloom and bloom.full
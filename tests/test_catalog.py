@@ -0,0 +1,39 @@
+import asyncio
+
+from database import Database
+
+
+def run(db_path, scenario):
+    async def main():
+        db = Database(str(db_path))
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+def test_upsert_replaces_name_links(tmp_path):
+    async def scenario(db):
+        await db.upsert_videos([{'code': 'SSIS-001', 'actresses': 'A, B', 'tags': 'x, y'}])
+        await db.upsert_videos([{'code': 'SSIS-001', 'actresses': 'C', 'tags': ''}])
+        by_actress = [[v['code'] for v in await db.get_videos_by_actress(name)] for name in 'ABC']
+        return by_actress, [v['code'] for v in await db.get_videos_by_tag('x')]
+
+    by_actress, by_tag = run(tmp_path / 'siren.db', scenario)
+    assert by_actress == [[], [], ['SSIS-001']]
+    # An empty value keeps the stored tags and their links
+    assert by_tag == ['SSIS-001']
+
+
+def test_source_filter_falls_back_to_detail_url(tmp_path):
+    async def scenario(db):
+        await db.upsert_videos([
+            {'code': 'SSIS-001', 'detail_url': 'https://missav.ai/cn/ssis-001'},
+            {'code': 'SSIS-002', 'detail_url': 'https://jable.tv/videos/ssis-002/'},
+            {'code': 'SSIS-003', 'detail_url': 'https://missav.ai/cn/ssis-003',
+             'sources': {'Jable': 'https://jable.tv/videos/ssis-003/'}},
+        ])
+        return [v['code'] async for v in db.iter_videos(source='MissAV', source_url='https://missav.ai/')]
+
+    assert run(tmp_path / 'siren.db', scenario) == ['SSIS-001']
@@ -0,0 +1,99 @@
+import asyncio
+import sqlite3
+import threading
+
+from database import Database
+
+
+def run(scenario, *paths):
+    async def main():
+        dbs = [Database(str(path)) for path in paths]
+        try:
+            return await scenario(*dbs)
+        finally:
+            for db in dbs:
+                await db.close()
+    return asyncio.run(main())
+
+
+def test_save_videos_reports_only_inserted_rows(tmp_path):
+    async def scenario(db):
+        first = await db.save_videos([{'code': 'SSIS-001'}, {'code': 'SSIS-001'}, {'code': 'SSIS-002'}])
+        second = await db.save_videos([{'code': 'SSIS-002'}, {'code': 'SSIS-003'}])
+        return first, second, await db.existing_codes(['SSIS-001', 'SSIS-003', 'SSIS-004'])
+
+    first, second, existing = run(scenario, tmp_path / 'siren.db')
+    assert first == [True, False, True]
+    assert second == [False, True]
+    assert existing == {'SSIS-001', 'SSIS-003'}
+
+
+def test_rows_written_by_another_process_are_seen(tmp_path):
+    # Two connections to one file stand in for the bot and a cli.py backfill
+    path = tmp_path / 'siren.db'
+
+    async def scenario(bot, backfill):
+        assert await backfill.save_videos([{'code': 'SSIS-001', 'title': 'x'}]) == [True]
+        return (await bot.existing_codes(['SSIS-001']), await bot.is_video_exists('SSIS-001'),
+                (await bot.get_video('SSIS-001') or {}).get('title'), await bot.save_videos([{'code': 'SSIS-001'}]))
+
+    assert run(scenario, path, path) == ({'SSIS-001'}, True, 'x', [False])
+
+
+def _batched(db, jobs):
+    """Submit jobs while the worker is held, so they run as one batch"""
+    gate = threading.Event()
+
+    def hold(conn, items):
+        gate.wait()
+        return [None] * len(items)
+
+    async def main():
+        held = asyncio.ensure_future(db._call(hold))
+        await asyncio.sleep(0.05)  # the worker is now inside hold
+        submitted = [asyncio.ensure_future(job()) for job in jobs]
+        await asyncio.sleep(0.05)
+        gate.set()
+        await held
+        return await asyncio.gather(*submitted, return_exceptions=True)
+    return main()
+
+
+def test_queued_writes_are_coalesced(tmp_path):
+    calls = []
+
+    async def scenario(db):
+        original = db._save_videos
+
+        def counting(conn, items):
+            calls.append(len(items))
+            return original(conn, items)
+
+        db._save_videos = counting
+        results = await _batched(db, [lambda i=i: db.save_video({'code': f'SSIS-{i:03d}'}) for i in range(5)])
+        return results, await db.existing_codes([f'SSIS-{i:03d}' for i in range(5)])
+
+    results, existing = run(scenario, tmp_path / 'siren.db')
+    assert results == [True] * 5
+    assert calls == [5]
+    assert len(existing) == 5
+
+
+def test_failing_operation_does_not_roll_back_its_batch(tmp_path):
+    def broken(conn, items):
+        conn.execute("INSERT INTO watermarks (source, codes) VALUES ('x', 'y')")
+        raise sqlite3.OperationalError('boom')
+
+    async def scenario(db):
+        results = await _batched(db, [
+            lambda: db.save_video({'code': 'SSIS-001'}),
+            lambda: db._call(broken),
+            lambda: db.save_video({'code': 'SSIS-002'}),
+        ])
+        return results, await db.existing_codes(['SSIS-001', 'SSIS-002']), await db.get_watermark('x')
+
+    results, existing, watermark = run(scenario, tmp_path / 'siren.db')
+    assert results[0] is True and results[2] is True
+    assert isinstance(results[1], sqlite3.OperationalError)
+    assert existing == {'SSIS-001', 'SSIS-002'}
+    assert watermark == []
@@ -0,0 +1,88 @@
+import asyncio
+
+import discord
+
+from delivery import MAX_EMBED_CHARS, DeliveryQueue
+
+
+class _Channel:
+    def __init__(self):
+        self.id = 1
+        self.sent = []
+
+    async def send(self, embeds=(), content=None):
+        self.sent.append(embeds)
+        return object()
+
+
+def _embed(chars):
+    return discord.Embed(title='t' * 200, description='d' * (chars - 200))
+
+
+def test_packing_respects_the_embed_character_limit():
+    async def main():
+        queue = DeliveryQueue()
+        channel = _Channel()
+        await asyncio.gather(*(queue.submit(channel, [_embed(1000)]) for _ in range(10)))
+        await queue.close()
+        return channel.sent
+
+    sent = asyncio.run(main())
+    assert sum(len(embeds) for embeds in sent) == 10
+    assert all(sum(len(e) for e in embeds) <= MAX_EMBED_CHARS for embeds in sent)
+    assert [len(embeds) for embeds in sent] == [6, 4]
+
+
+def test_submit_splits_oversized_embed_lists():
+    async def main():
+        queue = DeliveryQueue()
+        channel = _Channel()
+        await queue.submit(channel, [_embed(2500) for _ in range(5)])
+        return channel.sent
+
+    assert [len(embeds) for embeds in asyncio.run(main())] == [2, 2, 1]
+
+
+class _Message:
+    id = 42
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def edit(self, embeds=()):
+        raise discord.DiscordException('edit rejected')
+
+
+def test_failed_edit_resolves_to_none():
+    async def main():
+        queue = DeliveryQueue()
+        result = await queue.edit(_Message(_Channel()), [_embed(300)])
+        return result, queue.stats['failed']
+
+    assert asyncio.run(main()) == (None, 1)
+
+
+class _EditableMessage(_Message):
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.edits = []
+
+    async def edit(self, embeds=()):
+        self.edits.append(embeds)
+        return self
+
+
+def test_edits_are_capped_to_one_message():
+    async def main():
+        queue = DeliveryQueue()
+        message = _EditableMessage(_Channel())
+        first = queue.edit(message, [_embed(2500) for _ in range(3)])
+        # Updates the queued edit in place, which must be capped as well
+        second = queue.edit(message, [_embed(500) for _ in range(12)])
+        assert first is second
+        await second
+        return message.edits
+
+    (embeds,) = asyncio.run(main())
+    assert len(embeds) == 10
+    assert sum(len(e) for e in embeds) <= MAX_EMBED_CHARS
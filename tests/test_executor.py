@@ -0,0 +1,67 @@
+import asyncio
+import os
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+import crawlers.executor as executor
+from crawlers.hohoj import HohoJCrawler
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'benchmarks', 'fixtures', 'hohoj', 'search.html')
+
+
+def _html():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return f.read()
+
+
+class _BrokenPool(Executor):
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool('worker died'))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_thread_is_the_default():
+    assert executor.PARSE_EXECUTOR == 'thread' or 'PARSE_EXECUTOR' in os.environ
+
+
+def test_small_pages_parse_inline(monkeypatch):
+    def no_pool():
+        raise AssertionError('a small page went to the pool')
+
+    monkeypatch.setattr(executor, '_get_executor', no_pool)
+    crawler = HohoJCrawler()
+    html = '<div><a href="/video?id=1"><p>SSIS-001</p></a></div>'
+    results = asyncio.run(executor.run_parse(crawler.parse_search, html, 'x', limit=10))
+    assert [v['code'] for v in results] == ['SSIS-001']
+
+
+def test_thread_pool_matches_inline(monkeypatch):
+    monkeypatch.setattr(executor, 'PARSE_EXECUTOR', 'thread')
+    monkeypatch.setattr(executor, 'PARSE_INLINE_SIZE', 0)
+    crawler = HohoJCrawler()
+    html = _html()
+    try:
+        pooled = asyncio.run(executor.run_parse(crawler.parse_search, html, 'x', limit=100))
+        assert executor._kind == 'thread'
+    finally:
+        executor.shutdown_executor()
+    assert pooled and pooled == crawler.parse_search(html, 'x', limit=100)
+
+
+def test_broken_pool_falls_back_inline_and_is_replaced(monkeypatch):
+    pool = _BrokenPool()
+    monkeypatch.setattr(executor, '_executor', pool)
+    monkeypatch.setattr(executor, 'PARSE_INLINE_SIZE', 0)
+    crawler = HohoJCrawler()
+    html = _html()
+    results = asyncio.run(executor.run_parse(crawler.parse_search, html, 'x', limit=100))
+    assert results == crawler.parse_search(html, 'x', limit=100)
+    assert pool.shut_down and executor._executor is None
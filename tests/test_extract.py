@@ -0,0 +1,45 @@
+from crawlers.extract import PageScan, parse_clock
+
+
+def test_parse_clock():
+    assert parse_clock('1:59:30') == 119
+    assert parse_clock('95:10') == 95
+    assert parse_clock('95') is None
+
+
+def test_meta_duration_is_seconds_aware():
+    scan = PageScan('<meta property="og:video:duration" content="7200"><meta itemprop="duration" content="PT95M">')
+    assert scan.duration(['meta']) == 120
+    assert scan.duration(['iso_meta', 'meta']) == 95
+
+
+def test_rules_apply_in_order():
+    html = '<p>2:10:00</p><script>duration: 5400</script><p>120分</p>'
+    scan = PageScan(html)
+    assert scan.duration(['script', 'text', 'clock']) == 90
+    assert scan.duration(['text', 'script']) == 120
+    assert scan.duration(['clock']) == 130
+    assert scan.duration(['meta']) is None
+
+
+def test_prefix_does_not_swallow_other_candidates():
+    scan = PageScan('duration: 95 min')
+    assert scan.duration(['script']) == 95
+    assert scan.duration(['text']) == 95
+
+
+def test_video_urls_and_meta_attributes():
+    html = ("<meta content='A &amp; B' name=\"description\">"
+            "<script>var hlsUrl = 'https://cdn.test/a.m3u8';"
+            'var videoSrc = "https://cdn.test/b.mp4";'
+            '{"url":"https%3A%2F%2Fcdn.test%2Fc.m3u8"}</script>')
+    scan = PageScan(html)
+    assert scan.get_meta('name', 'description') == 'A & B'
+    assert scan.hls_url == 'https://cdn.test/a.m3u8'
+    assert scan.video_src == 'https://cdn.test/b.mp4'
+    assert scan.encoded_url == 'https://cdn.test/c.m3u8'
+
+
+def test_first_occurrence_wins():
+    scan = PageScan("var hlsUrl = 'https://a.test/1.m3u8'; var hlsUrl = 'https://a.test/2.m3u8'")
+    assert scan.hls_url == 'https://a.test/1.m3u8'
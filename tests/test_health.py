@@ -0,0 +1,79 @@
+from curl_cffi.requests import exceptions as curl_errors
+
+from crawlers import health
+from crawlers.health import (
+    CLOSED, HALF_OPEN, OPEN, SourceHealth, backoff_delay, classify_error, classify_status)
+
+
+def _open(source):
+    breaker = SourceHealth(source)
+    for _ in range(health.BREAKER_FAILURES):
+        assert breaker.allow()
+        breaker.record_failure('timeout')
+    return breaker
+
+
+def _expire(breaker):
+    breaker.open_until = 0.0
+
+
+def test_consecutive_failures_open_the_circuit():
+    breaker = SourceHealth('Breaker')
+    for _ in range(health.BREAKER_FAILURES - 1):
+        breaker.record_failure('timeout')
+    breaker.record_success(0.1)
+    breaker.record_failure('timeout')
+    assert breaker.state == CLOSED  # the success reset the streak
+    breaker = _open('Breaker')
+    assert breaker.state == OPEN
+    assert not breaker.available and not breaker.allow()
+    assert breaker.score == 0.0
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = _open('Probe')
+    _expire(breaker)
+    assert breaker.available
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.available and not breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED and breaker.trips == 0
+
+
+def test_failed_probe_reopens_for_longer():
+    breaker = _open('Reopen')
+    first = breaker.open_until
+    _expire(breaker)
+    breaker.allow()
+    breaker.record_failure('status 503')
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+    assert breaker.open_until - first > health.BREAKER_OPEN_SECONDS * 0.9
+
+
+def test_released_or_stale_probe_frees_the_slot():
+    breaker = _open('Stale')
+    _expire(breaker)
+    breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+    breaker.probe_started -= health.PROBE_TIMEOUT + 1
+    assert breaker.available
+
+
+def test_status_and_error_classes():
+    assert classify_status(503) == (True, False)
+    assert classify_status(403) == (False, False)
+    assert classify_status(404) == (False, True)
+    assert classify_status(200) == (False, True)
+    assert classify_error(curl_errors.Timeout('t'))[:2] == ('timeout', True)
+    assert classify_error(curl_errors.DNSError('d'))[:2] == ('dns', False)
+    assert classify_error(curl_errors.InvalidURL('u')) == ('request', False, True)
+    assert classify_error(ValueError('bug')) == ('internal', False, True)
+
+
+def test_backoff_is_bounded_and_honours_retry_after():
+    for attempt in range(1, 10):
+        assert 0 <= backoff_delay(attempt) <= health.RETRY_BACKOFF_MAX
+    assert backoff_delay(1, retry_after=7) >= 7
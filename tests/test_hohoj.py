@@ -0,0 +1,25 @@
+import os
+
+from crawlers.hohoj import HohoJCrawler
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'benchmarks', 'fixtures', 'hohoj', 'search.html')
+
+
+def test_search_card_linking_its_id_twice():
+    # Thumbnail link first, then a title link carrying the code
+    html = ('<div><a href="/video?id=1"><img src="/t/1.jpg"></a><a href="/video?id=1"><p>SSIS-001</p></a></div>'
+            '<div><a href="/video?id=2"><img src="/t/2.jpg"></a><a href="/video?id=2"><p>IPX-655</p></a></div>')
+    results = HohoJCrawler().parse_search(html, 'x', limit=10)
+    assert [(v['code'], v['detail_url']) for v in results] == [
+        ('SSIS-001', 'https://hohoj.tv/video?id=1'),
+        ('IPX-655', 'https://hohoj.tv/video?id=2'),
+    ]
+
+
+def test_search_fixture():
+    with open(FIXTURE, encoding='utf-8') as f:
+        results = HohoJCrawler().parse_search(f.read(), 'x', limit=100)
+    assert len(results) == 31
+    assert results[0]['code'] == 'IPX-655'
+    assert results[-1] == {'code': 'MIDV-101', 'detail_url': 'https://hohoj.tv/video?id=100030', 'source': 'HohoJ'}
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import crawlers.base
+from crawlers.base import BaseCrawler
+from crawlers.cache import ResponseCache
+from crawlers.sessions import close_pools
+
+PAGE = '<html><body>' + 'x' * 2000 + '</body></html>'
+
+
+def _body_files(cache):
+    return [name for _, _, files in os.walk(cache.body_dir) for name in files]
+
+
+def test_shared_bodies_count_once_towards_the_budget(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10 ** 6)
+    cache.put('https://a.test/1', PAGE)
+    size = cache._size()
+    cache.max_bytes = size  # room for exactly one body
+    cache.put('https://a.test/2', PAGE)
+    assert cache.get('https://a.test/1') and cache.get('https://a.test/2')
+    assert len(_body_files(cache)) == 1
+
+
+def test_eviction_keeps_bodies_other_urls_still_use(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10 ** 6)
+    other = PAGE.replace('x', 'y')
+    for url, body in (('https://a.test/1', PAGE), ('https://a.test/3', other), ('https://a.test/2', PAGE)):
+        cache.put(url, body)
+        time.sleep(0.01)  # distinct access times, oldest first
+    cache.max_bytes = cache._size() - 1
+    # Evicting /1 frees nothing while /2 shares its body, so /3 goes too
+    cache.put('https://a.test/2', PAGE)
+    assert cache.get('https://a.test/1') is None and cache.get('https://a.test/3') is None
+    assert cache.get('https://a.test/2').body == PAGE
+    assert len(_body_files(cache)) == 1
+
+
+class _Server:
+    """Serves PAGE with an ETag and answers 304 to a matching If-None-Match"""
+
+    def __init__(self):
+        self.requests = []
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                owner.requests.append(self.headers.get('If-None-Match'))
+                if self.headers.get('If-None-Match') == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = PAGE.encode()
+                self.send_response(200)
+                self.send_header('ETag', '"v1"')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+
+class _Crawler(BaseCrawler):
+    source_name = 'CacheTest'
+    CACHE_TTLS = [(r'/page', 0)]  # always revalidate
+
+
+def test_stale_entry_is_revalidated_with_its_etag(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path))
+    monkeypatch.setattr(crawlers.base, 'get_cache', lambda: cache)
+    server = _Server()
+    crawler = _Crawler(server.url)
+
+    async def main():
+        try:
+            return [await crawler.fetch_html(server.url + '/page') for _ in range(2)]
+        finally:
+            await close_pools()
+
+    try:
+        bodies = asyncio.run(main())
+    finally:
+        server.httpd.shutdown()
+    assert bodies == [PAGE, PAGE]
+    assert server.requests == [None, '"v1"']
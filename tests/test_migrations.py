@@ -0,0 +1,36 @@
+import sqlite3
+
+import migrations
+
+
+def _connect(path):
+    return sqlite3.connect(str(path), isolation_level=None)
+
+
+def test_fresh_database_records_every_migration(tmp_path):
+    conn = _connect(tmp_path / 'siren.db')
+    assert migrations.apply_migrations(conn) == migrations.MIGRATIONS[-1][0]
+    assert migrations.applied_versions(conn) == {version for version, _, _ in migrations.MIGRATIONS}
+
+
+def test_skipped_migration_is_retried_on_next_start(tmp_path, monkeypatch):
+    path = tmp_path / 'siren.db'
+    without_fts = tuple((v, d, (lambda conn: False) if v == 3 else m) for v, d, m in migrations.MIGRATIONS)
+    monkeypatch.setattr(migrations, 'MIGRATIONS', without_fts)
+    conn = _connect(path)
+    migrations.apply_migrations(conn)
+    assert 3 not in migrations.applied_versions(conn)
+    assert max(migrations.applied_versions(conn)) == without_fts[-1][0]
+    conn.close()
+
+    monkeypatch.undo()
+    conn = _connect(path)
+    migrations.apply_migrations(conn)
+    assert 3 in migrations.applied_versions(conn)
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'videos_fts'").fetchone()
+
+
+def test_unpushed_index_is_dropped(tmp_path):
+    conn = _connect(tmp_path / 'siren.db')
+    migrations.apply_migrations(conn)
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_videos_unpushed'").fetchone()
@@ -0,0 +1,55 @@
+import asyncio
+
+from database import Database
+from migrations import split_names
+
+
+def run(scenario, path):
+    async def main():
+        db = Database(str(path))
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+def _codes(videos):
+    return [v['code'] for v in videos]
+
+
+def test_split_names_keeps_the_first_spelling():
+    assert split_names(' Yua Mikami ，yua  mikami, 三上悠亜,') == {'yua mikami': 'Yua Mikami', '三上悠亜': '三上悠亜'}
+    assert split_names(None) == {}
+
+
+def test_lookup_by_actress_and_tag(tmp_path):
+    async def scenario(db):
+        # upsert_videos (the catalog import) keeps the given created_time
+        await db.upsert_videos([
+            {'code': 'SSIS-001', 'actresses': 'Yua Mikami', 'tags': 'Drama, 4K', 'created_time': '2024-01-01'},
+            {'code': 'SSIS-002', 'actresses': 'yua mikami，Other', 'tags': 'Drama', 'created_time': '2024-02-01'},
+            {'code': 'IPX-655', 'actresses': 'Other', 'tags': '4K', 'created_time': '2024-03-01'},
+        ])
+        return (await db.get_videos_by_actress('ＹＵＡ MIKAMI'), await db.get_videos_by_tag('drama'),
+                await db.get_videos_by_actress('Yua Mikami', since='2024-01-15'), await db.tag_stats())
+
+    by_actress, by_tag, since, stats = run(scenario, tmp_path / 'siren.db')
+    assert _codes(by_actress) == ['SSIS-002', 'SSIS-001']
+    assert _codes(by_tag) == ['SSIS-002', 'SSIS-001']
+    assert _codes(since) == ['SSIS-002']
+    assert sorted(stats) == [('4K', 2), ('Drama', 2)]
+
+
+def test_updated_names_replace_old_links(tmp_path):
+    async def scenario(db):
+        await db.save_videos([{'code': 'SSIS-001', 'actresses': 'Placeholder', 'tags': 'Drama'}])
+        await db.update_videos([{'code': 'SSIS-001', 'actresses': 'Yua Mikami', 'tags': ''}])
+        return (await db.get_videos_by_actress('placeholder'), await db.get_videos_by_actress('yua mikami'),
+                await db.get_videos_by_tag('drama'))
+
+    old, new, tag = run(scenario, tmp_path / 'siren.db')
+    assert old == []
+    assert _codes(new) == ['SSIS-001']
+    # An empty value leaves the stored tags and their links alone
+    assert _codes(tag) == ['SSIS-001']
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from crawlers import parser
+from crawlers.jable import JableCrawler
+from crawlers.missav import MissavCrawler
+from crawlers.parser import _resolve_backend, class_strainer, make_soup, tag_strainer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+
+def _fixture(source, kind):
+    with open(os.path.join(FIXTURES, source, kind + '.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_backend_resolution():
+    assert _resolve_backend('auto') in ('lxml', 'html.parser')
+    assert _resolve_backend('html.parser') == 'html.parser'
+    assert _resolve_backend('nonsense') == 'html.parser'
+
+
+def test_class_strainer_matches_whole_class_tokens():
+    html = ('<div class="video-card big">a</div><div class="video-cards">b</div>'
+            '<span class="video-card">c</span><div class="x group">d</div>')
+    soup = make_soup(html, class_strainer('div', 'group', 'video-card'))
+    assert [div.get_text() for div in soup.find_all('div')] == ['a', 'd']
+
+
+def test_tag_strainer_keeps_subtrees():
+    soup = make_soup('<body><h1>T <a href="/x">x</a></h1><p>skip</p></body>', tag_strainer('h1'))
+    assert soup.find('a')['href'] == '/x'
+    assert soup.find('p') is None
+
+
+@pytest.mark.parametrize('crawler, source', [(MissavCrawler(), 'missav'), (JableCrawler(), 'jable')])
+def test_backends_parse_fixtures_alike(monkeypatch, crawler, source):
+    results = {}
+    for backend in ('html.parser', _resolve_backend('lxml')):
+        monkeypatch.setattr(parser, 'BACKEND', backend)
+        results[backend] = (crawler.parse_list(_fixture(source, 'list')),
+                            crawler.parse_detail(_fixture(source, 'detail'), crawler.base_url + '/x'))
+    listed, detail = results['html.parser']
+    assert listed and detail
+    assert all(value == (listed, detail) for value in results.values())
@@ -0,0 +1,45 @@
+import asyncio
+
+import pipeline
+from metrics import PIPELINE_QUEUE_DEPTH
+
+
+def test_queue_depth_sums_concurrent_pipelines():
+    async def main():
+        first = {stage: asyncio.Queue() for stage in ('detail', 'write', 'push')}
+        second = {stage: asyncio.Queue() for stage in ('detail', 'write', 'push')}
+        first['detail'].put_nowait(1)
+        second['detail'].put_nowait(1)
+        second['detail'].put_nowait(2)
+        pipeline._running.extend((first, second))
+        try:
+            both = PIPELINE_QUEUE_DEPTH.series()[('detail',)]
+            pipeline._running.remove(first)
+            one = PIPELINE_QUEUE_DEPTH.series()[('detail',)]
+        finally:
+            pipeline._running.clear()
+        return both, one, PIPELINE_QUEUE_DEPTH.series()[('detail',)]
+
+    assert asyncio.run(main()) == (3, 2, 0)
+
+
+class _FailingDb:
+    async def existing_codes(self, codes):
+        return set()
+
+    async def save_videos(self, videos):
+        raise RuntimeError('disk full')
+
+
+def test_failing_stage_cancels_the_others():
+    async def main():
+        # More videos than the queues hold, so the producer blocks once the writer dies
+        videos = [{'code': f'SSIS-{i:03d}'} for i in range(50)]
+        run = pipeline.VideoPipeline(None, _FailingDb(), enrich=False, queue_size=2).run(videos)
+        try:
+            await asyncio.wait_for(run, 5)
+        except RuntimeError as e:
+            left = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            return str(e), list(pipeline._running), left
+
+    assert asyncio.run(main()) == ('disk full', [], [])
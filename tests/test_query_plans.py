@@ -0,0 +1,22 @@
+import asyncio
+
+from database import Database, _TABLE_SCAN
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    async def scanning():
+        db = Database(str(tmp_path / 'siren.db'))
+        try:
+            return await db.check_query_plans()
+        finally:
+            await db.close()
+
+    assert asyncio.run(scanning()) == []
+
+
+def test_table_scan_plan_formats():
+    assert _TABLE_SCAN.match('SCAN videos')
+    assert _TABLE_SCAN.match('SCAN TABLE videos')
+    assert not _TABLE_SCAN.match('SCAN videos USING INDEX idx_videos_created')
+    assert not _TABLE_SCAN.match('SCAN TABLE videos USING COVERING INDEX idx_videos_pushed')
+    assert not _TABLE_SCAN.match('SEARCH videos USING INDEX sqlite_autoindex_videos_1 (code=?)')
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from crawlers import ratelimit
+from crawlers.ratelimit import HostLimiter, _parse_host_limits, get_limiter, parse_retry_after
+
+
+def test_parse_retry_after_forms():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+    assert parse_retry_after(' 30 ') == 30.0
+    assert parse_retry_after('99999') == ratelimit.MAX_RETRY_AFTER
+    assert parse_retry_after('soon') is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 55 <= parse_retry_after(later) <= 60
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(hours=1), usegmt=True)
+    assert parse_retry_after(past) == 0.0
+
+
+def test_host_limits_from_env_string():
+    assert _parse_host_limits('missav.ai=4, Jable.tv=2,bad,x=y') == {'missav.ai': 4, 'jable.tv': 2}
+
+
+def test_rate_grows_additively_and_halves_on_throttling():
+    limiter = HostLimiter('a.test', rate=1.0)
+    for _ in range(5):
+        limiter.record(200, 0.1)
+    assert abs(limiter.rate - 1.5) < 1e-9
+    limiter.record(429, 0.1)
+    assert abs(limiter.rate - 0.75) < 1e-9
+    limiter.record(503, 0.1)
+    limiter.record(503, 0.1)
+    limiter.record(503, 0.1)
+    assert limiter.rate == ratelimit.MIN_RATE
+
+
+def test_rate_is_capped_and_latency_spikes_back_off():
+    limiter = HostLimiter('a.test', rate=ratelimit.MAX_RATE)
+    limiter.record(200, 0.1)
+    assert limiter.rate == ratelimit.MAX_RATE
+    limiter.record(200, 0.1 * ratelimit.SLOW_FACTOR * 2)
+    assert limiter.rate == ratelimit.MAX_RATE * ratelimit.DECREASE_FACTOR
+
+
+def test_retry_after_and_errors_pause_the_host():
+    limiter = HostLimiter('a.test')
+    limiter.record(429, 0.1, retry_after='20')
+    assert limiter.blocked_until - time.monotonic() > 19
+    other = HostLimiter('b.test')
+    other.record_error()
+    assert other.blocked_until > time.monotonic()
+
+
+def test_slots_limit_concurrency_and_pace_tokens():
+    async def main():
+        limiter = HostLimiter('a.test', rate=20.0, concurrency=2)
+        active = peak = 0
+
+        async def request():
+            nonlocal active, peak
+            async with limiter.slot():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak, time.monotonic() - started
+
+    peak, elapsed = asyncio.run(main())
+    assert peak == 2
+    # Two burst tokens, then four more at 20/s
+    assert elapsed >= 0.18
+
+
+def test_limiters_are_shared_per_host():
+    assert get_limiter('https://Example.test/a') is get_limiter('https://example.test/b')
+    assert get_limiter('https://example.test/') is not get_limiter('https://other.test/')
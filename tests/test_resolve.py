@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from crawler import CrawlerManager
+from crawlers.resolve import find_code, merge_video, missing_fields, normalize_code
+
+
+@pytest.mark.parametrize('value, code', [
+    ('ssis001', 'SSIS-001'),
+    ('SSIS_001', 'SSIS-001'),
+    (' ssis-001-uncensored-leak ', 'SSIS-001'),
+    ('300MIUM-123', '300MIUM-123'),
+    ('fc2-ppv-1234567', 'FC2-PPV-1234567'),
+    ('FC2 1234567', 'FC2-PPV-1234567'),
+    ('SSIS-0012345', None),
+    ('hello', None),
+    (None, None),
+])
+def test_normalize_code(value, code):
+    assert normalize_code(value) == code
+
+
+def test_find_code_needs_a_separator_in_text():
+    assert find_code('[HD1080] ipx-655 中文字幕') == 'IPX-655'
+    assert find_code('https://a.test/videos/ssis-001-c/') == 'SSIS-001'
+    assert find_code('HD1080 only') is None
+
+
+def test_merge_fills_gaps_from_other_sources():
+    video = {'code': 'SSIS-001', 'source': 'MissAV', 'detail_url': 'https://m/1', 'title': 'Card'}
+    merge_video(video, {'code': 'SSIS-001', 'source': 'Jable', 'detail_url': 'https://j/1',
+                        'title': 'Other', 'tags': 'Drama', 'duration': None})
+    assert video['title'] == 'Card' and video['tags'] == 'Drama'
+    assert video['sources'] == {'MissAV': 'https://m/1', 'Jable': 'https://j/1'}
+    assert video['detail_url'] == 'https://m/1'
+
+
+def test_merge_from_the_same_source_replaces_values():
+    video = {'code': 'SSIS-001', 'source': 'MissAV', 'title': 'Card'}
+    merge_video(video, {'source': 'MissAV', 'title': 'Detail', 'actresses': ''})
+    assert video['title'] == 'Detail'
+    assert 'actresses' not in video
+
+
+class _Crawler:
+    SEARCH_DEADLINE = 5.0
+    DETAIL_REQUESTS = 1
+
+    def __init__(self, source_name, fields, detail):
+        self.source_name = source_name
+        self.DETAIL_FIELDS = frozenset(fields)
+        self.detail = detail
+        self.fetched = []
+
+    def detail_url_for(self, code):
+        return f'https://{self.source_name.lower()}.test/{code}'
+
+    async def crawl_video_detail(self, url):
+        self.fetched.append(url)
+        return dict(self.detail, source=self.source_name, detail_url=url)
+
+
+def test_enrichment_fetches_only_what_is_missing():
+    full = _Crawler('ResolveFull', missing_fields({}), {
+        'code': 'SSIS-001', 'title': 'T', 'actresses': 'A', 'tags': 'G', 'duration': 120, 'preview_url': 'p'})
+    partial = _Crawler('ResolvePartial', {'title', 'tags'}, {'code': 'SSIS-001', 'title': 'T', 'tags': 'G'})
+    wrong = _Crawler('ResolveWrong', missing_fields({}), {'code': 'IPX-655', 'title': 'Not it'})
+
+    async def main():
+        manager = CrawlerManager()
+        manager.crawlers = [wrong, partial]
+        video = await manager.enrich_video({'code': 'ssis001', 'title': 'Card'})
+        manager.crawlers = [full, partial]
+        complete = await manager.enrich_video({'code': 'SSIS-001', 'title': 'Card'})
+        return video, complete
+
+    video, complete = asyncio.run(main())
+    # A detail page for another code is ignored
+    assert video['code'] == 'SSIS-001' and video['tags'] == 'G' and 'ResolveWrong' not in video['sources']
+    assert not missing_fields(complete)
+    assert partial.fetched == ['https://resolvepartial.test/SSIS-001']  # only the first run needed it
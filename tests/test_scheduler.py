@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+from scheduler import PollScheduler, SourceSchedule
+
+
+class _Crawler:
+    def __init__(self, source_name):
+        self.source_name = source_name
+
+
+def test_empty_polls_back_off_within_bounds():
+    schedule = SourceSchedule('Test', base=15, minimum=5, maximum=60)
+    now = time.time()
+    schedule.record(0, now)
+    assert schedule.interval == 22.5 * 60
+    for i in range(1, 10):
+        schedule.record(0, now + i * 3600)
+    assert schedule.interval == 60 * 60
+
+
+def test_failed_poll_retries_soon_without_learning():
+    async def poll(crawler):
+        return None
+
+    async def run():
+        scheduler = PollScheduler([_Crawler('Failing')], poll, base=15).start()
+        await asyncio.sleep(0.05)
+        await scheduler.close()
+        return scheduler.schedules['Failing']
+
+    schedule = asyncio.run(run())
+    assert schedule.last_poll is None
+    assert schedule.empty_polls == 0
+    assert schedule.hourly_rate == [None] * 24
+    assert schedule.interval == 15 * 60
+    assert schedule.next_poll - time.time() <= schedule.minimum * 1.2
@@ -0,0 +1,195 @@
+import asyncio
+
+from crawler import CrawlerManager
+from crawlers.search_cache import SearchCache
+
+
+def _fetcher(calls, batches, delay=0.01):
+    async def fetch():
+        calls.append(1)
+        for batch in batches:
+            await asyncio.sleep(delay)
+            yield batch
+    return fetch
+
+
+async def _collect(cache, key, fetch):
+    return [batch async for batch in cache.stream(key, fetch)]
+
+
+def test_concurrent_streams_share_one_fetch():
+    batches = [[{'code': 'SSIS-001'}], [{'code': 'SSIS-002'}]]
+
+    async def run():
+        cache = SearchCache()
+        calls = []
+        fetch = _fetcher(calls, batches)
+        results = await asyncio.gather(*(_collect(cache, ('ssis', 5), fetch) for _ in range(3)))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results == [batches] * 3
+    assert cache.stats['misses'] == 1
+    assert cache.stats['coalesced'] == 2
+
+
+def test_late_joiner_replays_earlier_batches():
+    batches = [[{'code': 'A-1'}], [{'code': 'A-2'}]]
+
+    async def run():
+        cache = SearchCache()
+        calls = []
+        fetch = _fetcher(calls, batches, delay=0.02)
+        first = asyncio.ensure_future(_collect(cache, 'a', fetch))
+        await asyncio.sleep(0.03)  # first batch already out
+        second = await _collect(cache, 'a', fetch)
+        return calls, await first, second
+
+    calls, first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first == second == batches
+
+
+def test_completed_fetch_is_cached_as_one_batch():
+    async def run():
+        cache = SearchCache()
+        calls = []
+        fetch = _fetcher(calls, [[{'code': 'A-1'}], [{'code': 'A-2'}]])
+        await _collect(cache, 'a', fetch)
+        cached = await _collect(cache, 'a', fetch)
+        return cache, calls, cached
+
+    cache, calls, cached = asyncio.run(run())
+    assert len(calls) == 1
+    assert cached == [[{'code': 'A-1'}, {'code': 'A-2'}]]
+    assert cache.stats['hits'] == 1
+
+
+def test_callers_get_copies():
+    async def run():
+        cache = SearchCache()
+        fetch = _fetcher([], [[{'code': 'A-1'}]])
+        (batch,) = await _collect(cache, 'a', fetch)
+        batch[0]['title'] = 'changed'
+        return await _collect(cache, 'a', fetch)
+
+    assert asyncio.run(run()) == [[{'code': 'A-1'}]]
+
+
+def test_empty_result_uses_negative_ttl():
+    async def run():
+        cache = SearchCache(negative_ttl=0)
+        calls = []
+        fetch = _fetcher(calls, [])
+        await _collect(cache, 'none', fetch)
+        await _collect(cache, 'none', fetch)
+        return calls
+
+    assert len(asyncio.run(run())) == 2
+
+
+def test_failed_fetch_raises_to_every_caller_and_is_not_cached():
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('boom')
+        yield
+
+    async def run():
+        cache = SearchCache()
+        results = await asyncio.gather(_collect(cache, 'x', fetch), _collect(cache, 'x', fetch),
+                                       return_exceptions=True)
+        return cache, results
+
+    cache, results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not cache._entries and not cache._inflight
+
+
+def test_caller_stopping_early_does_not_stop_the_fetch():
+    batches = [[{'code': 'A-1'}], [{'code': 'A-2'}]]
+
+    async def run():
+        cache = SearchCache()
+        calls = []
+        fetch = _fetcher(calls, batches)
+        stream = cache.stream('a', fetch)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        return calls, await _collect(cache, 'a', fetch)
+
+    calls, cached = asyncio.run(run())
+    assert len(calls) == 1
+    assert cached == [[{'code': 'A-1'}, {'code': 'A-2'}]]
+
+
+def test_search_and_search_stream_share_remote_fan_out():
+    class _Crawler:
+        source_name = 'SingleFlight'
+        SEARCH_DEADLINE = 5.0
+        calls = 0
+
+        async def search(self, keyword, limit=5):
+            _Crawler.calls += 1
+            await asyncio.sleep(0.02)
+            return [{'code': 'abc-123', 'source': self.source_name}]
+
+    async def run():
+        manager = CrawlerManager()
+        manager.crawlers = [_Crawler()]
+        streamed, searched = await asyncio.gather(
+            _drain(manager.search_stream('ABC', limit=5)), manager.search(' abc ', limit=5))
+        return streamed, searched
+
+    async def _drain(stream):
+        return [v async for batch in stream for v in batch]
+
+    streamed, searched = asyncio.run(run())
+    assert _Crawler.calls == 1
+    assert [v['code'] for v in streamed] == [v['code'] for v in searched] == ['ABC-123']
+
+
+def test_entries_expire_and_lru_evicts_the_oldest():
+    async def run():
+        cache = SearchCache(max_entries=2, ttl=10)
+        calls = []
+        for key in ('a', 'b'):
+            await _collect(cache, key, _fetcher(calls, [[{'code': key}]], delay=0))
+        await _collect(cache, 'a', _fetcher(calls, []))  # hit; 'b' is now least recent
+        await _collect(cache, 'c', _fetcher(calls, [[{'code': 'c'}]], delay=0))
+        evicted = list(cache._entries)
+        expires_at, results = cache._entries['a']
+        cache._entries['a'] = (expires_at - 11, results)
+        await _collect(cache, 'a', _fetcher(calls, [[{'code': 'a'}]], delay=0))
+        return evicted, len(calls), cache.stats
+
+    evicted, calls, stats = asyncio.run(run())
+    assert evicted == ['a', 'c']
+    assert calls == 4
+    assert stats['hits'] == 1 and stats['misses'] == 4
+
+
+def test_crawl_video_detail_coalesces_code_lookups():
+    class _Crawler:
+        source_name = 'Coalesce'
+        SEARCH_DEADLINE = 5.0
+        DETAIL_FIELDS = frozenset()
+        calls = 0
+
+        def detail_url_for(self, code):
+            return None
+
+        async def search(self, keyword, limit=5):
+            _Crawler.calls += 1
+            await asyncio.sleep(0.02)
+            return [{'code': 'SSIS-001', 'title': 'x'}]
+
+    async def run():
+        manager = CrawlerManager()
+        manager.crawlers = [_Crawler()]
+        return await asyncio.gather(*(manager.crawl_video_detail('ssis-001') for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert _Crawler.calls == 1
+    assert [v['code'] for v in results] == ['SSIS-001'] * 3
@@ -0,0 +1,68 @@
+import asyncio
+import sqlite3
+
+from database import Database, fts_query
+
+
+def run(scenario, path):
+    async def main():
+        db = Database(str(path))
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+def test_fts_query_prefixes_every_word():
+    assert fts_query('SSIS-001 Yua') == '"ssis"* "001"* "yua"*'
+    assert fts_query('"; DROP') == '"drop"*'
+    assert fts_query('!!') == ''
+
+
+def test_search_matches_prefixes_and_ranks_code_first(tmp_path):
+    async def scenario(db):
+        await db.save_videos([
+            {'code': 'ABP-100', 'title': 'About SSIS'},
+            {'code': 'SSIS-001', 'title': 'First', 'actresses': 'Yua Mikami'},
+            {'code': 'IPX-655', 'title': 'Other', 'tags': 'Drama'},
+        ])
+        return (await db.search_videos('ssis'), await db.search_videos('yua mika'),
+                await db.search_videos('dram'), await db.search_videos('nothing'), await db.search_videos('!!'))
+
+    ssis, yua, drama, nothing, empty = run(scenario, tmp_path / 'siren.db')
+    assert [v['code'] for v in ssis] == ['SSIS-001', 'ABP-100']
+    assert [v['code'] for v in yua] == ['SSIS-001']
+    assert [v['code'] for v in drama] == ['IPX-655']
+    assert nothing == empty == []
+
+
+def test_index_follows_updates(tmp_path):
+    async def scenario(db):
+        await db.save_videos([{'code': 'SSIS-001'}])
+        before = await db.search_videos('mikami')
+        await db.update_videos([{'code': 'SSIS-001', 'actresses': 'Yua Mikami'}])
+        return before, await db.search_videos('mikami')
+
+    before, after = run(scenario, tmp_path / 'siren.db')
+    assert before == []
+    assert [v['code'] for v in after] == ['SSIS-001']
+
+
+def test_rows_stored_before_the_index_are_searchable(tmp_path):
+    path = tmp_path / 'siren.db'
+
+    async def seed(db):
+        await db.save_videos([{'code': 'SSIS-001', 'title': 'Rebuilt'}])
+
+    # A database from before migration 3
+    run(seed, path)
+    conn = sqlite3.connect(str(path), isolation_level=None)
+    conn.execute('DROP TABLE videos_fts')
+    conn.execute('DELETE FROM schema_version WHERE version = 3')
+    conn.close()
+
+    async def search(db):
+        return await db.search_videos('rebuilt')
+
+    assert [v['code'] for v in run(search, path)] == ['SSIS-001']
@@ -0,0 +1,80 @@
+import asyncio
+
+from crawlers import sessions
+from crawlers.sessions import SessionPool, get_pool
+
+
+def test_pool_grows_only_while_every_session_is_busy():
+    async def main():
+        pool = SessionPool('a.test', size=2, profiles=['chrome120'])
+        try:
+            async with pool.session() as first:
+                pass
+            async with pool.session() as again:
+                assert again is first  # idle session reused
+                async with pool.session() as second:
+                    assert second is not first
+                    async with pool.session() as third:
+                        assert third in (first, second)  # pool is full
+            return len(pool._sessions)
+        finally:
+            await pool.close()
+
+    assert asyncio.run(main()) == 2
+
+
+def test_rotation_retires_sessions_and_honours_the_cooldown():
+    async def main():
+        pool = SessionPool('a.test', size=2, profiles=['chrome120', 'safari17_0'])
+        try:
+            async with pool.session() as busy:
+                await pool.rotate('status 403')
+                assert pool.profile == 'safari17_0'
+                async with pool.session() as fresh:
+                    assert fresh is not busy
+                # Within ROTATE_COOLDOWN a second block doesn't rotate again
+                await pool.rotate('status 403')
+                assert pool.profile == 'safari17_0'
+            # The retired session closed once its request finished
+            return [p.profile for p in pool._sessions]
+        finally:
+            await pool.close()
+
+    assert asyncio.run(main()) == ['safari17_0']
+
+
+def test_idle_sessions_are_closed(monkeypatch):
+    async def main():
+        pool = SessionPool('a.test', profiles=['chrome120'])
+        try:
+            async with pool.session():
+                pass
+            monkeypatch.setattr(sessions, 'SESSION_IDLE_SECONDS', -1)
+            await pool._evict_idle()
+            return len(pool._sessions)
+        finally:
+            await pool.close()
+
+    assert asyncio.run(main()) == 0
+
+
+def test_cookies_are_shared_across_the_pool():
+    async def main():
+        pool = SessionPool('a.test', size=2, profiles=['chrome120'])
+        try:
+            async with pool.session() as first:
+                first.cookies.set('age_verified', '1', domain='a.test')
+                async with pool.session() as second:
+                    pass
+            async with pool.session() as session:
+                return session.cookies.get('age_verified'), second is not first
+        finally:
+            await pool.close()
+
+    assert asyncio.run(main()) == ('1', True)
+
+
+def test_pools_are_shared_per_host():
+    assert get_pool('https://A.test/x') is get_pool('https://a.test/y')
+    assert get_pool('https://a.test/') is not get_pool('https://b.test/')
+    asyncio.run(sessions.close_pools())
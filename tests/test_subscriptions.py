@@ -0,0 +1,55 @@
+import asyncio
+
+from database import Database
+from subscriptions import SubscriptionIndex, normalize, split_tokens
+
+
+def test_normalize_folds_width_case_and_spaces():
+    assert normalize('  Ｙｕａ   Mikami ') == 'yua mikami'
+    assert split_tokens('三上悠亜, Yua Mikami，,') == {'三上悠亜', 'yua mikami'}
+
+
+def test_match_by_actress_tag_and_all():
+    index = SubscriptionIndex()
+    index.add(1, 'USER', 'ACTRESS', 'Yua Mikami')
+    index.add(2, 'USER', 'TAG', '中出し')
+    index.add(3, 'USER', 'ALL')
+    video = {'actresses': 'YUA MIKAMI', 'tags': '巨乳'}
+    assert index.match(video) == {1, 3}
+    assert index.match({'tags': '中出し'}) == {2, 3}
+
+
+def test_removing_one_spelling_keeps_the_other():
+    index = SubscriptionIndex()
+    index.add(1, 'USER', 'ACTRESS', 'Yua Mikami')
+    index.add(1, 'USER', 'ACTRESS', 'yua  mikami')
+    index.remove(1, 'ACTRESS', 'Yua Mikami')
+    assert index.match({'actresses': 'Yua Mikami'}) == {1}
+    index.remove(1, 'ACTRESS', 'yua  mikami')
+    assert index.match({'actresses': 'Yua Mikami'}) == set()
+    assert 1 not in index.chat_types
+
+
+def test_index_follows_the_database(tmp_path):
+    async def main():
+        db = Database(str(tmp_path / 'siren.db'))
+        try:
+            index = SubscriptionIndex()
+            for keyword in ('Yua Mikami', 'yua mikami'):
+                await db.subscribe(1, 'USER', 'ACTRESS', keyword)
+                index.add(1, 'USER', 'ACTRESS', keyword)
+            await db.subscribe(1, 'USER', 'ALL')
+            index.add(1, 'USER', 'ALL')
+            for sub_type, keyword in (('ACTRESS', 'Yua Mikami'), ('ALL', None)):
+                await db.unsubscribe(1, sub_type, keyword)
+                index.remove(1, sub_type, keyword)
+            reloaded = SubscriptionIndex()
+            await reloaded.load(db)
+            return index, reloaded
+        finally:
+            await db.close()
+
+    index, reloaded = asyncio.run(main())
+    video = {'actresses': 'Yua Mikami', 'tags': ''}
+    assert index.match(video) == reloaded.match(video) == {1}
+    assert index.all_chats == reloaded.all_chats == set()
@@ -0,0 +1,74 @@
+import asyncio
+
+from crawler import CrawlerManager
+
+
+class _Db:
+    def __init__(self, watermark=()):
+        self.watermarks = {'Fake': list(watermark)}
+
+    async def get_watermark(self, source):
+        return list(self.watermarks.get(source, []))
+
+    async def set_watermark(self, source, codes):
+        self.watermarks[source] = list(codes)
+
+
+class _Crawler:
+    source_name = 'Fake'
+    base_url = 'https://fake.test'
+
+    def __init__(self, pages, failing=()):
+        self.pages = pages  # page number -> codes, newest first
+        self.failing = set(failing)
+        self.requested = []
+
+    async def crawl_new_page(self, page):
+        self.requested.append(page)
+        if page in self.failing:
+            return None
+        return [{'code': code} for code in self.pages.get(page, [])]
+
+
+def _pages():
+    return {p: [f'NEW-{p}{i}' for i in range(3)] for p in range(1, 6)}
+
+
+def _crawl(crawler, db, max_pages=10):
+    return asyncio.run(CrawlerManager().crawl_source_new_videos(crawler, db, max_pages))
+
+
+def test_first_crawl_only_reads_page_one_to_seed_the_watermark():
+    crawler, db = _Crawler(_pages()), _Db()
+    videos = _crawl(crawler, db)
+    assert crawler.requested == [1]
+    assert [v['code'] for v in videos] == db.watermarks['Fake'] == ['NEW-10', 'NEW-11', 'NEW-12']
+
+
+def test_catch_up_stops_at_the_watermark():
+    pages = _pages()
+    pages[3] = ['NEW-30', 'OLD-1', 'OLD-2']
+    crawler, db = _Crawler(pages), _Db(['OLD-1', 'OLD-2'])
+    videos = _crawl(crawler, db)
+    assert max(crawler.requested) >= 3 and 1 in crawler.requested
+    assert [v['code'] for v in videos][-3:] == ['NEW-30', 'OLD-1', 'OLD-2']
+    assert db.watermarks['Fake'][:2] == ['NEW-10', 'NEW-11']
+    assert db.watermarks['Fake'][-2:] == ['OLD-1', 'OLD-2']
+
+
+def test_nothing_new_costs_one_request():
+    pages = {1: ['OLD-1', 'OLD-2']}
+    crawler, db = _Crawler(pages), _Db(['OLD-1', 'OLD-2'])
+    _crawl(crawler, db)
+    assert crawler.requested == [1]
+
+
+def test_failed_pages_leave_the_watermark_alone():
+    crawler, db = _Crawler(_pages(), failing={1}), _Db(['OLD-1'])
+    assert _crawl(crawler, db) is None
+    assert db.watermarks['Fake'] == ['OLD-1']
+
+    crawler, db = _Crawler(_pages(), failing={2}), _Db(['OLD-1'])
+    videos = _crawl(crawler, db)
+    assert [v['code'] for v in videos] == ['NEW-10', 'NEW-11', 'NEW-12']
+    assert db.watermarks['Fake'] == ['OLD-1']